@@ -1,40 +1,238 @@
 from agno.agent import Agent
+from agno.document.chunking.fixed import FixedSizeChunking
 from agno.embedder.openai import OpenAIEmbedder
 from agno.knowledge.pdf import PDFKnowledgeBase
 from agno.models.openai import OpenAIChat
+from agno.run.response import RunEvent
+from agno.utils.string import parse_structured_output
 from agno.vectordb.lancedb import LanceDb
 from agno.vectordb.search import SearchType
 from agno.tools.tavily import TavilyTools
 import asyncio
-from typing import Dict, List
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
 from models import *
-
-def setup_knowledge_base(pdf_path: str):
-    """Configura o knowledge base com otimizações"""
-    knowledge_base = PDFKnowledgeBase(
-        path=pdf_path,
-        ocr=True,
-        chunk_size=1500,  # Balanceado: performance + qualidade
-        chunk_overlap=150,  # Contexto suficiente
-        num_documents=12,  # Ajustado para melhor trade-off
-        vector_db=LanceDb(
-            table_name="stf_ocr_otimizado",
-            uri="tmp/lancedb_stf_ocr_otimizado",
-            search_type=SearchType.vector,
-            embedder=OpenAIEmbedder(id="text-embedding-3-large"),  # Maior qualidade
-        ),
+from services.embedding_cache import CachedEmbedder, calcular_hash_arquivo, get_embedding_cache
+from services.vector_store import get_vector_store
+from services.pipeline import get_pipeline
+from services.pdf_service import PDFProcessingService, ProcessoPDFReader
+from services.retrieval import RetrievalCoordinator
+from services.ingestion import IngestaoStreaming, criar_tabela
+from services.vector_index import COLUNA_TEXTO, IndiceConfig, criar_indice_ann, indexar, indices_existentes
+from services.chunking import ChunkingPecas
+from services.fake_models import FakeChat, FakeEmbedder
+from services.metrics import get_metrics, registrar_span, span
+from services.result_cache import ResultCache, get_result_cache
+from services.web_search import get_search_client
+from services.llm_governor import PRIORIDADE_AGENTE, PRIORIDADE_RELATOR, get_governor
+from services.relator_input import compactar_resultados, get_tokenizador, orcamento_relator
+from services.openai_client import get_openai_client
+from services.streaming import TransmissaoAgente
+
+CHUNK_SIZE = 1500  # Balanceado: performance + qualidade
+CHUNK_OVERLAP = 150  # Contexto suficiente
+EMBEDDING_MODEL = "text-embedding-3-large"  # Maior qualidade
+CHAT_MODEL = "gpt-4o-mini"  # Modelo mais rápido
+
+def criar_chunking():
+    """Divisão dos documentos: por peça processual (padrão) ou em blocos fixos (CHUNKING=fixo)"""
+    if chunking_por_pecas():
+        return ChunkingPecas(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+    return FixedSizeChunking(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+
+def chunking_por_pecas() -> bool:
+    return os.getenv("CHUNKING", "pecas").lower() != "fixo"
+
+def provedor_llm() -> str:
+    """Provedor de modelos: 'openai' ou 'fake' (local, determinístico, sem rede)"""
+    return os.getenv("LLM_PROVIDER", "openai").lower()
+
+def dimensoes_embedding() -> int:
+    """
+    Dimensões dos vetores do embedder atual: no openai, as pedidas à API (EMBEDDING_DIMENSIONS;
+    text-embedding-3 aceita reduzir, 3072 é o vetor completo); o simulado tem dimensão fixa
+    """
+    if provedor_llm() == "fake":
+        return FakeEmbedder.dimensions
+    return int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+
+def criar_embedder():
+    """Embedder do knowledge base conforme LLM_PROVIDER"""
+    if provedor_llm() == "fake":
+        return FakeEmbedder(latencia=float(os.getenv("FAKE_EMBEDDER_LATENCY", "0.05")))
+    return OpenAIEmbedder(id=EMBEDDING_MODEL, dimensions=dimensoes_embedding(), openai_client=get_openai_client())
+
+def criar_modelo(response_model=None):
+    """Modelo de chat de um agente conforme LLM_PROVIDER"""
+    if provedor_llm() == "fake":
+        return FakeChat(
+            response_model=response_model,
+            latencia=float(os.getenv("FAKE_LLM_LATENCY", "1.0")),
+            latencia_por_token=float(os.getenv("FAKE_LLM_LATENCY_PER_TOKEN", "0")),
+        )
+    # Cliente (pool de conexões) compartilhado: o modelo guarda só o estado da execução
+    return OpenAIChat(id=CHAT_MODEL, client=get_openai_client())
+
+def criar_ferramentas_web():
+    """Ferramentas do agente web (sem busca externa no modo fake)"""
+    if provedor_llm() == "fake":
+        return []
+    ferramentas = TavilyTools()
+    # Cache, limite de taxa e coalescência de consultas compartilhados por todas as tarefas
+    ferramentas.client = get_search_client()
+    return [ferramentas]
+
+# Tokens de resposta assumidos por execução de agente no orçamento do governador
+TOKENS_SAIDA_ESTIMADOS = 2000
+
+# Intervalo (em chunks) entre eventos de progresso dos embeddings
+EVENTO_CHUNKS_A_CADA = 10
+
+def _tabela_compativel(vector_db) -> bool:
+    """Tabela reutilizável só se os vetores têm a dimensão atual dos embeddings (EMBEDDING_DIMENSIONS)"""
+    if vector_db.table is None:
+        return False
+    return vector_db.table.schema.field(vector_db._vector_col).type.list_size == dimensoes_embedding()
+
+def setup_knowledge_base(pdf_path: str, doc_hash: Optional[str] = None, metadata: Optional[dict] = None,
+                         emitir: Optional[Callable] = None):
+    """
+    Configura o knowledge base com otimizações. emitir(tipo, **dados) recebe eventos de progresso.
+    A tabela do documento deve estar retida pelo chamador (get_vector_store().reter) desde antes
+    da chamada até o fim do uso, para não ser despejada.
+    """
+    inicio_ingestao = time.perf_counter()
+    doc_hash = doc_hash or calcular_hash_arquivo(pdf_path)
+    vector_store = get_vector_store()
+
+    # Embeddings de chunks já vistos vêm do cache persistente
+    embedder = CachedEmbedder(
+        embedder=criar_embedder(),
+        cache=get_embedding_cache(),
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        documento=doc_hash,
     )
-    knowledge_base.load(recreate=True)
+
+    # Cada documento tem sua própria tabela: tarefas concorrentes não se sobrescrevem
+    with vector_store.lock_documento(doc_hash):
+        # Extração híbrida: camada de texto onde é boa, OCR só nas páginas que precisam
+        reader = ProcessoPDFReader(use_ocr=True)
+        contagem = {"extraidas": 0, "chunks": 0, "cache_hits": 0}
+        if emitir:
+            def on_pagina(pagina, total):
+                contagem["extraidas"] += 1
+                emitir("pagina_extraida", pagina=pagina.numero + 1, metodo=pagina.metodo,
+                       extraidas=contagem["extraidas"], total=total)
+
+            def on_embed(do_cache):
+                contagem["chunks"] += 1
+                contagem["cache_hits"] += int(do_cache)
+                if contagem["chunks"] % EVENTO_CHUNKS_A_CADA == 0:
+                    emitir("chunks_embedados", chunks=contagem["chunks"], cache_hits=contagem["cache_hits"])
+
+            reader.on_pagina = on_pagina
+        knowledge_base = PDFKnowledgeBase(
+            path=pdf_path,
+            reader=reader,
+            # O knowledge base repassa a estratégia ao reader (sem ela, o padrão é 5000/0)
+            chunking_strategy=criar_chunking(),
+            num_documents=12,  # Ajustado para melhor trade-off
+            vector_db=LanceDb(
+                table_name=vector_store.nome_tabela(doc_hash),
+                uri=vector_store.uri,
+                search_type=SearchType.vector,
+                embedder=embedder,
+            ),
+        )
+        if not vector_store.pronta(doc_hash) or not _tabela_compativel(knowledge_base.vector_db):
+            embedder.on_embed = on_embed if emitir else None
+            # Streaming: páginas -> chunks -> lotes de embeddings -> appends na tabela, sobrepostos
+            ingestao = IngestaoStreaming(knowledge_base.vector_db, embedder)
+            try:
+                criar_tabela(knowledge_base.vector_db)
+                ingestao.carregar(reader.iter_documents(pdf_path))
+            finally:
+                # Consultas dos agentes não contam como progresso da ingestão
+                embedder.on_embed = None
+            registrar_span("embedding", embedder.segundos_embedding, histograma=False,
+                           chunks=embedder.hits + embedder.misses, cache_hits=embedder.hits)
+            registrar_span("escrita_vetorial", ingestao.segundos_escrita, escritas=ingestao.escritas,
+                           linhas=ingestao.chunks)
+            indice = indexar(knowledge_base.vector_db)
+            registrar_span("indexacao", indice["segundos"], fts=indice["fts"], ann_pendente=indice["ann_pendente"])
+            vector_store.registrar(doc_hash)
+            extracao = PDFProcessingService.summarize_extraction(reader.paginas)
+            if reader.pecas:
+                extracao["pecas"] = [peca.to_dict() for peca in reader.pecas]
+            if emitir:
+                emitir("chunks_embedados", chunks=contagem["chunks"], cache_hits=contagem["cache_hits"])
+        else:
+            extracao = {"reutilizado": True}
+            # Tabelas gravadas antes do limiar (ou do modo híbrido) ganham os índices que faltam
+            indice = indexar(knowledge_base.vector_db)
+        if indice["ann_pendente"]:
+            # Treino do IVF-PQ fora da tarefa: esta busca na tabela exata, as próximas no índice
+            vector_db = knowledge_base.vector_db
+            get_pipeline().agendar("indexacao", criar_indice_ann, vector_db.uri, vector_db.table_name,
+                                   vector_db._vector_col)
+
+    registrar_span("ingestao", time.perf_counter() - inicio_ingestao, reutilizado=extracao.get("reutilizado"))
+    if metadata is not None:
+        metadata["extracao"] = extracao
+        metadata["indice"] = {"linhas": indice["linhas"], "ann": indice["ann"], "fts": indice["fts"]}
     return knowledge_base
 
-def setup_agents(knowledge_base):
-    """Configura todos os agentes especializados"""
+# Agentes que consultam o documento (compartilham a recuperação da tarefa)
+AGENTES_DOCUMENTO = ("defesa", "acusacao", "pesquisa", "decisoes")
+
+# Peças processuais que cada agente consulta (None: o documento inteiro). "outro" cobre os
+# trechos sem peça identificada (certidões, ofícios, termos avulsos)
+PECAS_POR_AGENTE = {
+    "defesa": ("resposta_acusacao", "alegacoes_finais", "termo_audiencia", "peticao", "outro"),
+    "acusacao": ("denuncia", "alegacoes_finais", "termo_audiencia", "laudo", "inquerito", "peticao", "outro"),
+    "pesquisa": None,
+    "decisoes": ("sentenca", "decisao", "despacho", "acordao", "outro"),
+}
+
+def recuperacao_compartilhada() -> bool:
+    return os.getenv("RETRIEVAL_SHARED", "true").lower() not in ("false", "0", "no")
+
+def documentos_recuperados(agent_name: str, num_documents: int) -> int:
+    """Chunks por consulta do agente: menos quando a busca fica restrita às suas peças"""
+    if recuperacao_compartilhada() and chunking_por_pecas() and PECAS_POR_AGENTE.get(agent_name):
+        return min(num_documents, int(os.getenv("RETRIEVAL_FILTERED_DOCUMENTS", "8")))
+    return num_documents
+
+def setup_retrieval(knowledge_base) -> Optional[RetrievalCoordinator]:
+    """Coordenador de recuperação compartilhado pelos agentes da tarefa (RETRIEVAL_SHARED=false desativa)"""
+    if not recuperacao_compartilhada():
+        return None
+    escopos = {}
+    if chunking_por_pecas():
+        escopos = {
+            agente: (pecas, documentos_recuperados(agente, knowledge_base.num_documents))
+            for agente, pecas in PECAS_POR_AGENTE.items()
+        }
+    # Híbrida e refine só onde a tabela tem o índice correspondente
+    config = IndiceConfig.from_env()
+    existentes = indices_existentes(knowledge_base.vector_db)
+    return RetrievalCoordinator(
+        knowledge_base.vector_db,
+        num_documents=knowledge_base.num_documents,
+        escopos=escopos,
+        hibrida=config.hibrida and COLUNA_TEXTO in existentes,
+        refine_factor=config.refine_factor if knowledge_base.vector_db._vector_col in existentes else 0,
+    )
+
+def _definir_agentes() -> Dict[str, dict]:
+    """Configuração fixa de cada agente especializado (sem modelo, ferramentas nem documento)"""
     agents = {}
 
-    # Configuração base otimizada
+    # Configuração base dos agentes do documento (o knowledge base é ligado por tarefa)
     base_config = {
-        "model": OpenAIChat(id="gpt-4o-mini"),  # Modelo mais rápido
-        "knowledge": knowledge_base,
         "add_references": True,
         "search_knowledge": True,
         "show_tool_calls": True,
@@ -42,7 +240,8 @@ def setup_agents(knowledge_base):
     }
 
     # Agente Defesa - V3 NARRATIVO (agno-novo)
-    agents["defesa"] = Agent(
+    agents["defesa"] = dict(
+        name="defesa",
         **base_config,
         response_model=RespostaDefesa,
         instructions="""
@@ -135,7 +334,8 @@ def setup_agents(knowledge_base):
     )
 
     # Agente Acusação - V3 NARRATIVO (agno-novo)
-    agents["acusacao"] = Agent(
+    agents["acusacao"] = dict(
+        name="acusacao",
         **base_config,
         response_model=RespostaAcusacao,
         instructions="""
@@ -201,7 +401,8 @@ def setup_agents(knowledge_base):
     )
 
     # Agente Pesquisa - V3 NARRATIVO (agno-novo)
-    agents["pesquisa"] = Agent(
+    agents["pesquisa"] = dict(
+        name="pesquisa",
         **base_config,
         response_model=RespostaPesquisa,
         instructions="""
@@ -269,7 +470,8 @@ def setup_agents(knowledge_base):
     )
 
     # Agente Decisões - V3 NARRATIVO (agno-novo)
-    agents["decisoes"] = Agent(
+    agents["decisoes"] = dict(
+        name="decisoes",
         **base_config,
         response_model=RespostaDecisoes,
         instructions="""
@@ -336,10 +538,9 @@ def setup_agents(knowledge_base):
     )
 
     # Agente Web para Pesquisa Complementar
-    agents["web"] = Agent(
-        model=OpenAIChat(id="gpt-4o-mini"),
+    agents["web"] = dict(
+        name="web",
         response_model=RespostaWeb,
-        tools=[TavilyTools()],
         instructions="""
         VOCÊ É UM PESQUISADOR JURÍDICO ESPECIALIZADO EM PESQUISA WEB COMPLEMENTAR.
 
@@ -373,8 +574,13 @@ def setup_agents(knowledge_base):
     )
 
     # Agente Relator - V3 NARRATIVO (agno-novo)
-    agents["relator"] = Agent(
-        **base_config,
+    # Trabalha só sobre os resultados dos agentes (já na consulta): sem nova busca no documento
+    agents["relator"] = dict(
+        name="relator",
+        add_references=False,
+        search_knowledge=False,
+        show_tool_calls=True,
+        markdown=True,
         response_model=RelatorioConsolidado,
         instructions="""
         # Agente Relator - Versão 3: Consolidação Narrativa e Contextual
@@ -455,6 +661,36 @@ def setup_agents(knowledge_base):
 
     return agents
 
+_templates_agentes: Optional[Dict[str, dict]] = None
+_templates_lock = threading.Lock()
+
+def get_templates_agentes() -> Dict[str, dict]:
+    """Configuração dos agentes montada uma única vez por processo e reaproveitada por todas as tarefas"""
+    global _templates_agentes
+    with _templates_lock:
+        if _templates_agentes is None:
+            _templates_agentes = _definir_agentes()
+        return _templates_agentes
+
+def setup_agents(knowledge_base, retrieval: Optional[RetrievalCoordinator] = None):
+    """
+    Agentes de uma tarefa a partir dos templates: cada tarefa liga só o seu knowledge base
+    (e o retriever compartilhado). Modelo e ferramentas guardam estado da execução, então são
+    objetos por tarefa, mas sobre o mesmo cliente HTTP do processo.
+    """
+    agents = {}
+    for nome, template in get_templates_agentes().items():
+        config = dict(template, model=criar_modelo(template["response_model"]))
+        if template.get("search_knowledge"):
+            config["knowledge"] = knowledge_base
+            # Buscas dos agentes passam pelo cache de recuperação da tarefa
+            if retrieval is not None:
+                config["retriever"] = retrieval.retriever
+        if nome == "web":
+            config["tools"] = criar_ferramentas_web()
+        agents[nome] = Agent(**config)
+    return agents
+
 
 QUERIES = {
     "defesa": "Analise minuciosamente o processo criminal nos autos e extraia TODAS as informações sobre: resposta à acusação, alegações finais da defesa, depoimentos de testemunhas de defesa, teses defensivas, contradições nos autos, vícios processuais e qualquer manifestação da defesa",
@@ -466,10 +702,87 @@ QUERIES = {
 }
 
 
-def executar_agente_sync(agent, query):
+def tokens_da_execucao(run_response):
+    """Tokens de entrada e saída de uma execução (somados entre as chamadas ao modelo)"""
+    metrics = getattr(run_response, "metrics", None) or {}
+    return sum(metrics.get("input_tokens", [])), sum(metrics.get("output_tokens", []))
+
+def _registrar_tokens(agente: str, tokens_entrada: int, tokens_saida: int) -> None:
+    get_metrics().tokens.inc(tokens_entrada, agent=agente, direction="input")
+    get_metrics().tokens.inc(tokens_saida, agent=agente, direction="output")
+
+def estimar_tokens_execucao(agent, query) -> int:
+    """Estimativa de tokens de uma execução (instruções, consulta, trechos recuperados e resposta)"""
+    caracteres = len(str(agent.instructions or "")) + len(str(query))
+    if agent.knowledge is not None and (agent.search_knowledge or agent.add_references):
+        num_documents = getattr(agent.knowledge, "num_documents", 5)
+        caracteres += documentos_recuperados(agent.name, num_documents) * CHUNK_SIZE
+    return caracteres // 4 + TOKENS_SAIDA_ESTIMADOS
+
+def criar_transmissao(agente: str, agent, emitir: Optional[Callable]) -> Optional[TransmissaoAgente]:
+    """
+    Transmissão token a token da saída do agente pelo canal de eventos da tarefa, para os
+    agentes em STREAM_AGENTS (nomes separados por vírgula, "*" para todos; vazio desativa)
+    """
+    configurados = {nome.strip() for nome in os.getenv("STREAM_AGENTS", "").split(",") if nome.strip()}
+    if emitir is None or not (agente in configurados or "*" in configurados):
+        return None
+    return TransmissaoAgente(agente, emitir, estruturada=agent.response_model is not None,
+                             intervalo=float(os.getenv("STREAM_INTERVAL", "0.3")))
+
+def executar_em_streaming(agent, query, transmissao: TransmissaoAgente):
+    """
+    agent.run com a resposta repassada à transmissão enquanto o modelo gera.
+    O Agent.run do agno desliga o streaming quando há response_model: aqui a execução interna
+    roda em modo stream e o texto acumulado é convertido ao response_model no fim, como o
+    Agent.run faria.
+    """
+    transmissao.iniciar()
+    show_tool_calls = agent.show_tool_calls
+    if agent.response_model is not None:
+        # Como no Agent.run: chamadas de ferramentas fora do texto (que precisa ser só o JSON)
+        agent.show_tool_calls = False
+    agent.stream = True
+    try:
+        for parcial in agent._run(message=query, stream=True):
+            if parcial.event == RunEvent.run_response.value and isinstance(parcial.content, str):
+                transmissao(parcial.content)
+    finally:
+        agent.stream = False
+        agent.show_tool_calls = show_tool_calls
+        transmissao.concluir()
+    run_response = agent.run_response
+    if agent.response_model is not None and isinstance(run_response.content, str):
+        estruturado = parse_structured_output(run_response.content, agent.response_model)
+        if estruturado is not None:
+            run_response.content = estruturado
+            run_response.content_type = agent.response_model.__name__
+    return run_response
+
+def executar_modelo(agent, query, prioridade: int = PRIORIDADE_AGENTE,
+                    transmissao: Optional[TransmissaoAgente] = None):
+    """
+    agent.run admitido pelo governador de chamadas ao LLM (limite global, orçamento e novas tentativas).
+    Com transmissão, a resposta é repassada aos clientes enquanto o modelo gera.
+    """
+    if transmissao is not None:
+        func, args = executar_em_streaming, (agent, query, transmissao)
+    else:
+        func, args = agent.run, (query,)
+    return get_governor("chat").executar(
+        func, *args,
+        prioridade=prioridade,
+        tokens_estimados=estimar_tokens_execucao(agent, query),
+        medir_tokens=lambda run_response: sum(tokens_da_execucao(run_response)),
+    )
+
+def executar_agente_sync(agent, query, transmissao: Optional[TransmissaoAgente] = None):
     """Executa um agente de forma síncrona"""
     try:
-        run_response = agent.run(query)
+        with span("agente", item=getattr(agent, "name", None) or "") as atributos:
+            run_response = executar_modelo(agent, query, transmissao=transmissao)
+            atributos["tokens_entrada"], atributos["tokens_saida"] = tokens_da_execucao(run_response)
+        _registrar_tokens(agent.name or "", atributos["tokens_entrada"], atributos["tokens_saida"])
         # Se o agente tem response_model definido, retorna o objeto estruturado
         if hasattr(agent, 'response_model') and agent.response_model and hasattr(run_response, 'content'):
             # O conteúdo já é o objeto do modelo quando response_model está definido
@@ -480,56 +793,176 @@ def executar_agente_sync(agent, query):
     except Exception as e:
         return f"Erro: {str(e)}"
 
-async def executar_agentes_paralelo(agents, agentes_ativos):
-    """Executa múltiplos agentes em paralelo"""
-    loop = asyncio.get_event_loop()
-
-    # Cria tasks para execução paralela
-    tasks = []
-    for agent_key in agentes_ativos:
-        if agent_key in QUERIES:
-            task = loop.run_in_executor(
-                None,
-                executar_agente_sync,
+def serializar_resultado(resultado):
+    """Converte o resultado de um agente para formato serializável"""
+    if hasattr(resultado, 'dict'):
+        return resultado.dict()
+    return str(resultado)
+
+def _buscar_resultado_em_cache(agent, query, documento: Optional[str]):
+    """Resultado de uma execução idêntica anterior: (chave, resultado ou None)"""
+    cache = get_result_cache()
+    if cache is None or documento is None:
+        return None, None
+    chave = ResultCache.gerar_chave(
+        documento, agent.name, agent.model.id, agent.instructions, query, agent.response_model,
+        configuracao_recuperacao(agent)
+    )
+    dados = cache.get(chave)
+    if dados is None:
+        return chave, None
+    return chave, restaurar_resultado(agent, dados)
+
+def configuracao_recuperacao(agent) -> str:
+    """
+    Configuração que determina o contexto recuperado pelo agente (chunking, embeddings e busca),
+    parte da chave do cache de resultados. Vazia para agentes que não consultam o documento.
+    """
+    if not agent.search_knowledge or agent.knowledge is None:
+        return ""
+    return repr((
+        "pecas" if chunking_por_pecas() else "fixo", CHUNK_SIZE, CHUNK_OVERLAP,
+        provedor_llm(), EMBEDDING_MODEL, dimensoes_embedding(),
+        recuperacao_compartilhada(), documentos_recuperados(agent.name, agent.knowledge.num_documents),
+        IndiceConfig.from_env(),
+    ))
+
+def restaurar_resultado(agent, dados):
+    """Resultado serializado de volta ao formato de uma execução real (instância do response_model)"""
+    if agent.response_model is not None and isinstance(dados, dict):
+        return agent.response_model(**dados)
+    return dados
+
+def resultado_valido(resultado) -> bool:
+    """Falso para o texto de erro devolvido por uma execução que falhou"""
+    return not (isinstance(resultado, str) and resultado.startswith("Erro:"))
+
+def _guardar_resultado_em_cache(chave: Optional[str], agent, documento: str, resultado) -> None:
+    """Guarda apenas resultados válidos (nem erro, nem saída fora do response_model)"""
+    if chave is None:
+        return
+    if agent.response_model is not None:
+        if not isinstance(resultado, agent.response_model):
+            return
+    elif not resultado_valido(resultado):
+        return
+    get_result_cache().set(chave, agent.name, documento, serializar_resultado(resultado))
+
+def executar_agente_memoizado(agent, query, documento: Optional[str] = None,
+                              transmissao: Optional[TransmissaoAgente] = None):
+    """Executa um agente reaproveitando o resultado de uma execução idêntica do mesmo documento"""
+    chave, resultado = _buscar_resultado_em_cache(agent, query, documento)
+    if resultado is not None:
+        registrar_span("agente", 0.0, item=agent.name, histograma=False, cache=True)
+        return resultado
+    resultado = executar_agente_sync(agent, query, transmissao)
+    _guardar_resultado_em_cache(chave, agent, documento, resultado)
+    return resultado
+
+def _executar_agente_com_eventos(agent_key, agent, query, emitir, documento=None):
+    """Executa um agente publicando início, a saída parcial (STREAM_AGENTS) e a conclusão"""
+    emitir("agente_iniciado", agente=agent_key)
+    inicio = time.perf_counter()
+    transmissao = criar_transmissao(agent_key, agent, emitir)
+    resultado = executar_agente_memoizado(agent, query, documento, transmissao)
+    emitir("agente_concluido", agente=agent_key, segundos=round(time.perf_counter() - inicio, 2),
+           resultado=serializar_resultado(resultado))
+    return resultado
+
+async def executar_agentes_paralelo(agents, agentes_ativos, emitir: Optional[Callable] = None,
+                                    on_resultado: Optional[Callable] = None, documento: Optional[str] = None):
+    """
+    Executa múltiplos agentes em paralelo.
+    on_resultado(agent_key, resultado) é chamado assim que cada agente termina (ordem de conclusão);
+    se devolver uma corrotina, ela é aguardada.
+    Com o hash do documento, resultados de execuções idênticas vêm do cache de resultados.
+    """
+    pipeline = get_pipeline()
+
+    async def executar(agent_key):
+        if emitir:
+            resultado = await pipeline.executar(
+                "agentes", _executar_agente_com_eventos,
+                agent_key, agents[agent_key], QUERIES[agent_key], emitir, documento
+            )
+        else:
+            resultado = await pipeline.executar(
+                "agentes",
+                executar_agente_memoizado,
                 agents[agent_key],
-                QUERIES[agent_key]
+                QUERIES[agent_key],
+                documento
             )
-            tasks.append((agent_key, task))
+        return agent_key, resultado
 
-    # Executa todos os agentes em paralelo
+    # Cria tasks para execução paralela no pool limitado do estágio de agentes
+    tasks = [
+        asyncio.ensure_future(executar(agent_key))
+        for agent_key in agentes_ativos if agent_key in QUERIES
+    ]
+
+    # Coleta na ordem de conclusão: um agente rápido não espera pelos lentos
     resultados = {}
-    for agent_key, task in tasks:
-        resultado = await task
-        resultados[agent_key] = resultado
+    try:
+        for proximo in asyncio.as_completed(tasks):
+            agent_key, resultado = await proximo
+            resultados[agent_key] = resultado
+            if on_resultado:
+                retorno = on_resultado(agent_key, resultado)
+                if asyncio.iscoroutine(retorno):
+                    await retorno
+    finally:
+        # Interrompida a coleta (cancelamento ou erro), os agentes restantes não são mais aguardados
+        for task in tasks:
+            task.cancel()
 
     return resultados
 
-def executar_relator_consolidado(agent_relator, resultados_outros_agentes):
+def entradas_obrigatorias_relator(agentes_ativos: List[str]) -> set:
+    """
+    Agentes cujos resultados o relator precisa antes de começar (RELATOR_REQUIRED_AGENTS).
+    O web é obrigatório por padrão: pesquisa_web_consolidada e fontes_web do relatório vêm dele.
+    """
+    configurados = os.getenv("RELATOR_REQUIRED_AGENTS", "defesa,acusacao,pesquisa,decisoes,web")
+    obrigatorios = {agente.strip() for agente in configurados.split(",") if agente.strip()}
+    return obrigatorios & set(agentes_ativos)
+
+def executar_relator_consolidado(agent_relator, resultados_outros_agentes, emitir: Optional[Callable] = None,
+                                 documento: Optional[str] = None):
     """Executa o agente relator com base nos resultados dos outros agentes"""
     try:
-        # Monta query consolidada com todos os resultados
-        query_consolidada = f"""
-        Consolide as seguintes informações de análise de processo criminal em um relatório neutro e exaustivo:
-
-        ANÁLISE DA DEFESA:
-        {str(resultados_outros_agentes.get('defesa', 'Não disponível'))}
-
-        ANÁLISE DA ACUSAÇÃO:
-        {str(resultados_outros_agentes.get('acusacao', 'Não disponível'))}
-
-        PESQUISA JURÍDICA:
-        {str(resultados_outros_agentes.get('pesquisa', 'Não disponível'))}
-
-        ANÁLISE DAS DECISÕES:
-        {str(resultados_outros_agentes.get('decisoes', 'Não disponível'))}
-
-        PESQUISA WEB COMPLEMENTAR:
-        {str(resultados_outros_agentes.get('web', 'Não disponível'))}
-
-        IMPORTANTE: Apenas consolide e organize as informações. NÃO faça juízo de valor.
-        """
-
-        run_response = agent_relator.run(query_consolidada)
+        if emitir:
+            emitir("relator_iniciado")
+        # Resultados dos agentes em texto compacto, sem repetições e dentro do orçamento de tokens
+        entrada, compactacao = compactar_resultados(
+            resultados_outros_agentes, orcamento_relator(), get_tokenizador(agent_relator.model.id)
+        )
+        query_consolidada = f"""Consolide as seguintes informações de análise de processo criminal em um relatório neutro e exaustivo.
+Itens marcados com [também: ...] foram citados por mais de um agente.
+
+{entrada}
+
+IMPORTANTE: Apenas consolide e organize as informações. NÃO faça juízo de valor."""
+
+        # Mesmas entradas (e mesmo prompt) já consolidadas para este documento
+        chave, resultado = _buscar_resultado_em_cache(agent_relator, query_consolidada, documento)
+        if resultado is not None:
+            registrar_span("relator", 0.0, histograma=False, cache=True)
+            if emitir:
+                emitir("relator_concluido", tokens_entrada=0, tokens_saida=0, cache=True)
+            return resultado
+
+        with span("relator", tokens_consulta=compactacao["tokens"],
+                  itens_repetidos=compactacao["itens_repetidos"],
+                  itens_omitidos=compactacao["itens_omitidos"]) as atributos:
+            run_response = executar_modelo(agent_relator, query_consolidada, PRIORIDADE_RELATOR,
+                                           criar_transmissao("relator", agent_relator, emitir))
+            tokens_entrada, tokens_saida = tokens_da_execucao(run_response)
+            atributos.update(tokens_entrada=tokens_entrada, tokens_saida=tokens_saida)
+        _registrar_tokens("relator", tokens_entrada, tokens_saida)
+        if emitir:
+            emitir("relator_concluido", tokens_entrada=tokens_entrada, tokens_saida=tokens_saida)
+        _guardar_resultado_em_cache(chave, agent_relator, documento, run_response.content)
         return run_response.content
     except Exception as e:
         return f"Erro: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca web compartilhada entre tarefas.
+
+Simula várias tarefas simultâneas cujo agente web faz 2-3 buscas de jurisprudência
+pelo tipo de crime do processo (consultas que se repetem entre processos do mesmo crime),
+contra uma busca local com latência simulada, e compara:
+  - direta: cada tarefa chama a busca externa (comportamento anterior)
+  - compartilhada: CachedSearchClient (cache com TTL, limite de taxa e coalescência)
+Reporta chamadas externas, consultas coalescidas, latência por busca e duração total.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.busca_web --tarefas 30 --latencia 0.8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agno.tools.tavily import TavilyTools
+
+from services.fake_models import FakeSearchClient
+from services.web_search import CachedSearchClient, SearchCache, TokenBucket
+
+CRIMES = ("tráfico de drogas", "roubo majorado", "furto qualificado", "homicídio qualificado",
+          "estelionato", "receptação", "porte ilegal de arma")
+
+CONSULTAS = (
+    "Jurisprudência STF STJ {crime} 2024 2025",
+    "Súmulas aplicáveis {crime}",
+    "Prisão preventiva {crime} entendimento STJ",
+)
+
+
+def _consultas_da_tarefa(rng: random.Random):
+    crime = rng.choice(CRIMES)
+    modelos = CONSULTAS[:rng.choice((2, 3))]
+    # Variações de caixa/espaço que a normalização da chave absorve
+    return [modelo.format(crime=crime) if rng.random() < 0.5 else f" {modelo.format(crime=crime).upper()} "
+            for modelo in modelos]
+
+
+def _executar_tarefas(ferramentas: TavilyTools, tarefas: int, semente: int):
+    rng = random.Random(semente)
+    consultas_por_tarefa = [_consultas_da_tarefa(rng) for _ in range(tarefas)]
+    latencias = []
+
+    def tarefa(consultas):
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            ferramentas.web_search_using_tavily(consulta)
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=tarefas) as executor:
+        list(executor.map(tarefa, consultas_por_tarefa))
+    return time.perf_counter() - inicio, sorted(latencias)
+
+
+def _p(valores, quantil):
+    return valores[min(len(valores) - 1, int(quantil * len(valores)))] if valores else float("nan")
+
+
+def executar(args) -> int:
+    resultados = {}
+    with tempfile.TemporaryDirectory() as diretorio:
+        # Direta: cada tarefa chama a busca externa
+        busca = FakeSearchClient(latencia=args.latencia)
+        ferramentas = TavilyTools(api_key="benchmark")
+        ferramentas.client = busca
+        duracao, latencias = _executar_tarefas(ferramentas, args.tarefas, args.semente)
+        resultados["direta"] = (duracao, latencias, busca.chamadas, 0)
+
+        # Compartilhada: cache entre tarefas, limite de taxa e coalescência
+        busca = FakeSearchClient(latencia=args.latencia)
+        cliente = CachedSearchClient(
+            client=busca,
+            cache=SearchCache(os.path.join(diretorio, "web_search_cache.db"), ttl_seconds=3600),
+            limitador=TokenBucket(taxa=args.taxa, capacidade=args.rajada),
+        )
+        ferramentas = TavilyTools(api_key="benchmark")
+        ferramentas.client = cliente
+        duracao, latencias = _executar_tarefas(ferramentas, args.tarefas, args.semente)
+        resultados["compartilhada"] = (duracao, latencias, busca.chamadas, cliente.stats()["coalescidas"])
+
+    print(f"{args.tarefas} tarefas simultâneas, busca com {args.latencia * 1000:.0f}ms, "
+          f"limite {args.taxa}/s (rajada {args.rajada})")
+    print(f"{'':>14} {'total':>8} {'p50':>8} {'p95':>8} {'externas':>9} {'coalescidas':>12}")
+    for nome, (duracao, latencias, chamadas, coalescidas) in resultados.items():
+        print(f"{nome:>14} {duracao:>7.2f}s {_p(latencias, 0.5):>7.3f}s {_p(latencias, 0.95):>7.3f}s "
+              f"{chamadas:>9} {coalescidas:>12}")
+
+    if resultados["compartilhada"][2] >= resultados["direta"][2]:
+        print("FALHA: a busca compartilhada fez mais chamadas externas que a direta")
+        return 1
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tarefas", type=int, default=30, help="Tarefas simultâneas")
+    parser.add_argument("--latencia", type=float, default=0.8, help="Latência simulada por busca externa (s)")
+    parser.add_argument("--taxa", type=float, default=5.0, help="Buscas externas por segundo (token bucket)")
+    parser.add_argument("--rajada", type=int, default=5, help="Capacidade do token bucket")
+    parser.add_argument("--semente", type=int, default=7, help="Semente da escolha de crimes por tarefa")
+    args = parser.parse_args()
+    raise SystemExit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
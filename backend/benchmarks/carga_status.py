@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: latência do polling de /status e /health durante ingestões.
+
+Sobe a API em um servidor uvicorn local, substitui a ingestão e os agentes por
+trabalho bloqueante simulado (sem chamadas externas) e dispara várias ingestões
+simultâneas enquanto mede a latência das rotas de consulta.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.carga_status --uploads 6 --ingestao 5 --limite-p95 0.2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+import agents
+import main
+from routers import analysis
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _simular_pipeline(segundos_ingestao: float, segundos_agente: float):
+    """Substitui ingestão e agentes por chamadas bloqueantes com duração fixa"""
+
+    def setup_knowledge_base(pdf_path, doc_hash=None, metadata=None, emitir=None):
+        time.sleep(segundos_ingestao)
+        return None
+
+    def setup_agents(knowledge_base, retrieval=None):
+        return {nome: None for nome in agents.QUERIES}
+
+    def executar_agente_sync(agent, query):
+        time.sleep(segundos_agente)
+        return "ok"
+
+    # Agentes simulados não têm modelo nem instruções para compor a chave do cache de resultados
+    os.environ["RESULT_CACHE"] = "false"
+
+    analysis.setup_knowledge_base = setup_knowledge_base
+    analysis.setup_retrieval = lambda knowledge_base: None
+    analysis.setup_agents = setup_agents
+    agents.executar_agente_sync = executar_agente_sync
+
+
+async def _medir(client: httpx.AsyncClient, url: str, latencias: list):
+    inicio = time.perf_counter()
+    resposta = await client.get(url)
+    resposta.raise_for_status()
+    latencias.append(time.perf_counter() - inicio)
+
+
+async def executar(args) -> int:
+    porta = _porta_livre()
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=porta, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base = f"http://127.0.0.1:{porta}"
+    latencias_status, latencias_health = [], []
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=30) as client:
+            task_ids = []
+            for i in range(args.uploads):
+                files = {"file": (f"processo_{i}.pdf", f"%PDF-1.4 {i}".encode(), "application/pdf")}
+                resposta = await client.post("/api/v1/upload", files=files, params={"agents": "defesa"})
+                resposta.raise_for_status()
+                task_ids.append(resposta.json()["task_id"])
+
+            inicio = time.perf_counter()
+            pendentes = set(task_ids)
+            erros = []
+            while pendentes and time.perf_counter() - inicio < args.timeout:
+                for task_id in list(pendentes):
+                    await _medir(client, f"/api/v1/status/{task_id}", latencias_status)
+                    task = (await client.get(f"/api/v1/status/{task_id}")).json()
+                    if task["status"] in ("completed", "error"):
+                        pendentes.discard(task_id)
+                    if task["status"] == "error":
+                        erros.append(task["error"])
+                await _medir(client, "/health", latencias_health)
+                await asyncio.sleep(args.intervalo)
+            duracao = time.perf_counter() - inicio
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    def resumo(nome, valores):
+        valores = sorted(valores)
+        p95 = valores[int(len(valores) * 0.95) - 1] if valores else 0.0
+        print(f"{nome:>8}: n={len(valores)} p50={statistics.median(valores) * 1000:.1f}ms "
+              f"p95={p95 * 1000:.1f}ms max={valores[-1] * 1000:.1f}ms")
+        return p95
+
+    print(f"{args.uploads} ingestões simultâneas concluídas em {duracao:.1f}s")
+    p95_status = resumo("status", latencias_status)
+    p95_health = resumo("health", latencias_health)
+
+    if erros:
+        print(f"FALHA: {len(erros)} tarefas com erro: {erros[0]}")
+        return 1
+    if pendentes:
+        print(f"FALHA: {len(pendentes)} tarefas não concluíram em {args.timeout}s")
+        return 1
+    if max(p95_status, p95_health) > args.limite_p95:
+        print(f"FALHA: p95 acima do limite de {args.limite_p95 * 1000:.0f}ms")
+        return 1
+    print("OK: event loop responsivo durante as ingestões")
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=6, help="Ingestões simultâneas")
+    parser.add_argument("--ingestao", type=float, default=5.0, help="Segundos de ingestão simulada")
+    parser.add_argument("--agente", type=float, default=1.0, help="Segundos por agente simulado")
+    parser.add_argument("--intervalo", type=float, default=0.05, help="Intervalo entre rodadas de polling")
+    parser.add_argument("--limite-p95", type=float, default=0.2, help="Latência p95 máxima aceitável (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Tempo máximo do teste (s)")
+    args = parser.parse_args()
+
+    _simular_pipeline(args.ingestao, args.agente)
+    sys.exit(asyncio.run(executar(args)))
+
+
+if __name__ == "__main__":
+    main_cli()
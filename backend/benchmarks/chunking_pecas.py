@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark da divisão por peças processuais, sem rede.
+
+Gera um processo sintético com peças de tamanhos conhecidos (denúncia, resposta à acusação,
+termo de audiência, alegações finais, sentença, despacho), com cabeçalho e rodapé do sistema
+em todas as páginas, e ingere com CHUNKING=fixo e CHUNKING=pecas. Para cada agente do
+documento, reporta os chunks e tokens entregues por consulta, a fração dos chunks que vem
+das peças do agente (pelas páginas do gabarito) e as linhas de cabeçalho/rodapé entregues.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.chunking_pecas --paginas-por-peca 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+# Provedor local: precisa estar definido antes de importar os agentes
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("FAKE_EMBEDDER_LATENCY", "0")
+
+import pymupdf
+
+from agents import AGENTES_DOCUMENTO, CHAT_MODEL, PECAS_POR_AGENTE, QUERIES, setup_knowledge_base, setup_retrieval
+from services.relator_input import get_tokenizador
+
+TERMOS = (
+    "réu testemunha prova prisão pena artigo código recurso laudo magistrado dosimetria "
+    "materialidade autoria interrogatório flagrante cautelar liberdade tráfico furto"
+).split()
+PECAS = (
+    ("denuncia", "EXCELENTÍSSIMO SENHOR JUIZ DE DIREITO\nO MINISTÉRIO PÚBLICO oferece\nDENÚNCIA", "Promotor de Justiça"),
+    ("resposta_acusacao", "RESPOSTA À ACUSAÇÃO", "Advogado OAB/SP 12345"),
+    ("termo_audiencia", "TERMO DE AUDIÊNCIA DE INSTRUÇÃO E JULGAMENTO", "Juiz de Direito"),
+    ("alegacoes_finais", "ALEGAÇÕES FINAIS", "Promotor de Justiça"),
+    ("sentenca", "SENTENÇA", "Juiz de Direito"),
+    ("despacho", "DESPACHO", "Juiz de Direito"),
+)
+CABECALHO = "PODER JUDICIÁRIO - TRIBUNAL DE JUSTIÇA"
+RODAPE = "Assinado eletronicamente por: SERVIDOR - 10/05/2024"
+
+
+def gerar_processo(caminho: str, paginas_por_peca: int, semente: int = 7) -> dict:
+    """PDF sintético; devolve página -> tipo da peça (gabarito)"""
+    rng = random.Random(semente)
+    doc = pymupdf.open()
+    gabarito = {}
+    for tipo, titulo, assinatura in PECAS:
+        for i in range(paginas_por_peca):
+            page = doc.new_page()
+            linhas = [" ".join(rng.choices(TERMOS, k=11)) for _ in range(38)]
+            if i == 0:
+                linhas.insert(0, titulo)
+            if i == paginas_por_peca - 1:
+                linhas += ["Fulano de Tal", assinatura]
+            gabarito[page.number + 1] = tipo
+            texto = "\n".join([CABECALHO] + linhas + [RODAPE, f"Num. 4821 - Pág. {page.number + 1}"])
+            page.insert_textbox(pymupdf.Rect(40, 30, 560, 820), texto, fontsize=8)
+    doc.save(caminho)
+    doc.close()
+    return gabarito
+
+
+class _Agente:
+    def __init__(self, name: str):
+        self.name = name
+
+
+def medir(modo: str, pdf: str, gabarito: dict) -> dict:
+    os.environ["CHUNKING"] = modo
+    knowledge_base = setup_knowledge_base(pdf)
+    retrieval = setup_retrieval(knowledge_base)
+    retrieval.prefetch_agentes({agente: QUERIES[agente] for agente in AGENTES_DOCUMENTO})
+    tokenizador = get_tokenizador(CHAT_MODEL)
+    resultados = {}
+    for agente in AGENTES_DOCUMENTO:
+        documentos = retrieval.retriever(agent=_Agente(agente), query=QUERIES[agente]) or []
+        pecas = PECAS_POR_AGENTE.get(agente)
+        relevantes = sum(1 for documento in documentos
+                         if pecas is None or gabarito.get(documento["meta_data"].get("page")) in pecas)
+        resultados[agente] = {
+            "chunks": len(documentos),
+            "tokens": sum(tokenizador.contar(documento["content"]) for documento in documentos),
+            "relevantes": relevantes / max(len(documentos), 1),
+            "ruido": sum(documento["content"].count(CABECALHO) + documento["content"].count("Assinado eletronicamente")
+                         for documento in documentos),
+        }
+    resultados["_linhas"] = knowledge_base.vector_db.table.count_rows()
+    return resultados
+
+
+def executar(args) -> int:
+    with tempfile.TemporaryDirectory(prefix="benchmark_pecas_") as diretorio:
+        os.environ["VECTOR_STORE_URI"] = os.path.join(diretorio, "lancedb")
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(diretorio, "embeddings.db")
+        resultados = {}
+        for modo in ("fixo", "pecas"):
+            pdf = os.path.join(diretorio, f"processo_{modo}.pdf")
+            gabarito = gerar_processo(pdf, args.paginas_por_peca)
+            # Comentário no fim do arquivo: outro hash, então outra tabela no vector store
+            with open(pdf, "ab") as arquivo:
+                arquivo.write(f"%{modo}\n".encode())
+            resultados[modo] = medir(modo, pdf, gabarito)
+
+    print(f"Processo sintético: {len(PECAS)} peças x {args.paginas_por_peca} páginas; "
+          f"linhas na tabela: fixo {resultados['fixo']['_linhas']}, pecas {resultados['pecas']['_linhas']}")
+    print(f"{'agente':>10} {'modo':>6} {'chunks':>7} {'tokens':>7} {'das peças':>10} {'cab./rodapé':>12}")
+    for agente in AGENTES_DOCUMENTO:
+        for modo in ("fixo", "pecas"):
+            r = resultados[modo][agente]
+            print(f"{agente:>10} {modo:>6} {r['chunks']:>7} {r['tokens']:>7} {r['relevantes']:>9.0%} {r['ruido']:>12}")
+    total = {modo: sum(resultados[modo][agente]["tokens"] for agente in AGENTES_DOCUMENTO) for modo in resultados}
+    print(f"tokens recuperados por tarefa: fixo {total['fixo']}, pecas {total['pecas']} "
+          f"({1 - total['pecas'] / max(total['fixo'], 1):.0%} menos)")
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas-por-peca", type=int, default=4, help="Páginas de cada peça do processo sintético")
+    args = parser.parse_args()
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
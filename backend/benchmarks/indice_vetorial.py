@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recall x latência da busca vetorial por tamanho de tabela, sem rede.
+
+Para cada tamanho de tabela, gera chunks sintéticos com vetores agrupados por tema (como
+embeddings de um processo: muitos trechos parecidos) e compara, contra a busca exata na
+dimensão completa:
+  - exata: varredura completa (o que as tabelas abaixo de VECTOR_INDEX_MIN_ROWS fazem)
+  - ivf-pq: índice criado por services.vector_index.criar_indice_ann, com e sem refine_factor
+  - dimensões reduzidas: os mesmos vetores truncados e renormalizados (como o parâmetro
+    dimensions do text-embedding-3), com busca exata e com IVF-PQ
+Reporta recall@k, latência p50/p95 por consulta, tempo de indexação e tamanho em disco.
+
+Com --hibrida, mede também citações exatas ("art. N da Lei X", número do processo) presentes
+em um único chunk: a consulta leva o vetor do tema e o texto da citação. Os vetores
+sintéticos não codificam os números (como embeddings reais, que os aproximam mal), então a
+busca vetorial só acerta por acaso; a híbrida (BM25 + vetor) deve encontrá-los.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.indice_vetorial --linhas 2000,10000,30000 --dimensoes 1536,512 --hibrida
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+
+from services.fake_models import FakeEmbedder
+from services.ingestion import criar_tabela
+from services.vector_index import COLUNA_TEXTO, IndiceConfig, criar_indice_ann, indexar
+
+TEMAS = 64
+TERMOS = (
+    "defesa acusação réu testemunha prova sentença prisão preventiva dosimetria pena "
+    "jurisprudência súmula recurso habeas corpus denúncia laudo interrogatório magistrado"
+).split()
+
+
+def gerar_vetores(linhas: int, dimensoes: int, rng: np.random.Generator):
+    """
+    Vetores normalizados em torno de TEMAS centros, com a variância concentrada nas primeiras
+    dimensões (como embeddings treinados para truncamento); devolve (vetores, tema de cada linha, centros)
+    """
+    espectro = ((1 + np.arange(dimensoes) / 32) ** -1.0).astype(np.float32)
+    centros = rng.normal(size=(TEMAS, dimensoes)).astype(np.float32) * espectro
+    temas = rng.integers(0, TEMAS, size=linhas)
+    vetores = centros[temas] + rng.normal(scale=1.2, size=(linhas, dimensoes)).astype(np.float32) * espectro
+    return _normalizar(vetores), temas, centros
+
+
+def _normalizar(vetores: np.ndarray) -> np.ndarray:
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+
+def gerar_textos(linhas: int, citacoes: int, rng: np.random.Generator):
+    """Textos dos chunks; as `citacoes` primeiras linhas citam um artigo/processo que só elas têm"""
+    textos, alvos = [], []
+    for i in range(linhas):
+        texto = " ".join(rng.choice(TERMOS, size=40))
+        if i < citacoes:
+            citacao = f"art. {100 + i} da Lei {10000 + 7 * i}" if i % 2 else f"processo {7000000 + 13 * i}-55.2023"
+            texto = f"{texto} conforme {citacao} {texto}"
+            alvos.append(citacao)
+        textos.append(texto)
+    return textos, alvos
+
+
+def criar(diretorio: str, nome: str, vetores: np.ndarray, textos, tipo_peca: str = "outro") -> LanceDb:
+    """Tabela no esquema da ingestão (criar_tabela), gravada em blocos Arrow"""
+    vector_db = LanceDb(table_name=nome, uri=diretorio, search_type=SearchType.vector,
+                        embedder=FakeEmbedder(dimensions=vetores.shape[1], latencia=0.0))
+    criar_tabela(vector_db)
+    schema = vector_db.table.schema
+    for inicio in range(0, len(vetores), 5000):
+        bloco = vetores[inicio:inicio + 5000]
+        ids = [str(i) for i in range(inicio, inicio + len(bloco))]
+        conteudos = textos[inicio:inicio + len(bloco)]
+        colunas = {
+            vector_db._vector_col: pa.FixedSizeListArray.from_arrays(pa.array(bloco.reshape(-1)), bloco.shape[1]),
+            vector_db._id: pa.array(ids),
+            "payload": pa.array([json.dumps({"name": "processo", "meta_data": {}, "content": c}) for c in conteudos]),
+            COLUNA_TEXTO: pa.array(conteudos),
+        }
+        colunas.update({campo.name: pa.array([tipo_peca] * len(bloco)) for campo in schema if campo.name not in colunas})
+        vector_db.table.add(pa.Table.from_arrays([colunas[campo.name] for campo in schema], schema=schema))
+    return vector_db
+
+
+def buscar(vector_db: LanceDb, consultas: np.ndarray, k: int, nprobes: int = 0, refine: int = 0):
+    """Ids do top-k e latência (s) de cada consulta"""
+    resultados, latencias = [], []
+    for vetor in consultas:
+        inicio = time.perf_counter()
+        busca = vector_db.table.search(vetor, vector_column_name=vector_db._vector_col).limit(k)
+        if nprobes:
+            busca.nprobes(nprobes)
+        if refine:
+            busca.refine_factor(refine)
+        ids = busca.select([vector_db._id]).to_arrow()[vector_db._id].to_pylist()
+        latencias.append(time.perf_counter() - inicio)
+        resultados.append(set(ids))
+    return resultados, latencias
+
+
+def tamanho(diretorio: str, nome: str) -> int:
+    caminho = os.path.join(diretorio, f"{nome}.lance")
+    return sum(os.path.getsize(os.path.join(raiz, arquivo))
+               for raiz, _, arquivos in os.walk(caminho) for arquivo in arquivos)
+
+
+def _linha(tabela, dimensoes, modo, recall, latencias, indexacao, bytes_disco):
+    p50, p95 = np.percentile(np.asarray(latencias) * 1000, [50, 95])
+    print(f"{tabela:>8} {dimensoes:>5} {modo:<24} {recall:>7.1%} {p50:>8.2f}ms {p95:>8.2f}ms "
+          f"{indexacao:>8.1f}s {bytes_disco / 1024 ** 2:>9.1f}MB")
+
+
+def medir_tamanho(diretorio: str, linhas: int, dimensoes_lista, args, rng) -> None:
+    completa = max(dimensoes_lista)
+    vetores, temas, _ = gerar_vetores(linhas, completa, rng)
+    textos, _ = gerar_textos(linhas, 0, rng)
+    # Consultas: chunks existentes com ruído (parecidas com o texto, não idênticas)
+    escolhidos = rng.choice(linhas, size=args.consultas, replace=False)
+    consultas = _normalizar(vetores[escolhidos] + rng.normal(scale=0.05, size=(args.consultas, completa)))
+    verdade = None
+
+    for dimensoes in sorted(dimensoes_lista, reverse=True):
+        nome = f"t{linhas}_{dimensoes}"
+        reduzidos = _normalizar(vetores[:, :dimensoes])
+        vector_db = criar(diretorio, nome, reduzidos, textos)
+        consultas_dim = _normalizar(consultas[:, :dimensoes])
+
+        exatos, latencias = buscar(vector_db, consultas_dim, args.k)
+        if verdade is None:
+            verdade = exatos
+        recall = np.mean([len(a & b) / args.k for a, b in zip(exatos, verdade)])
+        _linha(linhas, dimensoes, "exata", recall, latencias, 0.0, tamanho(diretorio, nome))
+
+        inicio = time.perf_counter()
+        criado = criar_indice_ann(diretorio, nome, vector_db._vector_col)
+        indexacao = time.perf_counter() - inicio
+        if not criado:
+            print(f"{linhas:>8} {dimensoes:>5} ivf-pq: índice não criado")
+            continue
+        # O índice foi criado por outra conexão: reabre a tabela na versão nova
+        vector_db.table = vector_db.connection.open_table(nome)
+        bytes_disco = tamanho(diretorio, nome)
+        for refine in (0, args.refine):
+            achados, latencias = buscar(vector_db, consultas_dim, args.k, args.nprobes, refine)
+            recall = np.mean([len(a & b) / args.k for a, b in zip(achados, verdade)])
+            _linha(linhas, dimensoes, f"ivf-pq np={args.nprobes} rf={refine}", recall, latencias,
+                   indexacao, bytes_disco)
+
+
+def medir_hibrida(diretorio: str, linhas: int, dimensoes: int, args, rng) -> None:
+    vetores, temas, centros = gerar_vetores(linhas, dimensoes, rng)
+    textos, alvos = gerar_textos(linhas, args.citacoes, rng)
+    vector_db = criar(diretorio, f"h{linhas}", vetores, textos)
+    info = indexar(vector_db, IndiceConfig(min_linhas_ann=0, hibrida=True))
+
+    acertos = {"vetor": 0, "hibrida": 0}
+    latencias = {"vetor": [], "hibrida": []}
+    for i, citacao in enumerate(alvos):
+        # O vetor da consulta traz o tema do trecho, não a citação
+        vetor = _normalizar(centros[temas[i]][None, :])[0]
+        for modo in ("vetor", "hibrida"):
+            inicio = time.perf_counter()
+            if modo == "vetor":
+                busca = vector_db.table.search(vetor, vector_column_name=vector_db._vector_col)
+            else:
+                busca = vector_db.table.search(query_type="hybrid", vector_column_name=vector_db._vector_col) \
+                    .vector(vetor).text(citacao)
+            ids = busca.limit(args.k).to_pandas()[vector_db._id].tolist()
+            latencias[modo].append(time.perf_counter() - inicio)
+            acertos[modo] += str(i) in ids
+    print(f"Citações exatas: {len(alvos)} consultas em {linhas} chunks ({dimensoes} dim), top-{args.k}, "
+          f"índice FTS em {info['segundos']:.1f}s")
+    for modo in ("vetor", "hibrida"):
+        p50 = np.percentile(np.asarray(latencias[modo]) * 1000, 50)
+        print(f"  {modo:<8} acerto {acertos[modo] / len(alvos):>6.1%}   p50 {p50:.2f}ms")
+
+
+def executar(args) -> int:
+    rng = np.random.default_rng(7)
+    print(f"top-{args.k}, {args.consultas} consultas; recall contra a busca exata em {max(args.dimensoes)} dimensões")
+    print(f"{'linhas':>8} {'dim':>5} {'modo':<24} {'recall':>7} {'p50':>10} {'p95':>10} {'índice':>9} {'disco':>11}")
+    with tempfile.TemporaryDirectory(prefix="benchmark_indice_") as diretorio:
+        for linhas in args.linhas:
+            medir_tamanho(diretorio, linhas, args.dimensoes, args, rng)
+        if args.hibrida:
+            medir_hibrida(diretorio, max(args.linhas), min(args.dimensoes), args, rng)
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=lambda v: [int(p) for p in v.split(",")], default=[2000, 10000, 30000],
+                        help="Tamanhos de tabela (chunks), separados por vírgula")
+    parser.add_argument("--dimensoes", type=lambda v: [int(p) for p in v.split(",")], default=[1536, 512],
+                        help="Dimensões dos vetores; a maior é a referência do recall")
+    parser.add_argument("--consultas", type=int, default=50, help="Consultas por configuração")
+    parser.add_argument("--k", type=int, default=12, help="Chunks por consulta")
+    parser.add_argument("--nprobes", type=int, default=20, help="Partições IVF visitadas por consulta")
+    parser.add_argument("--refine", type=int, default=50, help="refine_factor na segunda medição do IVF-PQ")
+    parser.add_argument("--hibrida", action="store_true", help="Mede também citações exatas com busca híbrida")
+    parser.add_argument("--citacoes", type=int, default=40, help="Consultas de citação exata (com --hibrida)")
+    args = parser.parse_args()
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
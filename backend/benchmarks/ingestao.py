@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark da ingestão de um documento no LanceDB, sem rede.
+
+Gera PDFs sintéticos e ingere cada um de duas formas, com o mesmo reader, chunking e um
+embedder local com latência simulada por chamada (cache de embeddings vazio a cada execução):
+  - load: knowledge_base.load(recreate=True) do agno (extrai tudo, depois embeda chunk a
+    chunk, depois grava tudo de uma vez)
+  - streaming: IngestaoStreaming (páginas -> chunks -> lotes de embeddings em paralelo ->
+    appends em bloco)
+Reporta duração, instante da primeira escrita na tabela, chamadas ao embedder, linhas
+gravadas e pico de memória Python (tracemalloc, em uma segunda execução).
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.ingestao --paginas 100,500 --latencia 0.02
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pymupdf
+from agno.document.chunking.fixed import FixedSizeChunking
+from agno.knowledge.pdf import PDFKnowledgeBase
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+
+from agents import CHUNK_OVERLAP, CHUNK_SIZE
+from services.embedding_cache import CachedEmbedder, EmbeddingCache
+from services.fake_models import FakeEmbedder
+from services.ingestion import IngestaoStreaming
+from services.pdf_service import ProcessoPDFReader
+
+TERMOS = (
+    "defesa acusação réu testemunha prova sentença prisão preventiva dosimetria pena "
+    "artigo código penal jurisprudência súmula recurso habeas corpus denúncia laudo "
+    "interrogatório magistrado decisão liberdade provisória medida cautelar tráfico furto"
+).split()
+
+
+def gerar_pdf(caminho: str, paginas: int, semente: int = 7) -> None:
+    rng = random.Random(semente)
+    doc = pymupdf.open()
+    for numero in range(paginas):
+        page = doc.new_page()
+        linhas = [" ".join(rng.choices(TERMOS, k=12)) for _ in range(40)]
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), f"Fls. {numero + 1}\n" + "\n".join(linhas), fontsize=9)
+    doc.save(caminho)
+    doc.close()
+
+
+def ingerir(modo: str, pdf: str, diretorio: str, latencia: float, medir_memoria: bool) -> dict:
+    execucao = f"{modo}_{time.monotonic_ns()}"
+    modelo = FakeEmbedder(latencia=latencia)
+    embedder = CachedEmbedder(
+        embedder=modelo,
+        cache=EmbeddingCache(os.path.join(diretorio, f"{execucao}.db")),
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+    )
+    reader = ProcessoPDFReader(use_ocr=True)
+    knowledge_base = PDFKnowledgeBase(
+        path=pdf,
+        reader=reader,
+        chunking_strategy=FixedSizeChunking(chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP),
+        vector_db=LanceDb(table_name=execucao, uri=diretorio, search_type=SearchType.vector, embedder=embedder),
+    )
+    vector_db = knowledge_base.vector_db
+    vector_db.drop()
+    vector_db.create()
+    chamadas_schema = modelo.chamadas
+
+    # Instante da primeira escrita na tabela (o load do agno grava tudo no final)
+    primeira_escrita = []
+    tabela = vector_db.table
+    add_original = tabela.add
+
+    def add_medido(*args, **kwargs):
+        if not primeira_escrita:
+            primeira_escrita.append(time.perf_counter())
+        return add_original(*args, **kwargs)
+
+    tabela.add = add_medido
+
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    if modo == "load":
+        knowledge_base.load(recreate=False)
+    else:
+        IngestaoStreaming(vector_db, embedder).carregar(reader.iter_documents(pdf))
+    duracao = time.perf_counter() - inicio
+    pico = 0
+    if medir_memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    ids = set(tabela.to_arrow()["id"].to_pylist())
+    return {
+        "duracao": duracao,
+        "primeira_escrita": (primeira_escrita[0] - inicio) if primeira_escrita else duracao,
+        "chamadas": modelo.chamadas - chamadas_schema,
+        "ids": ids,
+        "pico": pico,
+    }
+
+
+def executar(args) -> int:
+    falhou = False
+    print(f"Embedder simulado: {args.latencia * 1000:.0f}ms/chamada; chunks {CHUNK_SIZE}/{CHUNK_OVERLAP}")
+    print(f"{'páginas':>8} {'modo':>10} {'total':>8} {'1ª escrita':>11} {'chamadas':>9} {'linhas':>7} {'pico Python':>12}")
+    with tempfile.TemporaryDirectory(prefix="benchmark_ingestao_") as diretorio:
+        for paginas in args.paginas:
+            pdf = os.path.join(diretorio, f"doc_{paginas}.pdf")
+            gerar_pdf(pdf, paginas)
+            resultados = {}
+            for modo in ("load", "streaming"):
+                resultado = ingerir(modo, pdf, diretorio, args.latencia, medir_memoria=False)
+                resultado["pico"] = ingerir(modo, pdf, diretorio, 0.0, medir_memoria=True)["pico"]
+                resultados[modo] = resultado
+                print(f"{paginas:>8} {modo:>10} {resultado['duracao']:>7.2f}s {resultado['primeira_escrita']:>10.2f}s "
+                      f"{resultado['chamadas']:>9} {len(resultado['ids']):>7} {resultado['pico'] / 1024 ** 2:>10.1f}MB")
+            if resultados["load"]["ids"] != resultados["streaming"]["ids"]:
+                print(f"FALHA ({paginas} páginas): as tabelas gravadas diferem")
+                falhou = True
+            else:
+                print(f"{'':>8} ganho: {resultados['load']['duracao'] / resultados['streaming']['duracao']:.1f}x, "
+                      f"mesmas {len(resultados['streaming']['ids'])} linhas")
+    return 1 if falhou else 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=lambda v: [int(p) for p in v.split(",")], default=[100, 500],
+                        help="Tamanhos de documento (páginas), separados por vírgula")
+    parser.add_argument("--latencia", type=float, default=0.02, help="Latência simulada por chamada ao embedder (s)")
+    args = parser.parse_args()
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
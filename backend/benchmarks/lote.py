@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark do envio em lote, sem rede.
+
+Gera um dossiê sintético (documentos distintos mais cópias repetidas), sobe a API em um
+servidor uvicorn local com LLM_PROVIDER=fake e processa o dossiê de duas formas, com
+documentos de conteúdo diferente em cada uma (caches frios):
+  - individual: um /api/v1/upload por arquivo, todos enviados de uma vez;
+  - lote: um único /api/v1/batch/upload com todos os arquivos.
+Reporta o tempo até todos os documentos concluírem e a vazão por documento.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.lote --documentos 12 --repetidos 3 --paginas 30 --latencia-llm 2
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Ambiente isolado e offline: precisa estar definido antes de importar a aplicação
+_DIRETORIO = tempfile.mkdtemp(prefix="benchmark_lote_")
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("VECTOR_STORE_URI", os.path.join(_DIRETORIO, "lancedb"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_DIRETORIO, "embedding_cache.db"))
+os.environ.setdefault("TASK_STORE_PATH", os.path.join(_DIRETORIO, "tasks.db"))
+os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(_DIRETORIO, "result_cache.db"))
+os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(_DIRETORIO, "reports"))
+
+import httpx
+import uvicorn
+
+import main
+from benchmarks.carga_status import _porta_livre
+from benchmarks import pipeline as benchmark_pipeline
+from benchmarks.pipeline import AGENTES, gerar_pdf
+
+
+def gerar_dossie(prefixo: str, documentos: int, repetidos: int, paginas: int, semente: int) -> list:
+    """
+    Caminhos dos arquivos do dossiê: `documentos` distintos, os primeiros `repetidos` seguidos
+    de uma cópia (peças juntadas de novo em manifestações seguintes)
+    """
+    caminhos = []
+    for indice in range(documentos):
+        caminho = os.path.join(_DIRETORIO, f"{prefixo}_{indice}.pdf")
+        gerar_pdf(caminho, paginas, semente=semente + indice)
+        caminhos.append(caminho)
+        if indice < repetidos:
+            copia = os.path.join(_DIRETORIO, f"{prefixo}_{indice}_copia.pdf")
+            shutil.copyfile(caminho, copia)
+            caminhos.append(copia)
+    return caminhos
+
+
+def aguardar(client: httpx.Client, urls: list, timeout: float) -> tuple:
+    """Consulta as URLs de status até todas finalizarem; retorna (pendentes, erros)"""
+    inicio = time.perf_counter()
+    pendentes = set(urls)
+    erros = []
+    while pendentes and time.perf_counter() - inicio < timeout:
+        for url in list(pendentes):
+            status = client.get(url).json()
+            if status["status"] in ("completed", "error"):
+                pendentes.discard(url)
+                if status["status"] == "error":
+                    erros.append(url)
+        time.sleep(0.2)
+    return len(pendentes), erros
+
+
+def executar_individual(client: httpx.Client, base: str, caminhos: list, timeout: float) -> dict:
+    inicio = time.perf_counter()
+    urls = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            resposta = client.post(f"{base}/upload", params={"agents": AGENTES},
+                                   files={"file": (os.path.basename(caminho), arquivo, "application/pdf")})
+        resposta.raise_for_status()
+        urls.append(f"{base}/status/{resposta.json()['task_id']}")
+    pendentes, erros = aguardar(client, urls, timeout)
+    return {"modo": "individual", "duracao": time.perf_counter() - inicio, "analisados": len(urls),
+            "pendentes": pendentes, "erros": erros}
+
+
+def executar_lote(client: httpx.Client, base: str, caminhos: list, timeout: float) -> dict:
+    inicio = time.perf_counter()
+    arquivos = [open(caminho, "rb") for caminho in caminhos]
+    try:
+        resposta = client.post(f"{base}/batch/upload", params={"agents": AGENTES}, files=[
+            ("files", (os.path.basename(caminho), arquivo, "application/pdf"))
+            for caminho, arquivo in zip(caminhos, arquivos)
+        ])
+    finally:
+        for arquivo in arquivos:
+            arquivo.close()
+    resposta.raise_for_status()
+    lote = resposta.json()
+    pendentes, erros = aguardar(client, [f"{base}/batch/{lote['batch_id']}"], timeout)
+    if not pendentes:
+        contagem = client.get(f"{base}/batch/{lote['batch_id']}").json()["contagem"]
+        erros = [f"{contagem['error']} documento(s) com erro"] if contagem.get("error") else []
+    return {"modo": "lote", "duracao": time.perf_counter() - inicio, "analisados": len(lote["documentos"]),
+            "pendentes": pendentes, "erros": erros}
+
+
+def executar(args) -> int:
+    porta = _porta_livre()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{porta}/api/v1"
+    total = args.documentos + args.repetidos
+    try:
+        with httpx.Client(timeout=args.timeout) as client:
+            resultados = [
+                executar_individual(client, base, gerar_dossie(
+                    "individual", args.documentos, args.repetidos, args.paginas, semente=1000), args.timeout),
+                executar_lote(client, base, gerar_dossie(
+                    "lote", args.documentos, args.repetidos, args.paginas, semente=2000), args.timeout),
+            ]
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        shutil.rmtree(_DIRETORIO, ignore_errors=True)
+        shutil.rmtree(benchmark_pipeline._DIRETORIO, ignore_errors=True)
+
+    print(f"Dossiê: {args.documentos} documentos distintos + {args.repetidos} cópias, {args.paginas} páginas cada; "
+          f"LLM simulado: {args.latencia_llm:.2f}s/resposta, embedder: {args.latencia_embedder * 1000:.0f}ms/chamada")
+    print(f"{'modo':>10} {'total':>8} {'analisados':>11} {'s/arquivo':>10} {'arquivos/min':>13}")
+    falhou = False
+    for r in resultados:
+        print(f"{r['modo']:>10} {r['duracao']:>7.1f}s {r['analisados']:>11} {r['duracao'] / total:>9.2f}s "
+              f"{60 * total / r['duracao']:>13.1f}")
+        if r["erros"] or r["pendentes"]:
+            print(f"FALHA ({r['modo']}): {len(r['erros'])} com erro, {r['pendentes']} não concluído(s)")
+            falhou = True
+    print(f"Ganho de vazão do lote: {resultados[0]['duracao'] / resultados[1]['duracao']:.2f}x")
+    return 1 if falhou else 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=12, help="Documentos distintos no dossiê")
+    parser.add_argument("--repetidos", type=int, default=3, help="Cópias repetidas de documentos do dossiê")
+    parser.add_argument("--paginas", type=int, default=30, help="Páginas por documento")
+    parser.add_argument("--latencia-llm", type=float, default=2.0, help="Latência simulada por resposta do LLM (s)")
+    parser.add_argument("--latencia-embedder", type=float, default=0.05, help="Latência simulada por chamada de embedding (s)")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Tempo máximo por modo (s)")
+    args = parser.parse_args()
+
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latencia_llm)
+    os.environ["FAKE_EMBEDDER_LATENCY"] = str(args.latencia_embedder)
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark da montagem dos agentes por tarefa, sem rede externa.
+
+Aponta o cliente OpenAI para um servidor HTTP local (respostas fixas, latência simulada) e mede:
+  - montagem: tempo de setup_agents mais a criação dos clientes que os modelos usam na
+    primeira chamada, por tarefa;
+  - conexões: tarefas concorrentes, cada agente fazendo uma chamada ao modelo; conta os
+    clientes HTTP distintos e as conexões TCP abertas no servidor (cada conexão nova seria
+    um handshake TLS com a API real).
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.montagem_agentes --tarefas 200 --concorrentes 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Provedor real com chave fictícia: precisa estar definido antes de importar os agentes
+os.environ["LLM_PROVIDER"] = "openai"
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from agno.knowledge.pdf import PDFKnowledgeBase
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+
+from agents import CHAT_MODEL, setup_agents, setup_retrieval
+from services.fake_models import FakeEmbedder
+
+RESPOSTA = json.dumps({
+    "id": "benchmark", "object": "chat.completion", "created": 0, "model": CHAT_MODEL,
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode()
+
+
+class _ServidorModelo(ThreadingHTTPServer):
+    daemon_threads = True
+    conexoes = 0
+    latencia = 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with _contador_lock:
+            self.server.conexoes += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latencia)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPOSTA)))
+        self.end_headers()
+        self.wfile.write(RESPOSTA)
+
+    def log_message(self, *args):
+        pass
+
+
+_contador_lock = threading.Lock()
+
+
+def _knowledge_base(diretorio: str) -> PDFKnowledgeBase:
+    """Knowledge base de uma tarefa (a montagem dos agentes não consulta a tabela)"""
+    return PDFKnowledgeBase(
+        path=diretorio,
+        num_documents=12,
+        vector_db=LanceDb(table_name="benchmark", uri=diretorio, search_type=SearchType.vector,
+                          embedder=FakeEmbedder(latencia=0.0)),
+    )
+
+
+def montar(knowledge_base):
+    """Montagem de uma tarefa: agentes e os clientes que seus modelos usarão"""
+    agents = setup_agents(knowledge_base, setup_retrieval(knowledge_base))
+    clientes = [agent.model.get_client() for agent in agents.values()]
+    return agents, clientes
+
+
+def medir_montagem(knowledge_base, tarefas: int) -> dict:
+    montar(knowledge_base)  # aquecimento (imports e singletons)
+    clientes = []  # referências mantidas: ids de clientes descartados seriam reaproveitados
+    inicio = time.perf_counter()
+    for _ in range(tarefas):
+        _, usados = montar(knowledge_base)
+        clientes.extend(cliente._client for cliente in usados)
+    duracao = time.perf_counter() - inicio
+    return {"ms_por_tarefa": 1000 * duracao / tarefas, "clientes_http": len({id(c) for c in clientes})}
+
+
+def medir_conexoes(knowledge_base, servidor: _ServidorModelo, tarefas: int, concorrentes: int) -> dict:
+    servidor.conexoes = 0
+
+    def tarefa(_):
+        _, clientes = montar(knowledge_base)
+        for cliente in clientes:
+            cliente.chat.completions.create(model=CHAT_MODEL, messages=[{"role": "user", "content": "ping"}])
+        return len(clientes)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrentes) as executor:
+        chamadas = sum(executor.map(tarefa, range(tarefas)))
+    return {"segundos": time.perf_counter() - inicio, "chamadas": chamadas, "conexoes": servidor.conexoes}
+
+
+def executar(args) -> int:
+    servidor = _ServidorModelo(("127.0.0.1", 0), _Handler)
+    servidor.latencia = args.latencia
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_montagem_") as diretorio:
+        knowledge_base = _knowledge_base(diretorio)
+        montagem = medir_montagem(knowledge_base, args.tarefas)
+        conexoes = medir_conexoes(knowledge_base, servidor, args.tarefas_concorrentes, args.concorrentes)
+    servidor.shutdown()
+
+    print(f"Montagem: {args.tarefas} tarefas")
+    print(f"  {montagem['ms_por_tarefa']:.2f} ms/tarefa, {montagem['clientes_http']} cliente(s) HTTP criados")
+    print(f"Chamadas: {args.tarefas_concorrentes} tarefas, {args.concorrentes} concorrentes, "
+          f"latência do modelo {args.latencia * 1000:.0f}ms")
+    print(f"  {conexoes['chamadas']} chamadas em {conexoes['segundos']:.2f}s, "
+          f"{conexoes['conexoes']} conexões TCP abertas "
+          f"({conexoes['chamadas'] / max(conexoes['conexoes'], 1):.1f} chamadas/conexão)")
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tarefas", type=int, default=200, help="Tarefas montadas na medição de montagem")
+    parser.add_argument("--tarefas-concorrentes", type=int, default=40, help="Tarefas na medição de conexões")
+    parser.add_argument("--concorrentes", type=int, default=8, help="Tarefas simultâneas na medição de conexões")
+    parser.add_argument("--latencia", type=float, default=0.02, help="Latência simulada por resposta do modelo (s)")
+    args = parser.parse_args()
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
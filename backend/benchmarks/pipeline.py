@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark ponta a ponta do pipeline, sem rede.
+
+Gera PDFs sintéticos, sobe a API em um servidor uvicorn local com LLM_PROVIDER=fake
+(modelo de chat e embedder locais com latência configurável) e conduz cada documento
+por /api/v1/upload até a conclusão, baixando o PDF consolidado no final.
+Reporta, por tamanho de documento: latência de cada estágio (ingestão, agentes,
+relator, renderização do PDF), tempo até a primeira saída de agente visível ao cliente
+(parcial com --stream, senão o primeiro agente concluído), vazão e pico de memória
+(RSS do processo e filhos).
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.pipeline --paginas 10,100,1000 --tarefas 2 --latencia-llm 0.5
+    python -m benchmarks.pipeline --paginas 10 --latencia-llm 20 --stream
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Ambiente isolado e offline: precisa estar definido antes de importar a aplicação
+_DIRETORIO = tempfile.mkdtemp(prefix="benchmark_pipeline_")
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("VECTOR_STORE_URI", os.path.join(_DIRETORIO, "lancedb"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_DIRETORIO, "embedding_cache.db"))
+os.environ.setdefault("TASK_STORE_PATH", os.path.join(_DIRETORIO, "tasks.db"))
+os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(_DIRETORIO, "result_cache.db"))
+os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(_DIRETORIO, "reports"))
+
+import httpx
+import psutil
+import pymupdf
+import uvicorn
+
+import main
+from benchmarks.carga_status import _porta_livre
+from services.task_store import get_task_store
+
+TERMOS = (
+    "defesa acusação réu testemunha prova sentença prisão preventiva dosimetria pena "
+    "artigo código penal jurisprudência súmula recurso habeas corpus denúncia laudo "
+    "interrogatório magistrado decisão liberdade provisória medida cautelar tráfico furto"
+).split()
+
+AGENTES = "defesa,acusacao,pesquisa,decisoes,web,relator"
+
+
+def gerar_pdf(caminho: str, paginas: int, semente: int) -> None:
+    """PDF com texto pseudoaleatório por página (conteúdo distinto por semente)"""
+    rng = random.Random(semente)
+    doc = pymupdf.open()
+    for numero in range(paginas):
+        page = doc.new_page()
+        linhas = [" ".join(rng.choices(TERMOS, k=12)) for _ in range(40)]
+        texto = f"Fls. {numero + 1} - Processo {semente}\n" + "\n".join(linhas)
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), texto, fontsize=9)
+    doc.save(caminho)
+    doc.close()
+
+
+class MonitorMemoria:
+    """Amostra o RSS do processo (e dos filhos, ex.: pool de OCR) em segundo plano"""
+
+    def __init__(self, intervalo: float = 0.1):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        processo = psutil.Process()
+        while not self._parar.is_set():
+            try:
+                rss = processo.memory_info().rss
+                for filho in processo.children(recursive=True):
+                    rss += filho.memory_info().rss
+                self.pico = max(self.pico, rss)
+            except psutil.Error:
+                pass
+            self._parar.wait(self.intervalo)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+
+def duracoes_por_estagio(task_id: str) -> dict:
+    """Durações dos estágios a partir dos eventos gravados da tarefa"""
+    instantes = {}
+    for evento in get_task_store().get_events(task_id):
+        instantes.setdefault(evento["tipo"], []).append(evento["criado_em"])
+
+    def intervalo(inicio, fim):
+        if inicio in instantes and fim in instantes:
+            return max(instantes[fim]) - min(instantes[inicio])
+        return None
+
+    # Primeira saída de agente que o cliente vê: trecho transmitido ou agente concluído
+    saidas = instantes.get("agente_tokens", []) + instantes.get("agente_campo", []) + instantes.get("agente_concluido", [])
+    return {
+        "primeira_saida": min(saidas) - min(instantes["agente_iniciado"]) if saidas and "agente_iniciado" in instantes else None,
+        "ingestao": intervalo("ingestao_iniciada", "ingestao_concluida"),
+        "agentes": intervalo("agente_iniciado", "agente_concluido"),
+        "relator": intervalo("relator_iniciado", "relator_concluido"),
+    }
+
+
+def executar_tamanho(client: httpx.Client, base: str, paginas: int, tarefas: int, timeout: float) -> dict:
+    """Processa `tarefas` documentos de `paginas` páginas em paralelo"""
+    caminhos = []
+    for indice in range(tarefas):
+        caminho = os.path.join(_DIRETORIO, f"processo_{paginas}_{indice}.pdf")
+        gerar_pdf(caminho, paginas, semente=paginas * 1000 + indice)
+        caminhos.append(caminho)
+
+    with MonitorMemoria() as memoria:
+        inicio = time.perf_counter()
+        task_ids = []
+        for caminho in caminhos:
+            with open(caminho, "rb") as arquivo:
+                resposta = client.post(f"{base}/upload", params={"agents": AGENTES},
+                                       files={"file": (os.path.basename(caminho), arquivo, "application/pdf")})
+            resposta.raise_for_status()
+            task_ids.append(resposta.json()["task_id"])
+
+        pendentes = set(task_ids)
+        erros = []
+        while pendentes and time.perf_counter() - inicio < timeout:
+            for task_id in list(pendentes):
+                status = client.get(f"{base}/status/{task_id}").json()
+                if status["status"] in ("completed", "error"):
+                    pendentes.discard(task_id)
+                    if status["status"] == "error":
+                        erros.append(status.get("error"))
+            time.sleep(0.2)
+        duracao = time.perf_counter() - inicio
+
+        renderizacoes = []
+        for task_id in task_ids:
+            if task_id in pendentes:
+                continue
+            inicio_pdf = time.perf_counter()
+            if client.get(f"{base}/result/{task_id}/pdf").status_code == 200:
+                renderizacoes.append(time.perf_counter() - inicio_pdf)
+
+    estagios = [duracoes_por_estagio(task_id) for task_id in task_ids]
+
+    def media(valores):
+        valores = [v for v in valores if v is not None]
+        return sum(valores) / len(valores) if valores else float("nan")
+
+    return {
+        "paginas": paginas,
+        "tarefas": tarefas,
+        "duracao": duracao,
+        "ingestao": media(e["ingestao"] for e in estagios),
+        "agentes": media(e["agentes"] for e in estagios),
+        "relator": media(e["relator"] for e in estagios),
+        "primeira_saida": media(e["primeira_saida"] for e in estagios),
+        "pdf": media(renderizacoes),
+        "tarefas_por_min": 60 * (tarefas - len(pendentes)) / duracao,
+        "paginas_por_s": paginas * (tarefas - len(pendentes)) / duracao,
+        "pico_rss_mb": memoria.pico / (1024 * 1024),
+        "erros": erros,
+        "pendentes": len(pendentes),
+    }
+
+
+def executar(args) -> int:
+    porta = _porta_livre()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{porta}/api/v1"
+    resultados = []
+    try:
+        with httpx.Client(timeout=args.timeout) as client:
+            for paginas in args.paginas:
+                resultados.append(executar_tamanho(client, base, paginas, args.tarefas, args.timeout))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        shutil.rmtree(_DIRETORIO, ignore_errors=True)
+
+    print(f"LLM simulado: {args.latencia_llm:.2f}s/resposta, embedder: {args.latencia_embedder * 1000:.0f}ms/chamada, "
+          f"{args.tarefas} tarefa(s) simultânea(s) por tamanho{', com streaming' if args.stream else ''}")
+    print(f"{'páginas':>8} {'total':>8} {'ingestão':>9} {'agentes':>8} {'relator':>8} {'pdf':>7} "
+          f"{'1ª saída':>9} {'tarefas/min':>12} {'págs/s':>8} {'pico RSS':>9}")
+    falhou = False
+    for r in resultados:
+        print(f"{r['paginas']:>8} {r['duracao']:>7.1f}s {r['ingestao']:>8.2f}s {r['agentes']:>7.2f}s "
+              f"{r['relator']:>7.2f}s {r['pdf']:>6.2f}s {r['primeira_saida']:>8.2f}s {r['tarefas_por_min']:>12.1f} "
+              f"{r['paginas_por_s']:>8.1f} {r['pico_rss_mb']:>7.0f}MB")
+        if r["erros"]:
+            print(f"FALHA: {len(r['erros'])} tarefa(s) de {r['paginas']} páginas com erro: {r['erros'][0]}")
+            falhou = True
+        if r["pendentes"]:
+            print(f"FALHA: {r['pendentes']} tarefa(s) de {r['paginas']} páginas não concluíram em {args.timeout}s")
+            falhou = True
+    return 1 if falhou else 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=lambda v: [int(p) for p in v.split(",")], default=[10, 100, 1000],
+                        help="Tamanhos de documento (páginas), separados por vírgula")
+    parser.add_argument("--tarefas", type=int, default=1, help="Documentos simultâneos por tamanho")
+    parser.add_argument("--latencia-llm", type=float, default=0.5, help="Latência simulada por resposta do LLM (s)")
+    parser.add_argument("--latencia-embedder", type=float, default=0.0, help="Latência simulada por chamada de embedding (s)")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="Tempo máximo por tamanho (s)")
+    parser.add_argument("--stream", action="store_true", help="Transmite a saída de todos os agentes (STREAM_AGENTS=*)")
+    args = parser.parse_args()
+
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latencia_llm)
+    os.environ["FAKE_EMBEDDER_LATENCY"] = str(args.latencia_embedder)
+    os.environ["STREAM_AGENTS"] = "*" if args.stream else ""
+    sys.exit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark da recuperação compartilhada entre agentes.
+
+Cria uma tabela LanceDB com chunks sintéticos e um embedder local com latência
+simulada por chamada, e compara, para as consultas dos agentes do documento:
+  - individual: cada agente embeda e busca sua consulta separadamente
+  - compartilhada: RetrievalCoordinator (um lote de embeddings, uma busca multi-vetor)
+Reporta chamadas ao embedder, buscas, latência e chunks únicos vs. entregues.
+
+Uso (a partir do diretório backend):
+    python -m benchmarks.recuperacao --chunks 2000 --latencia 0.15
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from agno.document import Document
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+
+from agents import AGENTES_DOCUMENTO, QUERIES
+from services.embedding_cache import CachedEmbedder, EmbeddingCache
+from services.fake_models import FakeEmbedder
+from services.retrieval import RetrievalCoordinator
+
+TERMOS = (
+    "defesa acusação réu testemunha prova sentença prisão preventiva dosimetria pena "
+    "artigo código penal jurisprudência súmula recurso habeas corpus denúncia laudo "
+    "interrogatório magistrado decisão liberdade provisória medida cautelar tráfico furto"
+).split()
+
+
+def _criar_tabela(diretorio: str, chunks: int, latencia: float) -> LanceDb:
+    embedder_carga = FakeEmbedder(latencia=0.0)
+    vector_db = LanceDb(table_name="benchmark", uri=diretorio, search_type=SearchType.vector, embedder=embedder_carga)
+    vector_db.create()
+    rng = random.Random(42)
+    documentos = [
+        Document(name="processo", meta_data={"page": i // 4}, content=" ".join(rng.choices(TERMOS, k=60)))
+        for i in range(chunks)
+    ]
+    for inicio in range(0, len(documentos), 500):
+        vector_db.insert(documentos[inicio:inicio + 500])
+    return vector_db
+
+
+def _embedder_medido(diretorio: str, nome: str, latencia: float):
+    simulado = FakeEmbedder(latencia=latencia)
+    cache = EmbeddingCache(f"{diretorio}/{nome}.db")
+    return simulado, CachedEmbedder(embedder=simulado, cache=cache)
+
+
+def executar(args) -> int:
+    consultas = [QUERIES[agente] for agente in AGENTES_DOCUMENTO]
+    with tempfile.TemporaryDirectory() as diretorio:
+        vector_db = _criar_tabela(diretorio, args.chunks, args.latencia)
+
+        # Individual: o que cada agente faz hoje com add_references
+        simulado, vector_db.embedder = _embedder_medido(diretorio, "individual", args.latencia)
+        inicio = time.perf_counter()
+        entregues = []
+        for _ in range(args.repeticoes):
+            for consulta in consultas:
+                entregues.extend(d.content for d in vector_db.search(consulta, limit=args.documentos))
+        individual = {
+            "segundos": time.perf_counter() - inicio,
+            "chamadas_embedder": simulado.chamadas,
+            "buscas": len(consultas) * args.repeticoes,
+            "chunks_entregues": len(entregues),
+            "chunks_unicos": len(set(entregues)),
+        }
+
+        # Compartilhada: um lote de embeddings e uma busca multi-vetor por tarefa
+        simulado, vector_db.embedder = _embedder_medido(diretorio, "compartilhada", args.latencia)
+        inicio = time.perf_counter()
+        retrieval = RetrievalCoordinator(vector_db, num_documents=args.documentos)
+        retrieval.prefetch(consultas)
+        for _ in range(args.repeticoes):
+            for consulta in consultas:
+                retrieval.retriever(query=consulta)
+        stats = retrieval.stats()
+        compartilhada = {
+            "segundos": time.perf_counter() - inicio,
+            "chamadas_embedder": simulado.chamadas,
+            "buscas": stats["buscas"],
+            "chunks_entregues": stats["chunks_entregues"],
+            "chunks_unicos": stats["chunks_unicos"],
+        }
+
+    print(f"{len(consultas)} agentes, {args.chunks} chunks, top-{args.documentos}, "
+          f"latência do embedder {args.latencia * 1000:.0f}ms")
+    print(f"{'':>14} {'segundos':>9} {'embedder':>9} {'buscas':>7} {'entregues':>10} {'únicos':>7}")
+    for nome, r in (("individual", individual), ("compartilhada", compartilhada)):
+        print(f"{nome:>14} {r['segundos']:>9.3f} {r['chamadas_embedder']:>9} {r['buscas']:>7} "
+              f"{r['chunks_entregues']:>10} {r['chunks_unicos']:>7}")
+    print(f"speedup: {individual['segundos'] / compartilhada['segundos']:.1f}x")
+
+    if compartilhada["chunks_entregues"] != individual["chunks_entregues"]:
+        print("FALHA: a recuperação compartilhada entregou um número diferente de chunks")
+        return 1
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="Chunks na tabela sintética")
+    parser.add_argument("--documentos", type=int, default=12, help="Documentos por consulta (num_documents)")
+    parser.add_argument("--latencia", type=float, default=0.15, help="Latência simulada por chamada ao embedder (s)")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Vezes que cada agente repete sua consulta")
+    args = parser.parse_args()
+    raise SystemExit(executar(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,17 +1,22 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse
 import uvicorn
 import os
 from dotenv import load_dotenv
 
+# Carregar variáveis de ambiente antes de importar os routers: o armazenamento de tarefas,
+# a admissão e as constantes dos agentes são configurados na importação
+load_dotenv()
+
 # Importar routers e modelos
 from routers.analysis import router as analysis_router
+from routers.batch import router as batch_router
 from models import AnalysisResponse, ErrorResponse
-
-# Carregar variáveis de ambiente
-load_dotenv()
+from middleware import UploadSizeLimitMiddleware
+from services.pdf_service import ValidationService
+from services.metrics import get_metrics
 
 # Criar instância do FastAPI
 app = FastAPI(
@@ -31,6 +36,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Limitar o tamanho dos uploads antes de o corpo ser lido (margem para o envelope multipart)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=ValidationService.max_file_size() + 64 * 1024
+)
+
+# Lotes: limite do corpo inteiro (vários arquivos); o limite por arquivo é verificado ao salvar
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=int(os.getenv("BATCH_MAX_BYTES", str(1024 * 1024 * 1024))),
+    paths=("/api/v1/batch/upload",)
+)
+
 # Servir arquivos estáticos do frontend
 app.mount("/static", StaticFiles(directory="../frontend"), name="static")
 
@@ -51,6 +69,7 @@ async def get_favicon():
 
 # Incluir routers
 app.include_router(analysis_router, prefix="/api/v1", tags=["análise"])
+app.include_router(batch_router, prefix="/api/v1", tags=["lotes"])
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend():
@@ -77,6 +96,11 @@ async def health_check():
         "version": "2.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas do processo no formato texto do Prometheus"""
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/v1/agents")
 async def list_agents():
     """Lista todos os agentes disponíveis"""
@@ -119,13 +119,46 @@ class AnalysisResponse(BaseModel):
     status: str = Field(..., description="Status da análise")
     task_id: str = Field(..., description="ID da tarefa para acompanhamento")
     message: str = Field(..., description="Mensagem informativa")
+    posicao_fila: Optional[int] = Field(None, description="Posição na fila de processamento, se aguardando")
 
 class AnalysisResult(BaseModel):
     task_id: str = Field(..., description="ID da tarefa")
-    status: str = Field(..., description="Status: pending, processing, completed, error")
+    status: str = Field(..., description="Status: queued, pending, processing, completed, error")
     progress: int = Field(default=0, description="Progresso de 0 a 100")
     results: dict = Field(default={}, description="Resultados dos agentes")
+    metadata: dict = Field(default={}, description="Metadados do processamento (extração por página, etc.)")
+    spans: List[dict] = Field(default=[], description="Duração de cada estágio do processamento")
     error: Optional[str] = Field(None, description="Mensagem de erro, se houver")
+    posicao_fila: Optional[int] = Field(None, description="Posição na fila de processamento, se aguardando")
+    lote_id: Optional[str] = Field(None, description="Lote ao qual a tarefa pertence, se enviada em lote")
+
+class BatchDocument(BaseModel):
+    nome: str = Field(..., description="Nome do arquivo")
+    doc_hash: str = Field(..., description="SHA-256 do conteúdo")
+    task_id: str = Field(..., description="Tarefa de análise do documento")
+    status: str = Field(default="queued", description="Status da tarefa do documento")
+    progress: int = Field(default=0, description="Progresso de 0 a 100")
+    error: Optional[str] = Field(None, description="Mensagem de erro, se houver")
+
+class BatchDuplicate(BaseModel):
+    nome: str = Field(..., description="Nome do arquivo repetido")
+    doc_hash: str = Field(..., description="SHA-256 do conteúdo")
+    duplicado_de: str = Field(..., description="Arquivo do lote com o mesmo conteúdo (analisado uma única vez)")
+
+class BatchResponse(BaseModel):
+    status: str = Field(..., description="Status do lote")
+    batch_id: str = Field(..., description="ID do lote para acompanhamento")
+    message: str = Field(..., description="Mensagem informativa")
+    documentos: List[BatchDocument] = Field(default=[], description="Documentos distintos do lote")
+    duplicados: List[BatchDuplicate] = Field(default=[], description="Arquivos ignorados por conteúdo repetido")
+
+class BatchResult(BaseModel):
+    batch_id: str = Field(..., description="ID do lote")
+    status: str = Field(..., description="Status: processing, completed, error")
+    progress: int = Field(default=0, description="Progresso médio dos documentos, de 0 a 100")
+    contagem: dict = Field(default={}, description="Documentos por status")
+    documentos: List[BatchDocument] = Field(default=[], description="Situação de cada documento")
+    duplicados: List[BatchDuplicate] = Field(default=[], description="Arquivos ignorados por conteúdo repetido")
 
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Mensagem de erro")
@@ -1,21 +1,68 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 import tempfile
 import os
 import uuid
 import asyncio
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 import json
+import threading
+import time
 
 # Importar serviços e modelos
 from models import *
-from agents import setup_knowledge_base, setup_agents, executar_agentes_paralelo, executar_relator_consolidado
-from services.pdf_service import PDFGenerationService
+from agents import (
+    setup_knowledge_base, setup_retrieval, setup_agents, executar_agentes_paralelo, executar_relator_consolidado,
+    serializar_resultado, restaurar_resultado, resultado_valido, entradas_obrigatorias_relator,
+    AGENTES_DOCUMENTO, QUERIES
+)
+from services.pdf_service import PDFGenerationService, FileService, FileTooLargeError, ValidationService
+from services.embedding_cache import get_embedding_cache, calcular_hash_arquivo
+from services.result_cache import get_result_cache
+from services.web_search import get_search_client
+from services.vector_store import get_vector_store
+from services.pipeline import get_pipeline
+from services.task_store import get_task_store
+from services.events import get_event_bus
+from services.metrics import SpanRecorder, get_metrics, iniciar_spans, registrar_span
+from services.admission import FilaCheiaError, get_admission
+from services.llm_governor import get_governor, GOVERNADORES
+from services.job_queue import LeasePerdidoError, fila_habilitada, get_job_queue
+from services.report_cache import get_report_cache
+from services.batch import notificar_lote
 
 router = APIRouter()
 
-# Armazenamento em memória para tarefas (em produção, usar Redis ou banco de dados)
-tasks_storage: Dict[str, AnalysisResult] = {}
+# Armazenamento durável das tarefas (SQLite por padrão, compartilhado entre workers)
+task_store = get_task_store()
+
+# Referências às tarefas asyncio disparadas sem espera (o loop só guarda referências fracas)
+_em_segundo_plano: set = set()
+
+def recusar_upload(na_fila: int) -> HTTPException:
+    """Fila de admissão cheia: o cliente deve tentar novamente mais tarde"""
+    return HTTPException(
+        status_code=429,
+        detail=f"Fila de processamento cheia ({na_fila} tarefas aguardando). Tente novamente em instantes.",
+        headers={"Retry-After": "30"}
+    )
+
+def fila_de_jobs_cheia() -> bool:
+    limite = int(os.getenv("MAX_QUEUED_TASKS", "50"))
+    return bool(limite) and get_job_queue().pendentes() >= limite
+
+def validar_agentes(agents: str) -> List[str]:
+    """Lista de agentes do parâmetro 'agents' (400 se algum não for válido)"""
+    agent_list = [agent.strip() for agent in agents.split(',')]
+    valid_agents = ["defesa", "acusacao", "pesquisa", "decisoes", "web", "relator"]
+
+    for agent in agent_list:
+        if agent not in valid_agents:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Agente '{agent}' não é válido. Agentes válidos: {valid_agents}"
+            )
+    return agent_list
 
 @router.post("/upload", response_model=AnalysisResponse)
 async def upload_file(
@@ -31,125 +78,361 @@ async def upload_file(
         raise HTTPException(status_code=400, detail="Apenas arquivos PDF são aceitos")
 
     # Validar agentes
-    agent_list = [agent.strip() for agent in agents.split(',')]
-    valid_agents = ["defesa", "acusacao", "pesquisa", "decisoes", "web", "relator"]
-
-    for agent in agent_list:
-        if agent not in valid_agents:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Agente '{agent}' não é válido. Agentes válidos: {valid_agents}"
-            )
+    agent_list = validar_agentes(agents)
+
+    # Com a fila cheia, recusa antes de receber o arquivo
+    admission = get_admission()
+    usar_fila = fila_habilitada()
+    if usar_fila and await asyncio.to_thread(fila_de_jobs_cheia):
+        raise recusar_upload(await asyncio.to_thread(get_job_queue().pendentes))
+    if not usar_fila and admission.cheia():
+        raise recusar_upload(admission.stats()["na_fila"])
+
+    # Salvar arquivo em disco por streaming (limite de tamanho e hash no mesmo passo)
+    # Com a fila de jobs, o PDF vai para o diretório compartilhado com os workers
+    try:
+        pdf_path, doc_hash, _ = await FileService.save_upload_stream(
+            file, max_size=ValidationService.max_file_size(),
+            directory=os.getenv("JOB_SPOOL_DIR", "tmp/uploads") if usar_fila else None
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {str(e)}")
 
     # Criar ID da tarefa
     task_id = str(uuid.uuid4())
 
-    # Inicializar status da tarefa
-    tasks_storage[task_id] = AnalysisResult(
-        task_id=task_id,
-        status="pending",
-        progress=0,
-        results={}
-    )
+    if usar_fila:
+        # Processamento pelos workers: a tarefa é gravada antes do job para o worker encontrá-la
+        await asyncio.to_thread(
+            task_store.save, AnalysisResult(task_id=task_id, status="queued", progress=0, results={})
+        )
+        posicao = await asyncio.to_thread(get_job_queue().enfileirar, task_id, {
+            "pdf_path": os.path.abspath(pdf_path),
+            "agent_list": agent_list,
+            "doc_hash": doc_hash,
+        })
+    else:
+        # Admissão: acima do limite de tarefas ativas, a tarefa aguarda na fila
+        try:
+            posicao = admission.entrar(task_id)
+        except FilaCheiaError:
+            os.unlink(pdf_path)
+            raise recusar_upload(admission.stats()["na_fila"])
 
-    # Salvar arquivo temporário
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            pdf_path = tmp_file.name
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao salvar arquivo: {str(e)}")
+        # Inicializar status da tarefa
+        await asyncio.to_thread(task_store.save, AnalysisResult(
+            task_id=task_id,
+            status="queued" if posicao else "pending",
+            progress=0,
+            results={}
+        ))
+
+        # Iniciar processamento em background
+        background_tasks.add_task(process_document, task_id, pdf_path, agent_list, doc_hash)
 
-    # Iniciar processamento em background
-    background_tasks.add_task(process_document, task_id, pdf_path, agent_list)
+    if posicao:
+        get_event_bus().publish(task_id, "fila", posicao=posicao)
 
+    if posicao:
+        message = f"Arquivo '{file.filename}' recebido. Aguardando na fila (posição {posicao}) com agentes: {agent_list}"
+    else:
+        message = f"Arquivo '{file.filename}' recebido. Processamento iniciado com agentes: {agent_list}"
     return AnalysisResponse(
-        status="accepted",
+        status="queued" if posicao else "accepted",
         task_id=task_id,
-        message=f"Arquivo '{file.filename}' recebido. Processamento iniciado com agentes: {agent_list}"
+        message=message,
+        posicao_fila=posicao or None
     )
 
-async def process_document(task_id: str, pdf_path: str, agent_list: List[str]):
+def gravar_tarefa(task_id: str, **fields):
     """
-    Processa o documento em background
+    Atualiza a tarefa depois de gravados os eventos já publicados, para o status nunca passar
+    à frente deles (bloqueante: chamar via asyncio.to_thread)
     """
-    try:
-        # Atualizar status
-        tasks_storage[task_id].status = "processing"
-        tasks_storage[task_id].progress = 10
+    get_event_bus().esvaziar()
+    return task_store.update(task_id, **fields)
 
-        # Setup do knowledge base
-        knowledge_base = setup_knowledge_base(pdf_path)
-        tasks_storage[task_id].progress = 30
+async def process_document(task_id: str, pdf_path: str, agent_list: List[str], doc_hash: Optional[str] = None,
+                           ultima_tentativa: bool = True, lote_id: Optional[str] = None,
+                           confirmar_lease: Optional[Callable[[], bool]] = None):
+    """
+    Processa o documento em background.
+    Resultados de agentes gravados por uma tentativa anterior são reaproveitados (retomada por estágio).
+    Com ultima_tentativa=False, um erro é repassado ao chamador (worker) em vez de encerrar a tarefa,
+    e o PDF é mantido para a próxima tentativa.
+    lote_id: lote do documento, avisado quando a tarefa termina.
+    confirmar_lease: com a fila de jobs, renova o lease do worker antes de cada gravação na tarefa;
+    se o job já é de outro worker, nada é gravado (LeasePerdidoError vai ao chamador).
+    Interrompido o processamento (cancelamento ou lease perdido), o trabalho que segue nas threads
+    do pipeline para no próximo evento, sem publicar nem gravar mais nada.
+    """
+    pipeline = get_pipeline()
+    event_bus = get_event_bus()
+    # Spans de todos os estágios desta tarefa (propagados às threads do pipeline)
+    spans = iniciar_spans()
+    inicio = time.perf_counter()
+
+    # Sinalizada quando o processamento é interrompido; conferida pelo código que roda nas threads
+    interrompida = threading.Event()
+
+    def conferir_interrupcao():
+        if interrompida.is_set():
+            raise LeasePerdidoError(f"Processamento do job {task_id} interrompido")
+
+    def emitir(tipo: str, **dados):
+        conferir_interrupcao()
+        event_bus.publish(task_id, tipo, **dados)
+
+    def gravar(**fields):
+        """Grava na tarefa (bloqueante) se o job ainda é deste worker"""
+        conferir_interrupcao()
+        if confirmar_lease is not None and not confirmar_lease():
+            interrompida.set()
+            raise LeasePerdidoError(f"Job {task_id} retomado por outro worker")
+        return gravar_tarefa(task_id, **fields)
+
+    async def atualizar_progresso(progress: int, **fields):
+        """Grava o progresso da tarefa (fora do event loop) e publica o evento correspondente"""
+        await asyncio.to_thread(gravar, progress=progress, **fields)
+        emitir("progresso", progress=progress, status=fields.get("status", "processing"))
+
+    retencao = None
+    relator = None
+    concluida = False
+    admission = get_admission()
+    try:
+        # Aguardar a vez na fila de admissão
+        if admission.posicao(task_id):
+            await admission.aguardar(task_id)
+            registrar_span("fila", time.perf_counter() - inicio, histograma=False)
+            inicio = time.perf_counter()
 
-        # Setup dos agentes
-        agents = setup_agents(knowledge_base)
-        tasks_storage[task_id].progress = 40
+        # Atualizar status
+        await atualizar_progresso(10, status="processing")
+
+        # Setup do knowledge base (tabela reutilizada se o documento já foi processado)
+        # Trabalho bloqueante roda nos pools do pipeline, mantendo o event loop livre
+        if doc_hash is None:
+            doc_hash = await pipeline.executar("ingestao", calcular_hash_arquivo, pdf_path)
+        # A tabela fica retida (não despejável) até o fim da tarefa; a liberação no finally é desta retenção.
+        # Reter e liberar levam milissegundos: fora do pool de ingestão, para não esperar a ingestão de outros.
+        # Protegida do cancelamento: uma retenção feita na thread sempre chega ao finally para ser liberada
+        retencao = asyncio.ensure_future(asyncio.to_thread(get_vector_store().reter, doc_hash))
+        await asyncio.shield(retencao)
+        metadata = {"iniciado_em": spans.inicio}
+        emitir("ingestao_iniciada")
+        knowledge_base = await pipeline.executar(
+            "ingestao", setup_knowledge_base, pdf_path, doc_hash, metadata, emitir
+        )
+        emitir("ingestao_concluida", extracao=metadata.get("extracao"))
+        await atualizar_progresso(30, metadata=metadata)
 
         # Separar agentes normais do relator
         agentes_normais = [agent for agent in agent_list if agent != "relator"]
         incluir_relator = "relator" in agent_list
 
+        # Recuperação compartilhada: consultas dos agentes do documento embedadas e buscadas de uma vez,
+        # cada uma restrita às peças processuais do seu agente (fora do pool de ingestão: uma busca
+        # curta não espera na fila atrás da ingestão completa de outros documentos)
+        retrieval = setup_retrieval(knowledge_base)
+        if retrieval is not None:
+            consultas = {agent: QUERIES[agent] for agent in agentes_normais if agent in AGENTES_DOCUMENTO}
+            await asyncio.to_thread(retrieval.prefetch_agentes, consultas)
+
+        # Setup dos agentes
+        agents = setup_agents(knowledge_base, retrieval)
+        await atualizar_progresso(40)
+
         resultados = {}
+        serialized_results = {}
+
+        # Retomada: agentes concluídos numa tentativa anterior não são executados de novo
+        anterior = await asyncio.to_thread(task_store.get, task_id)
+        for agent_key, dados in (anterior.results if anterior else {}).items():
+            if agent_key in agentes_normais and resultado_valido(dados):
+                resultados[agent_key] = restaurar_resultado(agents[agent_key], dados)
+                serialized_results[agent_key] = dados
+        pendentes = [agent for agent in agentes_normais if agent not in resultados]
+        if resultados:
+            emitir("retomada", agentes=sorted(resultados))
+
+        # Sem entradas obrigatórias entre os selecionados, o relator espera todos os agentes
+        obrigatorios = entradas_obrigatorias_relator(agentes_normais) or set(agentes_normais)
+
+        def iniciar_relator():
+            return asyncio.ensure_future(pipeline.executar(
+                "consolidacao", executar_relator_consolidado, agents["relator"], dict(resultados), emitir, doc_hash
+            ))
+
+        # Gravações de resultados parciais em ordem: uma cópia antiga nunca sobrescreve a mais recente
+        gravacao_parcial = asyncio.Lock()
+
+        async def ao_concluir_agente(agent_key, resultado):
+            nonlocal relator
+            # Cada resultado fica disponível em /result/{task_id}/agent/{agent_name} assim que chega
+            resultados[agent_key] = resultado
+            serialized_results[agent_key] = serializar_resultado(resultado)
+
+            # O relator começa quando suas entradas obrigatórias estão prontas
+            if incluir_relator and relator is None and obrigatorios <= resultados.keys():
+                relator = iniciar_relator()
+
+            async with gravacao_parcial:
+                progresso = 50 + 20 * len(resultados) // len(agentes_normais)
+                await atualizar_progresso(progresso, results=dict(serialized_results))
 
         # Executar agentes normais em paralelo
-        if agentes_normais:
-            tasks_storage[task_id].progress = 50
-            resultados = await executar_agentes_paralelo(agents, agentes_normais)
-            tasks_storage[task_id].progress = 70
+        if pendentes:
+            await atualizar_progresso(50)
+            await executar_agentes_paralelo(agents, pendentes, emitir, ao_concluir_agente, doc_hash)
+            await atualizar_progresso(70)
 
         # Executar relator se solicitado
         if incluir_relator and resultados:
-            tasks_storage[task_id].progress = 80
-            relatorio_resultado = executar_relator_consolidado(agents["relator"], resultados)
+            await atualizar_progresso(80)
+            relatorio_resultado = await (relator or iniciar_relator())
             resultados["relator"] = relatorio_resultado
-            tasks_storage[task_id].progress = 90
-
-        # Converter resultados para formato serializável
-        serialized_results = {}
-        for agent_key, resultado in resultados.items():
-            if hasattr(resultado, 'dict'):
-                serialized_results[agent_key] = resultado.dict()
-            else:
-                serialized_results[agent_key] = str(resultado)
-
-        # Finalizar
-        tasks_storage[task_id].status = "completed"
-        tasks_storage[task_id].progress = 100
-        tasks_storage[task_id].results = serialized_results
-
+            serialized_results["relator"] = serializar_resultado(relatorio_resultado)
+            await atualizar_progresso(90)
+
+        if retrieval is not None:
+            metadata["recuperacao"] = retrieval.stats()
+
+        # Finalizar (o evento final vem depois do status, para o cliente já encontrar o resultado)
+        await asyncio.to_thread(gravar, status="completed", progress=100,
+                                results=serialized_results, metadata=metadata, spans=spans.spans())
+        get_metrics().tarefa_segundos.observe(time.perf_counter() - inicio, status="completed")
+        emitir("concluido", progress=100)
+        concluida = True
+
+        # Consolidado renderizado em segundo plano: o download vira leitura de arquivo
+        pre_renderizacao = asyncio.ensure_future(pre_renderizar_consolidado(task_id))
+        _em_segundo_plano.add(pre_renderizacao)
+        pre_renderizacao.add_done_callback(_em_segundo_plano.discard)
+
+    except (LeasePerdidoError, asyncio.CancelledError):
+        interrompida.set()
+        raise
     except Exception as e:
-        tasks_storage[task_id].status = "error"
-        tasks_storage[task_id].error = str(e)
+        if not ultima_tentativa:
+            # O worker devolve o job à fila; a tarefa continua em andamento para o cliente
+            emitir("nova_tentativa", error=str(e))
+            raise
+        await asyncio.to_thread(gravar, status="error", error=str(e), spans=spans.spans())
+        get_metrics().tarefa_segundos.observe(time.perf_counter() - inicio, status="error")
+        emitir("erro", error=str(e))
 
     finally:
-        # Limpar arquivo temporário
-        try:
-            os.unlink(pdf_path)
-        except:
-            pass
+        # Um relator iniciado antecipadamente ainda pode estar consultando a tabela
+        if relator is not None and not relator.done():
+            await asyncio.wait([relator])
+
+        # Próxima tarefa da fila pode começar
+        admission.liberar(task_id)
+
+        # Liberar a tabela do documento para a coleta LRU (também quando interrompido durante a retenção)
+        if retencao is not None:
+            await asyncio.wait([retencao])
+            if retencao.exception() is None:
+                await asyncio.to_thread(get_vector_store().liberar, doc_hash)
+
+        # Limpar arquivo temporário (mantido se ainda houver nova tentativa)
+        if concluida or ultima_tentativa:
+            try:
+                os.unlink(pdf_path)
+            except:
+                pass
+
+            # Progresso agregado do lote
+            if lote_id:
+                await asyncio.to_thread(notificar_lote, lote_id, task_id)
+
+def renderizar_pdf_agente(task_id: str, agent_name: str, dados) -> tuple:
+    """PDF de um agente (do disco, se esta versão do resultado já foi renderizada)"""
+    return get_report_cache().obter(
+        task_id, agent_name, dados,
+        lambda destino: PDFGenerationService().render_agent_pdf(agent_name, dados, task_id, destino)
+    )
+
+def renderizar_pdf_consolidado(task_id: str, results: dict) -> tuple:
+    """PDF consolidado (do disco, se estes resultados já foram renderizados)"""
+    return get_report_cache().obter(
+        task_id, "consolidado", results,
+        lambda destino: PDFGenerationService().render_combined_pdf(results, task_id, destino)
+    )
+
+async def pre_renderizar_consolidado(task_id: str):
+    """Renderiza o PDF consolidado de uma tarefa concluída no pool de renderização"""
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None or not task.results:
+        return
+    try:
+        _, segundos = await get_pipeline().executar("renderizacao", renderizar_pdf_consolidado, task_id, task.results)
+    except Exception:
+        return  # O download renderiza de novo (e reporta o erro) se necessário
+    if segundos is not None:
+        await asyncio.to_thread(registrar_span_pdf, task, "consolidado", segundos)
+
+def registrar_span_pdf(task: AnalysisResult, item: str, segundos: float):
+    """Registra a geração de um PDF no histograma e nos spans da tarefa (bloqueante)"""
+    get_metrics().estagio_segundos.observe(segundos, stage="pdf", item=item)
+    recorder = SpanRecorder(inicio=task.metadata.get("iniciado_em"))
+    recorder.registrar("pdf", segundos, item=item)
+    task_store.update(task.task_id, spans=task.spans + recorder.spans())
 
 @router.get("/status/{task_id}", response_model=AnalysisResult)
 async def get_task_status(task_id: str):
     """
     Obter status de uma tarefa de análise
     """
-    if task_id not in tasks_storage:
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+
+    if task.status == "queued":
+        if fila_habilitada():
+            task.posicao_fila = await asyncio.to_thread(get_job_queue().posicao, task_id)
+        else:
+            task.posicao_fila = get_admission().posicao(task_id)
+    return task
+
+@router.get("/events/{task_id}")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Eventos de progresso da tarefa via Server-Sent Events (substitui o polling de /status)
+    """
+    if await asyncio.to_thread(task_store.get, task_id) is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
 
-    return tasks_storage[task_id]
+    # Reconexões do EventSource retomam a partir do último evento recebido
+    last_event_id = request.headers.get("last-event-id", "")
+    after_seq = int(last_event_id) if last_event_id.isdigit() else 0
+
+    async def gerar_eventos():
+        async for evento in get_event_bus().stream(task_id, after_seq):
+            if evento is None:
+                yield ": keep-alive\n\n"
+                continue
+            dados = json.dumps(evento["dados"], ensure_ascii=False, default=str)
+            yield f"id: {evento['seq']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+    return StreamingResponse(
+        gerar_eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/result/{task_id}")
 async def get_task_result(task_id: str):
     """
     Obter resultado completo de uma tarefa
     """
-    if task_id not in tasks_storage:
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
 
-    task = tasks_storage[task_id]
-
     if task.status == "completed":
         return {
             "task_id": task_id,
@@ -167,6 +450,7 @@ async def get_task_result(task_id: str):
             "task_id": task_id,
             "status": task.status,
             "progress": task.progress,
+            "results": task.results,
             "message": "Processamento em andamento..."
         }
 
@@ -175,20 +459,20 @@ async def get_agent_result(task_id: str, agent_name: str):
     """
     Obter resultado de um agente específico
     """
-    if task_id not in tasks_storage:
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
 
-    task = tasks_storage[task_id]
-
-    if task.status != "completed":
-        raise HTTPException(status_code=400, detail="Tarefa ainda não foi concluída")
-
+    # Resultados de cada agente são gravados assim que ele termina, antes da conclusão da tarefa
     if agent_name not in task.results:
+        if task.status in ("queued", "pending", "processing"):
+            raise HTTPException(status_code=400, detail=f"Agente '{agent_name}' ainda não concluiu")
         raise HTTPException(status_code=404, detail=f"Resultado do agente '{agent_name}' não encontrado")
 
     return {
         "task_id": task_id,
         "agent": agent_name,
+        "status": task.status,
         "result": task.results[agent_name]
     }
 
@@ -197,10 +481,9 @@ async def delete_task(task_id: str):
     """
     Remover uma tarefa do storage
     """
-    if task_id not in tasks_storage:
+    if not await asyncio.to_thread(task_store.delete, task_id):
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
-
-    del tasks_storage[task_id]
+    get_report_cache().remover_tarefa(task_id)
 
     return {"message": f"Tarefa {task_id} removida com sucesso"}
 
@@ -210,46 +493,99 @@ async def list_tasks():
     Listar todas as tarefas
     """
     return {
-        "tasks": [
-            {
-                "task_id": task_id,
-                "status": task.status,
-                "progress": task.progress
-            }
-            for task_id, task in tasks_storage.items()
-        ]
+        "tasks": await asyncio.to_thread(task_store.list)
     }
 
+@router.get("/pipeline")
+async def get_pipeline_stats():
+    """
+    Ocupação dos pools de cada estágio do pipeline
+    """
+    return get_pipeline().stats()
+
+@router.get("/pipeline/admission")
+async def get_admission_stats():
+    """
+    Tarefas ativas e na fila de admissão
+    """
+    return get_admission().stats()
+
+@router.get("/pipeline/jobs")
+async def get_job_queue_stats():
+    """
+    Jobs da fila durável por estado (com JOB_QUEUE=true)
+    """
+    if not fila_habilitada():
+        return {"habilitada": False}
+    return await asyncio.to_thread(get_job_queue().stats)
+
+@router.get("/pipeline/llm")
+async def get_llm_governor_stats():
+    """
+    Limite adaptativo, ocupação, fila e orçamento de tokens das chamadas ao LLM e ao embedder
+    """
+    return {tipo: get_governor(tipo).stats() for tipo in GOVERNADORES}
+
+@router.get("/cache/embeddings")
+async def get_embedding_cache_stats():
+    """
+    Estatísticas do cache de embeddings (hits/misses)
+    """
+    return get_embedding_cache().stats()
+
+@router.get("/cache/results")
+async def get_result_cache_stats():
+    """
+    Estatísticas do cache de resultados dos agentes
+    """
+    cache = get_result_cache()
+    return cache.stats() if cache is not None else {"habilitado": False}
+
+@router.get("/cache/web-search")
+async def get_web_search_stats():
+    """
+    Estatísticas da busca web (cache, chamadas externas e consultas coalescidas)
+    """
+    return get_search_client().stats()
+
+@router.get("/cache/reports")
+async def get_report_cache_stats():
+    """
+    Estatísticas dos PDFs de relatório já renderizados
+    """
+    return get_report_cache().stats()
+
+@router.get("/cache/vector-store")
+async def get_vector_store_stats():
+    """
+    Uso de disco das tabelas vetoriais por documento
+    """
+    return get_vector_store().stats()
+
 @router.get("/result/{task_id}/agent/{agent_name}/pdf")
 async def download_agent_pdf(task_id: str, agent_name: str):
     """
     Baixar resultado de um agente específico em PDF
     """
-    if task_id not in tasks_storage:
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
 
-    task = tasks_storage[task_id]
-
-    if task.status != "completed":
-        raise HTTPException(status_code=400, detail="Tarefa ainda não foi concluída")
-
     if agent_name not in task.results:
+        if task.status in ("queued", "pending", "processing"):
+            raise HTTPException(status_code=400, detail=f"Agente '{agent_name}' ainda não concluiu")
         raise HTTPException(status_code=404, detail=f"Resultado do agente '{agent_name}' não encontrado")
 
     try:
-        # Gerar PDF
-        pdf_service = PDFGenerationService()
-        pdf_buffer = pdf_service.generate_agent_pdf(agent_name, task.results[agent_name], task_id)
-
-        # Definir nome do arquivo
-        filename = f"{agent_name}_{task_id}.pdf"
+        # Gerar PDF fora do event loop (ou reaproveitar o já renderizado)
+        caminho, segundos = await get_pipeline().executar(
+            "renderizacao", renderizar_pdf_agente, task_id, agent_name, task.results[agent_name]
+        )
+        if segundos is not None:
+            await asyncio.to_thread(registrar_span_pdf, task, agent_name, segundos)
 
         # Retornar como download
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return FileResponse(caminho, media_type="application/pdf", filename=f"{agent_name}_{task_id}.pdf")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar PDF: {str(e)}")
@@ -259,11 +595,10 @@ async def download_combined_pdf(task_id: str):
     """
     Baixar todos os resultados combinados em um PDF consolidado
     """
-    if task_id not in tasks_storage:
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Tarefa não encontrada")
 
-    task = tasks_storage[task_id]
-
     if task.status != "completed":
         raise HTTPException(status_code=400, detail="Tarefa ainda não foi concluída")
 
@@ -271,19 +606,15 @@ async def download_combined_pdf(task_id: str):
         raise HTTPException(status_code=404, detail="Nenhum resultado encontrado para esta tarefa")
 
     try:
-        # Gerar PDF consolidado
-        pdf_service = PDFGenerationService()
-        pdf_buffer = pdf_service.generate_combined_pdf(task.results, task_id)
-
-        # Definir nome do arquivo
-        filename = f"analise_completa_{task_id}.pdf"
+        # Normalmente já pré-renderizado ao concluir a tarefa
+        caminho, segundos = await get_pipeline().executar(
+            "renderizacao", renderizar_pdf_consolidado, task_id, task.results
+        )
+        if segundos is not None:
+            await asyncio.to_thread(registrar_span_pdf, task, "consolidado", segundos)
 
         # Retornar como download
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return FileResponse(caminho, media_type="application/pdf", filename=f"analise_completa_{task_id}.pdf")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar PDF consolidado: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,247 @@
+from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks
+import asyncio
+import os
+import uuid
+import zipfile
+from typing import Dict, List
+
+from models import AnalysisResult, BatchDocument, BatchDuplicate, BatchResponse, BatchResult
+from agents import setup_knowledge_base
+from routers.analysis import (
+    task_store, process_document, validar_agentes, recusar_upload, fila_de_jobs_cheia
+)
+from services.pdf_service import FileService, FileTooLargeError, ValidationService
+from services.vector_store import get_vector_store
+from services.pipeline import get_pipeline
+from services.events import get_event_bus
+from services.admission import FilaCheiaError, get_admission
+from services.job_queue import fila_habilitada, get_job_queue
+from services.batch import eh_lote, resumir_lote
+
+router = APIRouter()
+
+# Espera entre tentativas de admissão quando a fila global está cheia (s)
+ESPERA_FILA_CHEIA = 5.0
+
+def max_arquivos_lote() -> int:
+    return int(os.getenv("BATCH_MAX_FILES", "200"))
+
+@router.post("/batch/upload", response_model=BatchResponse)
+async def upload_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    agents: str = "defesa,acusacao,pesquisa,decisoes,web"
+):
+    """
+    Upload de vários PDFs (ou arquivos .zip com PDFs) de um mesmo dossiê.
+    Arquivos de conteúdo idêntico são analisados uma única vez; cada documento distinto
+    vira uma tarefa de análise e o lote reúne o progresso de todas.
+    """
+    for file in files:
+        if not file.filename.lower().endswith(('.pdf', '.zip')):
+            raise HTTPException(status_code=400, detail=f"'{file.filename}': apenas arquivos PDF ou ZIP são aceitos")
+
+    agent_list = validar_agentes(agents)
+
+    # Com a fila cheia, recusa antes de receber os arquivos
+    admission = get_admission()
+    usar_fila = fila_habilitada()
+    if usar_fila and await asyncio.to_thread(fila_de_jobs_cheia):
+        raise recusar_upload(await asyncio.to_thread(get_job_queue().pendentes))
+    if not usar_fila and admission.cheia():
+        raise recusar_upload(admission.stats()["na_fila"])
+
+    # Salvar os arquivos por streaming, descartando os de conteúdo repetido
+    diretorio = os.getenv("JOB_SPOOL_DIR", "tmp/uploads") if usar_fila else None
+    max_size = ValidationService.max_file_size()
+    max_files = max_arquivos_lote()
+    documentos: Dict[str, BatchDocument] = {}  # doc_hash -> documento
+    caminhos: Dict[str, str] = {}  # doc_hash -> PDF salvo
+    duplicados: List[BatchDuplicate] = []
+
+    def adicionar(nome: str, caminho: str, doc_hash: str):
+        if doc_hash in documentos:
+            FileService.cleanup_file(caminho)
+            duplicados.append(BatchDuplicate(nome=nome, doc_hash=doc_hash, duplicado_de=documentos[doc_hash].nome))
+            return
+        if len(documentos) >= max_files:
+            FileService.cleanup_file(caminho)
+            raise HTTPException(status_code=400, detail=f"O lote excede o máximo de {max_files} documentos")
+        documentos[doc_hash] = BatchDocument(nome=nome, doc_hash=doc_hash, task_id=str(uuid.uuid4()))
+        caminhos[doc_hash] = caminho
+
+    def descartar():
+        for caminho in caminhos.values():
+            FileService.cleanup_file(caminho)
+
+    try:
+        for file in files:
+            if file.filename.lower().endswith('.pdf'):
+                pdf_path, doc_hash, _ = await FileService.save_upload_stream(file, max_size=max_size, directory=diretorio)
+                adicionar(file.filename, pdf_path, doc_hash)
+                continue
+
+            # Arquivo compactado: os PDFs são extraídos em blocos, com o mesmo limite por arquivo
+            zip_path, _, _ = await FileService.save_upload_stream(
+                file, max_size=max_size * max_files, suffix='.zip'
+            )
+            try:
+                extraidos = await asyncio.to_thread(
+                    FileService.extract_pdfs_from_zip, zip_path, max_size, max_files, diretorio
+                )
+            finally:
+                FileService.cleanup_file(zip_path)
+            for posicao, (nome, pdf_path, doc_hash, _) in enumerate(extraidos):
+                try:
+                    adicionar(nome, pdf_path, doc_hash)
+                except HTTPException:
+                    for _, restante, _, _ in extraidos[posicao + 1:]:
+                        FileService.cleanup_file(restante)
+                    raise
+    except FileTooLargeError as e:
+        descartar()
+        raise HTTPException(status_code=413, detail=str(e))
+    except (zipfile.BadZipFile, ValueError) as e:
+        descartar()
+        raise HTTPException(status_code=400, detail=f"Erro ao ler os arquivos do lote: {str(e)}")
+    except BaseException:
+        descartar()
+        raise
+
+    if not documentos:
+        raise HTTPException(status_code=400, detail="Nenhum PDF encontrado no lote")
+
+    # O lote é uma tarefa cujo progresso é agregado das tarefas dos documentos
+    lote_id = str(uuid.uuid4())
+    for documento in documentos.values():
+        await asyncio.to_thread(task_store.save, AnalysisResult(
+            task_id=documento.task_id, status="queued", progress=0, results={}, lote_id=lote_id
+        ))
+    await asyncio.to_thread(task_store.save, AnalysisResult(
+        task_id=lote_id,
+        status="processing",
+        progress=0,
+        metadata={"lote": {
+            "agentes": agent_list,
+            "documentos": [d.model_dump(include={"nome", "doc_hash", "task_id"}) for d in documentos.values()],
+            "duplicados": [d.model_dump() for d in duplicados],
+        }}
+    ))
+
+    if usar_fila:
+        # Os workers dividem os documentos do lote como quaisquer outros jobs
+        # (todos enfileirados numa única ida ao pool de threads, fora do event loop)
+        def enfileirar_documentos():
+            fila = get_job_queue()
+            for documento in documentos.values():
+                fila.enfileirar(documento.task_id, {
+                    "pdf_path": os.path.abspath(caminhos[documento.doc_hash]),
+                    "agent_list": agent_list,
+                    "doc_hash": documento.doc_hash,
+                    "lote_id": lote_id,
+                })
+
+        await asyncio.to_thread(enfileirar_documentos)
+    else:
+        background_tasks.add_task(process_batch, lote_id, [
+            (documento.task_id, caminhos[documento.doc_hash], documento.doc_hash)
+            for documento in documentos.values()
+        ], agent_list)
+
+    return BatchResponse(
+        status="accepted",
+        batch_id=lote_id,
+        message=f"{len(documentos)} documento(s) recebido(s)"
+                + (f", {len(duplicados)} repetido(s) ignorado(s)" if duplicados else "")
+                + f". Processamento iniciado com agentes: {agent_list}",
+        documentos=list(documentos.values()),
+        duplicados=duplicados,
+    )
+
+def pre_ingerir(pdf_path: str, doc_hash: str, emitir) -> None:
+    """Ingestão antecipada: deixa a tabela do documento pronta para a análise"""
+    get_vector_store().reter(doc_hash)
+    try:
+        setup_knowledge_base(pdf_path, doc_hash, None, emitir)
+    finally:
+        get_vector_store().liberar(doc_hash)
+
+async def process_batch(lote_id: str, documentos: List[tuple], agent_list: List[str]):
+    """
+    Processa os documentos do lote em background.
+    A ingestão corre à frente da análise (até BATCH_INGEST_AHEAD documentos já ingeridos
+    aguardando) e até BATCH_MAX_ACTIVE documentos são analisados ao mesmo tempo, cada um
+    passando pela admissão global: tarefas de outros usuários intercalam com o lote.
+    """
+    pipeline = get_pipeline()
+    event_bus = get_event_bus()
+    admission = get_admission()
+    max_ativos = int(os.getenv("BATCH_MAX_ACTIVE", os.getenv("MAX_ACTIVE_TASKS", "4")))
+    analise = asyncio.Semaphore(max_ativos)
+    # Documentos em andamento: em análise ou ingeridos à espera da análise
+    janela = asyncio.Semaphore(max_ativos + int(os.getenv("BATCH_INGEST_AHEAD", "2")))
+    # A ingestão antecipada deixa um worker de ingestão livre para os documentos em análise
+    # (o pool é FIFO: sem isso, a ingestão dos documentos admitidos espera a dos próximos)
+    ingestao = asyncio.Semaphore(max(1, pipeline.stats()["ingestao"]["concorrencia"] - 1))
+
+    async def entrar_na_admissao(task_id: str):
+        while True:
+            try:
+                posicao = admission.entrar(task_id)
+                break
+            except FilaCheiaError:
+                await asyncio.sleep(ESPERA_FILA_CHEIA)
+        if posicao:
+            event_bus.publish(task_id, "fila", posicao=posicao)
+
+    async def processar(task_id: str, pdf_path: str, doc_hash: str):
+        async with janela:
+            emitir = lambda tipo, **dados: event_bus.publish(task_id, tipo, **dados)
+            try:
+                async with ingestao:
+                    await pipeline.executar("ingestao", pre_ingerir, pdf_path, doc_hash, emitir)
+            except Exception:
+                pass  # A análise refaz a ingestão e registra o erro na tarefa do documento
+            async with analise:
+                await entrar_na_admissao(task_id)
+                await process_document(task_id, pdf_path, agent_list, doc_hash, lote_id=lote_id)
+
+    await asyncio.gather(*(processar(*documento) for documento in documentos))
+
+def obter_lote(batch_id: str) -> AnalysisResult:
+    lote = task_store.get(batch_id)
+    if not eh_lote(lote):
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    return lote
+
+@router.get("/batch/{batch_id}", response_model=BatchResult)
+async def get_batch_status(batch_id: str):
+    """
+    Progresso agregado do lote e situação de cada documento
+    (eventos do lote em /events/{batch_id})
+    """
+    lote = await asyncio.to_thread(obter_lote, batch_id)
+    return await asyncio.to_thread(resumir_lote, lote)
+
+@router.get("/batch/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """
+    Resultados de cada documento do lote (os concluídos até o momento)
+    """
+    lote = await asyncio.to_thread(obter_lote, batch_id)
+    resumo = await asyncio.to_thread(resumir_lote, lote)
+    resultados = {}
+    for documento in resumo.documentos:
+        task = await asyncio.to_thread(task_store.get, documento.task_id)
+        resultados[documento.task_id] = {
+            "nome": documento.nome,
+            "status": documento.status,
+            "results": task.results if task else {},
+            "error": documento.error,
+        }
+    return {
+        "batch_id": batch_id,
+        "status": resumo.status,
+        "progress": resumo.progress,
+        "resultados": resultados,
+    }
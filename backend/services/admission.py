@@ -0,0 +1,98 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from services.events import get_event_bus
+
+
+class FilaCheiaError(Exception):
+    """Fila de admissão no limite: o upload deve ser recusado"""
+
+
+class TaskAdmission:
+    """
+    Admissão de tarefas do processo: até max_ativas processando ao mesmo tempo;
+    as demais esperam em fila (ordem de chegada) e conhecem sua posição.
+    Usada apenas a partir do event loop.
+    """
+
+    def __init__(self, max_ativas: int, max_fila: int):
+        self.max_ativas = max(1, max_ativas)
+        self.max_fila = max_fila  # 0 = fila sem limite
+        self._ativas: set = set()
+        self._fila: "OrderedDict[str, asyncio.Event]" = OrderedDict()
+        self.on_posicao: Optional[Callable[[str, int], None]] = None  # Chamado quando a posição muda
+
+    def cheia(self) -> bool:
+        return bool(self.max_fila) and len(self._ativas) >= self.max_ativas and len(self._fila) >= self.max_fila
+
+    def entrar(self, task_id: str) -> int:
+        """Registra a tarefa; retorna 0 se pode começar já, senão sua posição na fila"""
+        if len(self._ativas) < self.max_ativas and not self._fila:
+            self._ativas.add(task_id)
+            return 0
+        if self.cheia():
+            raise FilaCheiaError(f"{len(self._fila)} tarefas aguardando processamento")
+        self._fila[task_id] = asyncio.Event()
+        return len(self._fila)
+
+    def posicao(self, task_id: str) -> Optional[int]:
+        """Posição na fila (1 = próxima), 0 se já está processando, None se desconhecida"""
+        if task_id in self._ativas:
+            return 0
+        for posicao, tarefa in enumerate(self._fila, start=1):
+            if tarefa == task_id:
+                return posicao
+        return None
+
+    async def aguardar(self, task_id: str) -> None:
+        """Espera a vez da tarefa (retorna imediatamente se já admitida)"""
+        evento = self._fila.get(task_id)
+        if evento is not None:
+            await evento.wait()
+
+    def liberar(self, task_id: str) -> None:
+        """Tarefa encerrada (ou removida da fila): admite as próximas"""
+        self._ativas.discard(task_id)
+        self._fila.pop(task_id, None)
+        while self._fila and len(self._ativas) < self.max_ativas:
+            proxima, evento = self._fila.popitem(last=False)
+            self._ativas.add(proxima)
+            evento.set()
+        if self.on_posicao:
+            for posicao, tarefa in enumerate(self._fila, start=1):
+                self.on_posicao(tarefa, posicao)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_ativas": self.max_ativas,
+            "ativas": len(self._ativas),
+            "na_fila": len(self._fila),
+            "max_fila": self.max_fila,
+        }
+
+
+_admission: Optional[TaskAdmission] = None
+_admission_lock = threading.Lock()
+
+
+def _avisar_posicao(task_id: str, posicao: int) -> None:
+    get_event_bus().publish(task_id, "fila", posicao=posicao)
+
+
+def get_admission() -> TaskAdmission:
+    """
+    Instância única da admissão de tarefas por processo, criada no primeiro uso (depois do
+    .env carregado). Tarefas na fila são avisadas pelo canal de eventos quando a posição muda.
+    """
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = TaskAdmission(
+                max_ativas=int(os.getenv("MAX_ACTIVE_TASKS", "4")),
+                max_fila=int(os.getenv("MAX_QUEUED_TASKS", "50")),
+            )
+            _admission.on_posicao = _avisar_posicao
+        return _admission
@@ -0,0 +1,68 @@
+from typing import Optional
+
+from models import AnalysisResult, BatchDocument, BatchDuplicate, BatchResult
+from services.events import get_event_bus
+from services.task_store import ESTADOS_FINAIS, get_task_store
+
+
+def eh_lote(task: Optional[AnalysisResult]) -> bool:
+    return task is not None and "lote" in task.metadata
+
+
+def resumir_lote(lote: AnalysisResult) -> BatchResult:
+    """Situação agregada do lote a partir das tarefas de cada documento"""
+    task_store = get_task_store()
+    documentos = []
+    contagem = {}
+    for documento in lote.metadata["lote"]["documentos"]:
+        task = task_store.get(documento["task_id"])
+        documento = BatchDocument(
+            **documento,
+            status=task.status if task else "error",
+            progress=task.progress if task else 0,
+            error=(task.error if task else "Tarefa removida ou expirada"),
+        )
+        documentos.append(documento)
+        contagem[documento.status] = contagem.get(documento.status, 0) + 1
+
+    finalizados = sum(contagem.get(estado, 0) for estado in ESTADOS_FINAIS)
+    if documentos and finalizados == len(documentos):
+        status = "completed" if contagem.get("completed") else "error"
+    else:
+        status = "processing"
+    return BatchResult(
+        batch_id=lote.task_id,
+        status=status,
+        progress=sum(d.progress for d in documentos) // len(documentos) if documentos else 100,
+        contagem=contagem,
+        documentos=documentos,
+        duplicados=[BatchDuplicate(**d) for d in lote.metadata["lote"]["duplicados"]],
+    )
+
+
+def notificar_lote(lote_id: str, task_id: str) -> None:
+    """
+    Documento do lote finalizado: publica o evento no lote e, quando todos os documentos
+    terminam, grava o estado final do lote uma única vez (compare-and-set: entre documentos
+    que terminam ao mesmo tempo, só um finaliza e publica). Bloqueante: chamar fora do event loop.
+    """
+    task_store = get_task_store()
+    lote = task_store.get(lote_id)
+    if not eh_lote(lote):
+        return
+    resumo = resumir_lote(lote)
+    documento = next((d for d in resumo.documentos if d.task_id == task_id), None)
+    get_event_bus().publish(
+        lote_id, "documento",
+        tarefa=task_id,
+        nome=documento.nome if documento else None,
+        status=documento.status if documento else None,
+        progress=resumo.progress,
+        contagem=resumo.contagem,
+    )
+    if resumo.status in ESTADOS_FINAIS and lote.status not in ESTADOS_FINAIS:
+        # O evento do documento é gravado antes do status final do lote
+        get_event_bus().esvaziar()
+        # Documentos que terminam juntos podem chegar aqui ao mesmo tempo: só quem finaliza publica
+        if task_store.update_se_ativa(lote_id, status=resumo.status, progress=100) is not None:
+            get_event_bus().publish(lote_id, "concluido", progress=100, status=resumo.status)
@@ -0,0 +1,263 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agno.document import Document
+from agno.document.chunking.strategy import ChunkingStrategy
+
+# Tipo de peça -> título que a abre (linha curta, em maiúsculas)
+PADROES_PECA: Tuple[Tuple[str, str], ...] = (
+    ("denuncia", r"\bDEN[ÚU]NCIA\b"),
+    ("resposta_acusacao", r"\bRESPOSTA\s+(?:[ÀA]\s+)?ACUSA[ÇC][ÃA]O\b|\bDEFESA\s+PR[ÉE]VIA\b"),
+    ("alegacoes_finais", r"\bALEGA[ÇC][ÕO]ES\s+FINAIS\b|\bMEMORIAIS\b"),
+    ("sentenca", r"\bSENTEN[ÇC]A\b"),
+    ("acordao", r"\bAC[ÓO]RD[ÃA]O\b"),
+    ("decisao", r"\bDECIS[ÃA]O\b"),
+    ("despacho", r"\bDESPACHO\b"),
+    ("termo_audiencia", r"\bTERMO\s+DE\s+AUDI[ÊE]NCIA\b|\bASSENTADA\b|\bAUDI[ÊE]NCIA\s+DE\s+INSTRU[ÇC][ÃA]O\b"),
+    ("laudo", r"\bLAUDO\b"),
+    ("inquerito", r"\bINQU[ÉE]RITO\s+POLICIAL\b|\bAUTO\s+DE\s+PRIS[ÃA]O\s+EM\s+FLAGRANTE\b"
+                  r"|\bBOLETIM\s+DE\s+OCORR[ÊE]NCIA\b"),
+)
+
+# Trechos sem peça identificada (antes do primeiro título ou depois de um bloco de assinatura)
+TIPO_OUTRO = "outro"
+# Petição endereçada ao juízo cujo tipo ainda não apareceu nas primeiras linhas
+TIPO_PETICAO = "peticao"
+
+_PECAS = tuple((tipo, re.compile(padrao)) for tipo, padrao in PADROES_PECA)
+_PECAS_NO_TEXTO = tuple((tipo, re.compile(padrao, re.IGNORECASE)) for tipo, padrao in PADROES_PECA)
+# Seções internas de uma peça ("I - DA DENÚNCIA", "DOS FATOS") não abrem peça nova
+_SECAO_INTERNA = re.compile(r"^(?:[IVXLC]+|\d+)?\s*[-–.)]?\s*D[AO]S?\s", re.IGNORECASE)
+_ENDERECAMENTO = re.compile(r"^EXCELENT[ÍI]SSIM[OA]\b|^EXMO\.?\b", re.IGNORECASE)
+# Linhas após o endereçamento em que o tipo da petição é procurado
+LINHAS_TIPO_PETICAO = 30
+
+# Fecham a peça: papel de quem assina, OAB ou assinatura digital dentro da peça
+_ASSINATURA = re.compile(
+    r"^(?:Ju[íi]z(?:a)?\s+(?:de\s+Direito|Federal|Substitut[oa])|Promotor(?:a)?\s+de\s+Justi[çc]a"
+    r"|Procurador(?:a)?\s+(?:de\s+Justi[çc]a|da\s+Rep[úu]blica)|Defensor(?:a)?\s+P[úu]blic[oa]"
+    r"|Advogad[oa]s?\b|OAB\s*/?\s*[A-Z]{2}\b|Delegad[oa]\s+de\s+Pol[íi]cia|Escriv[ãa]o?\b|Perit[oa]\s+Criminal)",
+    re.IGNORECASE,
+)
+
+# Cabeçalhos e rodapés do sistema processual (os prompts já mandam ignorá-los)
+_RUIDO = re.compile(
+    r"^(?:Assinado\s+eletronicamente\s+por\b|Documento\s+assinado\s+(?:digital|eletronicamente)"
+    r"|N[úu]m\.\s*\d+\s*-\s*P[áa]g\.\s*\d+|Este\s+documento\s+foi\s+gerado\s+pelo\s+usu[áa]rio"
+    r"|N[úu]mero\s+do\s+documento:|Para\s+conferir\s+o\s+original|C[óo]digo\s+verificador\b"
+    r"|P[áa]gina\s+\d+\s+(?:de|/)\s+\d+\s*$|\d{1,5}\s*$"
+    r"|https?://\S*(?:jus\.br|consulta|autenticidade|validar)\S*\s*$)",
+    re.IGNORECASE,
+)
+_FOLHA = re.compile(r"^(?:Fls?\.?|Folha)\s*\d+\b", re.IGNORECASE)
+# Linhas de borda (início/fim da página) repetidas em tantas páginas são cabeçalho/rodapé
+REPETICOES_CABECALHO = 3
+LINHAS_DE_BORDA = 2
+
+
+def _eh_titulo(linha: str) -> bool:
+    letras = [c for c in linha if c.isalpha()]
+    return 3 <= len(linha) <= 100 and bool(letras) and sum(c.isupper() for c in letras) / len(letras) >= 0.7
+
+
+def _eh_assinatura(linha: str) -> bool:
+    return len(linha) <= 80 and bool(_ASSINATURA.match(linha))
+
+
+def tipo_do_titulo(linha: str) -> Optional[str]:
+    """Tipo de peça aberta pela linha, se ela for um título de peça"""
+    if not _eh_titulo(linha) or _SECAO_INTERNA.match(linha):
+        return None
+    for tipo, padrao in _PECAS:
+        if padrao.search(linha):
+            return tipo
+    return None
+
+
+@dataclass
+class PecaProcessual:
+    """Entrada do índice de peças do documento"""
+    tipo: str
+    pagina_inicial: int
+    pagina_final: int
+    titulo: str = ""
+
+    def to_dict(self) -> Dict:
+        return {"tipo": self.tipo, "pagina_inicial": self.pagina_inicial,
+                "pagina_final": self.pagina_final, "titulo": self.titulo}
+
+
+@dataclass
+class _Estado:
+    """Estado da divisão de um documento, página a página"""
+    nome: str
+    pecas: List[PecaProcessual]
+    texto: str = ""  # peça corrente ainda não emitida (com a sobreposição do chunk anterior)
+    paginas: List[Tuple[int, int]] = field(default_factory=list)  # (posição no texto, página)
+    novos: int = 0  # caracteres ainda não emitidos em nenhum chunk
+    chunks: int = 0
+    assinada: bool = False
+    vazia: bool = True  # peça corrente ainda sem texto
+    linhas_peticao: int = 0
+    bordas: Counter = field(default_factory=Counter)
+
+
+class ChunkingPecas(ChunkingStrategy):
+    """
+    Divisão ciente da estrutura do processo: os chunks não atravessam peças processuais
+    (denúncia, sentença, alegações finais, termo de audiência...). Cada chunk leva nos
+    metadados o tipo da peça e as páginas que cobre; cabeçalhos e rodapés do sistema são
+    descartados. Em streaming (fragmentar), só a peça corrente fica em memória.
+    """
+
+    def __init__(self, chunk_size: int = 1500, overlap: int = 150):
+        if overlap >= chunk_size:
+            raise ValueError(f"Invalid parameters: overlap ({overlap}) must be less than chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def chunk(self, document: Document) -> List[Document]:
+        return list(self.fragmentar([document]))
+
+    def fragmentar(self, paginas: Iterable[Document], pecas: Optional[List[PecaProcessual]] = None
+                   ) -> Iterator[Document]:
+        """
+        Chunks de um documento a partir das páginas, em ordem (meta_data["page"] de cada uma).
+        pecas recebe o índice de peças do documento à medida que elas são identificadas.
+        """
+        estado: Optional[_Estado] = None
+        pecas = pecas if pecas is not None else []
+        # As primeiras páginas esperam até o cabeçalho/rodapé repetido poder ser reconhecido
+        iniciais: List[Tuple[Document, List[str]]] = []
+        for pagina in paginas:
+            if estado is None:
+                estado = _Estado(nome=pagina.name or "documento", pecas=pecas)
+                self._abrir_peca(estado, TIPO_OUTRO, pagina.meta_data.get("page", 1), "")
+            linhas = self._linhas(estado, pagina)
+            if len(iniciais) < REPETICOES_CABECALHO:
+                iniciais.append((pagina, linhas))
+                if len(iniciais) < REPETICOES_CABECALHO:
+                    continue
+                for inicial in iniciais:
+                    yield from self._pagina(estado, *inicial)
+            else:
+                yield from self._pagina(estado, pagina, linhas)
+        if estado is not None:
+            if len(iniciais) < REPETICOES_CABECALHO:
+                for inicial in iniciais:
+                    yield from self._pagina(estado, *inicial)
+            yield from self._emitir(estado, final=True)
+
+    @staticmethod
+    def _linhas(estado: _Estado, pagina: Document) -> List[str]:
+        """Linhas não vazias da página, contando as de borda"""
+        linhas = [linha.strip() for linha in pagina.content.splitlines()]
+        linhas = [linha for linha in linhas if linha]
+        for linha in set(linhas[:LINHAS_DE_BORDA] + linhas[-LINHAS_DE_BORDA:]):
+            estado.bordas[re.sub(r"\d+", "#", linha)] += 1
+        return linhas
+
+    def _pagina(self, estado: _Estado, pagina: Document, linhas: List[str]) -> Iterator[Document]:
+        numero = pagina.meta_data.get("page", 1)
+        bordas = set(linhas[:LINHAS_DE_BORDA] + linhas[-LINHAS_DE_BORDA:])
+        estado.paginas.append((len(estado.texto), numero))
+        for linha in linhas:
+            if _RUIDO.match(linha) or (_FOLHA.match(linha) and len(linha) <= 60):
+                continue
+            if linha in bordas and estado.bordas[re.sub(r"\d+", "#", linha)] >= REPETICOES_CABECALHO:
+                continue
+
+            tipo = tipo_do_titulo(linha)
+            if tipo is None and _ENDERECAMENTO.match(linha):
+                tipo = TIPO_PETICAO
+            assinatura = _eh_assinatura(linha)
+            if tipo is not None and estado.linhas_peticao:
+                # Título logo após o endereçamento: é o tipo da petição, não uma peça nova
+                if tipo != TIPO_PETICAO:
+                    estado.pecas[-1].tipo = tipo
+                    estado.linhas_peticao = 0
+            elif tipo is not None:
+                yield from self._emitir(estado, final=True)
+                self._abrir_peca(estado, tipo, numero, linha)
+            elif estado.assinada and not assinatura:
+                # Depois do bloco de assinatura, o que vem até o próximo título não é da peça
+                yield from self._emitir(estado, final=True)
+                self._abrir_peca(estado, TIPO_OUTRO, numero, "")
+            elif estado.linhas_peticao:
+                self._tipar_peticao(estado, linha)
+
+            if assinatura and estado.pecas[-1].tipo != TIPO_OUTRO:
+                estado.assinada = True
+            estado.pecas[-1].pagina_final = numero
+            estado.vazia = False
+            estado.texto += linha + " "
+            estado.novos += len(linha) + 1
+            if len(estado.texto) >= self.chunk_size + self.overlap:
+                yield from self._emitir(estado)
+
+    def _abrir_peca(self, estado: _Estado, tipo: str, pagina: int, titulo: str) -> None:
+        if estado.pecas and estado.vazia:
+            estado.pecas.pop()
+        estado.vazia = True
+        estado.pecas.append(PecaProcessual(tipo, pagina, pagina, titulo[:120]))
+        estado.assinada = False
+        estado.linhas_peticao = LINHAS_TIPO_PETICAO if tipo == TIPO_PETICAO else 0
+        estado.paginas = [(0, pagina)]
+
+    def _tipar_peticao(self, estado: _Estado, linha: str) -> None:
+        """Tipo da petição pelo que ela diz apresentar nas primeiras linhas"""
+        estado.linhas_peticao -= 1
+        for tipo, padrao in _PECAS_NO_TEXTO:
+            if tipo in ("denuncia", "resposta_acusacao", "alegacoes_finais") and padrao.search(linha):
+                estado.pecas[-1].tipo = tipo
+                estado.linhas_peticao = 0
+                return
+
+    def _emitir(self, estado: _Estado, final: bool = False) -> Iterator[Document]:
+        """Chunks do texto acumulado (final: também o resto, e zera a peça)"""
+        while len(estado.texto) >= self.chunk_size + self.overlap or (final and estado.novos > 0):
+            texto = estado.texto
+            fim = min(self.chunk_size, len(texto))
+            if fim < len(texto):
+                # Não corta palavras ao meio
+                corte = texto.rfind(" ", 0, fim + 1)
+                fim = corte if corte > self.overlap else fim
+            conteudo = texto[:fim].strip()
+            if conteudo:
+                yield self._documento(estado, conteudo, fim)
+            inicio = max(fim - self.overlap, 0) if fim < len(texto) else len(texto)
+            estado.novos = max(0, len(texto) - max(fim, len(texto) - estado.novos))
+            estado.texto = texto[inicio:]
+            estado.paginas = self._deslocar(estado.paginas, inicio)
+            if fim >= len(texto):
+                break
+        if final:
+            estado.texto = ""
+            estado.novos = 0
+
+    def _documento(self, estado: _Estado, conteudo: str, fim: int) -> Document:
+        paginas = [pagina for posicao, pagina in estado.paginas if posicao < fim] or [estado.paginas[0][1]]
+        peca = estado.pecas[-1]
+        estado.chunks += 1
+        return Document(
+            id=f"{estado.nome}_{estado.chunks}",
+            name=estado.nome,
+            meta_data={
+                "page": paginas[0],
+                "pagina_final": paginas[-1],
+                "tipo_peca": peca.tipo,
+                "peca": len(estado.pecas),
+                "chunk": estado.chunks,
+                "chunk_size": len(conteudo),
+            },
+            content=conteudo,
+        )
+
+    @staticmethod
+    def _deslocar(paginas: List[Tuple[int, int]], inicio: int) -> List[Tuple[int, int]]:
+        """Posições das páginas no texto restante (a página em curso no início passa a valer da posição 0)"""
+        restantes = [(posicao - inicio, pagina) for posicao, pagina in paginas if posicao > inicio]
+        anteriores = [pagina for posicao, pagina in paginas if posicao <= inicio]
+        return ([(0, anteriores[-1])] if anteriores else []) + restantes
@@ -0,0 +1,258 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agno.embedder.base import Embedder
+
+from services.llm_governor import get_governor
+from services.metrics import get_metrics
+
+
+def calcular_hash_arquivo(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 do conteúdo de um arquivo"""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache persistente (SQLite) de embeddings endereçado por conteúdo.
+    Entradas sem acesso há mais de ttl_seconds expiram e, acima de max_bytes, as acessadas
+    há mais tempo são removidas (LRU).
+    """
+
+    # Aplica TTL e limite de tamanho a cada N gravações (uma ingestão grava milhares)
+    PURGA_A_CADA = 500
+    # Acessos registram o instante só se o anterior tiver mais que isso (evita uma escrita por hit)
+    RESOLUCAO_ACESSO = 3600.0
+
+    def __init__(self, path: str, ttl_seconds: int = 90 * 86400, max_bytes: int = 2 * 1024 ** 3):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                chave TEXT PRIMARY KEY,
+                vetor BLOB NOT NULL,
+                documento TEXT,
+                criado_em REAL NOT NULL
+            )
+        """)
+        # Bancos anteriores ao limite de tamanho: colunas de acesso e tamanho preenchidas uma vez
+        colunas = {linha[1] for linha in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "acessado_em" not in colunas:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN acessado_em REAL")
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN tamanho INTEGER")
+            self._conn.execute("UPDATE embeddings SET acessado_em = criado_em, tamanho = LENGTH(vetor)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_acesso ON embeddings (acessado_em)")
+        self._conn.commit()
+
+    @staticmethod
+    def gerar_chave(texto: str, embedder_id: str, dimensions: Optional[int],
+                    chunk_size: int, chunk_overlap: int) -> str:
+        """Chave do embedding: texto do chunk + parâmetros de chunking + embedder"""
+        texto_hash = hashlib.sha256(texto.encode("utf-8", errors="replace")).hexdigest()
+        base = f"{embedder_id}|{dimensions}|{chunk_size}|{chunk_overlap}|{texto_hash}"
+        return hashlib.sha256(base.encode()).hexdigest()
+
+    def get(self, chave: str) -> Optional[List[float]]:
+        """Obtém um embedding do cache, contabilizando hit/miss"""
+        agora = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vetor, acessado_em FROM embeddings WHERE chave = ?", (chave,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if agora - (row[1] or 0) > self.RESOLUCAO_ACESSO:
+                self._conn.execute("UPDATE embeddings SET acessado_em = ? WHERE chave = ?", (agora, chave))
+                self._conn.commit()
+        vetor = array('f')
+        vetor.frombytes(row[0])
+        return vetor.tolist()
+
+    def set(self, chave: str, vetor: List[float], documento: Optional[str] = None) -> None:
+        """Armazena um embedding no cache"""
+        blob = array('f', vetor).tobytes()
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (chave, vetor, documento, criado_em, acessado_em, tamanho) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, blob, documento, agora, agora, len(blob))
+            )
+            self._gravacoes += 1
+            if self._gravacoes % self.PURGA_A_CADA == 0:
+                self._conn.execute("DELETE FROM embeddings WHERE acessado_em < ?", (agora - self.ttl_seconds,))
+                self._aplicar_limite()
+            self._conn.commit()
+
+    def _aplicar_limite(self) -> None:
+        """Remove os embeddings acessados há mais tempo até caber em max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excesso = total - int(self.max_bytes * 0.9)  # Folga para não coletar a cada purga
+        removidos = 0
+        for chave, tamanho in self._conn.execute(
+            "SELECT chave, tamanho FROM embeddings ORDER BY acessado_em"
+        ).fetchall():
+            if removidos >= excesso:
+                break
+            self._conn.execute("DELETE FROM embeddings WHERE chave = ?", (chave,))
+            removidos += tamanho
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de uso do cache"""
+        with self._lock:
+            entradas, tamanho = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM embeddings"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entradas": entradas,
+                "bytes": tamanho,
+                "max_bytes": self.max_bytes,
+            }
+
+
+@dataclass
+class CachedEmbedder(Embedder):
+    """Embedder que consulta o EmbeddingCache antes de chamar o embedder real"""
+
+    embedder: Optional[Embedder] = None
+    cache: Optional[EmbeddingCache] = None
+    chunk_size: int = 0
+    chunk_overlap: int = 0
+    documento: Optional[str] = None
+    on_embed: Optional[Callable[[bool], None]] = None  # Chamado a cada embedding (True = veio do cache)
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    segundos_embedding: float = field(default=0.0, init=False)  # Tempo nas chamadas ao embedder real
+    # Lotes de um mesmo documento são embedados em paralelo durante a ingestão
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.embedder is None or self.cache is None:
+            raise ValueError("CachedEmbedder requer embedder e cache")
+        self.dimensions = self.embedder.dimensions
+
+    @property
+    def embedder_id(self) -> str:
+        return getattr(self.embedder, "id", type(self.embedder).__name__)
+
+    def _chave(self, text: str) -> str:
+        return EmbeddingCache.gerar_chave(
+            text, self.embedder_id, self.dimensions, self.chunk_size, self.chunk_overlap
+        )
+
+    def get_embedding(self, text: str) -> List[float]:
+        embedding, _ = self.get_embedding_and_usage(text)
+        return embedding
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        chave = self._chave(text)
+        embedding = self.cache.get(chave)
+        if embedding is not None:
+            with self._lock:
+                self.hits += 1
+            if self.on_embed:
+                self.on_embed(True)
+            return embedding, None
+
+        with self._lock:
+            self.misses += 1
+        inicio = time.perf_counter()
+        embedding, usage = get_governor("embedding").executar(
+            self.embedder.get_embedding_and_usage, text, tokens_estimados=_estimar_tokens(text)
+        )
+        self._medir_embedding(time.perf_counter() - inicio, 1)
+        if embedding:
+            self.cache.set(chave, embedding, documento=self.documento)
+        if self.on_embed:
+            self.on_embed(False)
+        return embedding, usage
+
+    def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de vários textos: o que não está no cache vai ao embedder numa única chamada"""
+        chaves = [self._chave(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = [self.cache.get(chave) for chave in chaves]
+        faltantes = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        with self._lock:
+            self.hits += len(texts) - len(faltantes)
+            self.misses += len(faltantes)
+
+        if faltantes:
+            inicio = time.perf_counter()
+            novos = embed_batch(self.embedder, [texts[i] for i in faltantes])
+            self._medir_embedding(time.perf_counter() - inicio, len(faltantes))
+            for i, embedding in zip(faltantes, novos):
+                embeddings[i] = embedding
+                if embedding:
+                    self.cache.set(chaves[i], embedding, documento=self.documento)
+        if self.on_embed:
+            gerados = set(faltantes)
+            with self._lock:
+                for i in range(len(texts)):
+                    self.on_embed(i not in gerados)
+        return embeddings
+
+    def _medir_embedding(self, segundos: float, textos: int) -> None:
+        with self._lock:
+            self.segundos_embedding += segundos
+        get_metrics().estagio_segundos.observe(segundos, stage="embedding", item="lote" if textos > 1 else "chunk")
+
+
+def embed_batch(embedder: Embedder, texts: List[str]) -> List[List[float]]:
+    """Gera embeddings em lote quando o embedder aceita lista na API (OpenAI); senão, um a um"""
+    if not texts:
+        return []
+    governor = get_governor("embedding")
+    response = getattr(embedder, "response", None)
+    if callable(response):
+        resposta = governor.executar(response, text=texts, tokens_estimados=sum(map(_estimar_tokens, texts)))
+        dados = sorted(resposta.data, key=lambda item: item.index)
+        return [item.embedding for item in dados]
+    return [governor.executar(embedder.get_embedding, text, tokens_estimados=_estimar_tokens(text)) for text in texts]
+
+
+def _estimar_tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Instância única do cache de embeddings por processo"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                path=os.getenv("EMBEDDING_CACHE_PATH", "tmp/embedding_cache.db"),
+                ttl_seconds=int(os.getenv("EMBEDDING_CACHE_TTL", str(90 * 86400))),
+                max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(2 * 1024 ** 3))),
+            )
+        return _embedding_cache
@@ -0,0 +1,143 @@
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from services.task_store import TaskStore, ESTADOS_FINAIS, get_task_store
+
+logger = logging.getLogger(__name__)
+
+# Eventos que encerram o canal de uma tarefa
+EVENTOS_FINAIS = ("concluido", "erro")
+
+
+class EventBus:
+    """
+    Canal de eventos por tarefa. Os eventos ficam no TaskStore (visíveis a todos os workers)
+    e os assinantes do próprio processo são acordados assim que são gravados; eventos
+    publicados por outros processos são percebidos por uma verificação periódica.
+    publish não toca no banco: uma thread de escrita grava os eventos em lotes, na ordem
+    de publicação, para que o loop do asyncio nunca espere pelo lock do SQLite.
+    """
+
+    MAX_LOTE = 256  # eventos por transação
+
+    def __init__(self, store: TaskStore, poll_interval: float = 1.0, heartbeat_interval: float = 15.0):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._lock = threading.Lock()
+        self._assinantes: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._fila: "queue.Queue[Tuple[str, str, Dict]]" = queue.Queue()
+        self._escritor: Optional[threading.Thread] = None
+        self._gravacao = threading.Condition(self._lock)
+        self._publicados = 0
+        self._gravados = 0
+
+    def publish(self, task_id: str, tipo: str, **dados) -> None:
+        """Publica um evento (pode ser chamado de qualquer thread, não bloqueia)"""
+        with self._lock:
+            if self._escritor is None:
+                self._escritor = threading.Thread(target=self._gravar_eventos, name="event-bus", daemon=True)
+                self._escritor.start()
+                # Eventos ainda na fila são gravados antes de o processo terminar
+                atexit.register(self.esvaziar)
+            self._publicados += 1
+            self._fila.put((task_id, tipo, dados))
+
+    def esvaziar(self) -> None:
+        """Aguarda a gravação dos eventos publicados até aqui (bloqueia: chamar fora do loop)"""
+        with self._gravacao:
+            alvo = self._publicados
+            self._gravacao.wait_for(lambda: self._gravados >= alvo)
+
+    def _gravar_eventos(self) -> None:
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < self.MAX_LOTE:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.store.append_events(lote)
+            except Exception:
+                logger.exception("Falha ao gravar %d eventos", len(lote))
+            with self._gravacao:
+                self._gravados += len(lote)
+                self._gravacao.notify_all()
+            self._acordar({task_id for task_id, _, _ in lote})
+
+    def _acordar(self, task_ids: Set[str]) -> None:
+        with self._lock:
+            assinantes = [a for task_id in task_ids for a in self._assinantes.get(task_id, ())]
+        for loop, evento in assinantes:
+            try:
+                loop.call_soon_threadsafe(evento.set)
+            except RuntimeError:
+                pass  # Loop já encerrado
+
+    async def stream(self, task_id: str, after_seq: int = 0) -> AsyncIterator[Optional[Dict]]:
+        """
+        Itera sobre os eventos da tarefa a partir de after_seq até um evento final.
+        Produz None como heartbeat quando não há eventos por heartbeat_interval segundos.
+        """
+        aviso = asyncio.Event()
+        assinante = (asyncio.get_running_loop(), aviso)
+        with self._lock:
+            self._assinantes.setdefault(task_id, set()).add(assinante)
+
+        try:
+            ultimo_envio = time.monotonic()
+            finalizada_em = None
+            while True:
+                aviso.clear()
+                eventos: List[Dict] = await asyncio.to_thread(self.store.get_events, task_id, after_seq)
+                for evento in eventos:
+                    after_seq = evento["seq"]
+                    yield evento
+                    if evento["tipo"] in EVENTOS_FINAIS:
+                        return
+
+                if eventos:
+                    ultimo_envio = time.monotonic()
+                else:
+                    task = await asyncio.to_thread(self.store.get, task_id)
+                    if task is None:
+                        return
+                    if task.status in ESTADOS_FINAIS:
+                        # O status final é gravado antes do evento final: aguarda um pouco por ele
+                        finalizada_em = finalizada_em or time.monotonic()
+                        if time.monotonic() - finalizada_em > 2 * self.poll_interval:
+                            return
+                    if time.monotonic() - ultimo_envio >= self.heartbeat_interval:
+                        ultimo_envio = time.monotonic()
+                        yield None
+
+                try:
+                    await asyncio.wait_for(aviso.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                assinantes = self._assinantes.get(task_id)
+                if assinantes is not None:
+                    assinantes.discard(assinante)
+                    if not assinantes:
+                        del self._assinantes[task_id]
+
+
+_event_bus: Optional[EventBus] = None
+_event_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """Instância única do canal de eventos por processo"""
+    global _event_bus
+    with _event_bus_lock:
+        if _event_bus is None:
+            _event_bus = EventBus(get_task_store())
+        return _event_bus
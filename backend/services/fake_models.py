@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import json
+import math
+import threading
+import time
+import typing
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional, Tuple, Type
+
+from agno.embedder.base import Embedder
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from pydantic import BaseModel
+
+# Vocabulário das respostas sintéticas
+PALAVRAS = (
+    "processo réu defesa acusação testemunha prova sentença prisão preventiva dosimetria pena "
+    "artigo código penal jurisprudência súmula recurso habeas corpus denúncia laudo interrogatório "
+    "magistrado decisão liberdade provisória medida cautelar materialidade autoria fundamentação"
+).split()
+
+
+def _estimar_tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+class _GeradorDeterministico:
+    """Gera texto e valores a partir de uma semente, sem aleatoriedade global"""
+
+    def __init__(self, semente: str):
+        self._estado = hashlib.sha256(semente.encode("utf-8", errors="replace")).digest()
+        self._posicao = 0
+
+    def _proximo(self) -> int:
+        if self._posicao >= len(self._estado):
+            self._estado = hashlib.sha256(self._estado).digest()
+            self._posicao = 0
+        valor = self._estado[self._posicao]
+        self._posicao += 1
+        return valor
+
+    def frase(self, palavras: int) -> str:
+        texto = " ".join(PALAVRAS[self._proximo() % len(PALAVRAS)] for _ in range(palavras))
+        return texto.capitalize() + "."
+
+    def valor(self, anotacao: Any, palavras: int) -> Any:
+        """Valor sintético válido para a anotação de tipo do campo"""
+        origem = typing.get_origin(anotacao)
+        argumentos = typing.get_args(anotacao)
+        if origem is typing.Union:
+            anotacao = next(a for a in argumentos if a is not type(None))
+            return self.valor(anotacao, palavras)
+        if origem in (list, List):
+            return [self.valor(argumentos[0] if argumentos else str, palavras // 2 or 1) for _ in range(3)]
+        if anotacao is bool:
+            return bool(self._proximo() % 2)
+        if anotacao is int:
+            return self._proximo()
+        if isinstance(anotacao, type) and issubclass(anotacao, BaseModel):
+            return self.payload(anotacao, palavras)
+        return self.frase(palavras)
+
+    def payload(self, response_model: Type[BaseModel], palavras: int) -> Dict[str, Any]:
+        return {
+            nome: self.valor(campo.annotation, palavras)
+            for nome, campo in response_model.model_fields.items()
+        }
+
+
+@dataclass
+class FakeChat(Model):
+    """
+    Modelo de chat local e determinístico para benchmarks sem rede.
+    Responde com um JSON válido para response_model (ou texto livre) após uma latência configurável.
+    """
+
+    id: str = "fake-chat"
+    name: str = "FakeChat"
+    provider: str = "Fake"
+
+    response_model: Optional[Type[BaseModel]] = None
+    latencia: float = 1.0  # segundos por resposta
+    latencia_por_token: float = 0.0  # segundos por token gerado
+    palavras_por_campo: int = 40
+
+    def _gerar(self, messages: List[Message]) -> Tuple[str, Dict[str, int]]:
+        prompt = "\n".join(m.get_content_string() for m in messages if m.content)
+        ultima = next((m.get_content_string() for m in reversed(messages) if m.role == "user"), "")
+        gerador = _GeradorDeterministico(f"{self.response_model}|{ultima}")
+
+        if self.response_model is not None:
+            conteudo = json.dumps(gerador.payload(self.response_model, self.palavras_por_campo), ensure_ascii=False)
+        else:
+            conteudo = " ".join(gerador.frase(self.palavras_por_campo) for _ in range(5))
+
+        uso = {"input_tokens": _estimar_tokens(prompt), "output_tokens": _estimar_tokens(conteudo)}
+        return conteudo, uso
+
+    def _aguardar(self, uso: Dict[str, int]) -> None:
+        time.sleep(self.latencia + self.latencia_por_token * uso["output_tokens"])
+
+    def invoke(self, messages: List[Message]) -> Dict[str, Any]:
+        conteudo, uso = self._gerar(messages)
+        self._aguardar(uso)
+        return {"content": conteudo, "usage": uso}
+
+    async def ainvoke(self, messages: List[Message]) -> Dict[str, Any]:
+        conteudo, uso = self._gerar(messages)
+        await asyncio.sleep(self.latencia + self.latencia_por_token * uso["output_tokens"])
+        return {"content": conteudo, "usage": uso}
+
+    def invoke_stream(self, messages: List[Message]) -> Iterator[Dict[str, Any]]:
+        conteudo, uso = self._gerar(messages)
+        pedacos = [conteudo[i:i + 16] for i in range(0, len(conteudo), 16)]
+        atraso = (self.latencia + self.latencia_por_token * uso["output_tokens"]) / max(len(pedacos), 1)
+        for indice, pedaco in enumerate(pedacos):
+            time.sleep(atraso)
+            yield {"content": pedaco, "usage": uso if indice == len(pedacos) - 1 else None}
+
+    async def ainvoke_stream(self, messages: List[Message]) -> AsyncGenerator[Dict[str, Any], None]:
+        for delta in self.invoke_stream(messages):
+            yield delta
+
+    def parse_provider_response(self, response: Dict[str, Any]) -> ModelResponse:
+        return ModelResponse(role="assistant", content=response["content"], response_usage=response["usage"])
+
+    def parse_provider_response_delta(self, response: Dict[str, Any]) -> ModelResponse:
+        return ModelResponse(role="assistant", content=response["content"], response_usage=response["usage"])
+
+
+@dataclass
+class FakeEmbedder(Embedder):
+    """
+    Embedder local (bag-of-words com hashing) para benchmarks sem rede.
+    Imita a resposta da API de embeddings da OpenAI, inclusive para lotes.
+    """
+
+    id: str = "fake-embedder"
+    dimensions: int = 256
+    latencia: float = 0.05  # segundos por chamada
+    chamadas: int = field(default=0, init=False)
+
+    def _vetor(self, texto: str) -> List[float]:
+        vetor = [0.0] * self.dimensions
+        for termo in texto.lower().split():
+            indice = int(hashlib.md5(termo.encode()).hexdigest(), 16) % self.dimensions
+            vetor[indice] += 1.0
+        norma = math.sqrt(sum(v * v for v in vetor)) or 1.0
+        return [v / norma for v in vetor]
+
+    def response(self, text):
+        self.chamadas += 1
+        time.sleep(self.latencia)
+        textos = text if isinstance(text, list) else [text]
+        dados = [SimpleNamespace(index=i, embedding=self._vetor(t)) for i, t in enumerate(textos)]
+        uso = SimpleNamespace(model_dump=lambda: {"total_tokens": sum(_estimar_tokens(t) for t in textos)})
+        return SimpleNamespace(data=dados, usage=uso)
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.response(text).data[0].embedding
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        response = self.response(text)
+        return response.data[0].embedding, response.usage.model_dump()
+
+
+@dataclass
+class FakeSearchClient:
+    """
+    Busca web local (no formato de resposta do TavilyClient) para benchmarks sem rede.
+    Resultados determinísticos por consulta, após uma latência configurável.
+    """
+
+    latencia: float = 0.8  # segundos por busca
+    chamadas: int = field(default=0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.chamadas += 1
+        time.sleep(self.latencia)
+        gerador = _GeradorDeterministico(query)
+        return {
+            "query": query,
+            "answer": gerador.frase(30),
+            "results": [
+                {
+                    "title": gerador.frase(8),
+                    "url": f"https://jurisprudencia.example/{hashlib.md5(f'{query}|{i}'.encode()).hexdigest()[:12]}",
+                    "content": gerador.frase(60),
+                    "score": round(1 - i / (max_results + 1), 3),
+                }
+                for i in range(max_results)
+            ],
+        }
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from hashlib import md5
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+from agno.document import Document
+from agno.vectordb.lancedb import LanceDb
+
+from services.chunking import TIPO_OUTRO
+from services.embedding_cache import CachedEmbedder
+from services.vector_index import COLUNA_TEXTO
+
+# Metadados dos chunks gravados também como colunas, para filtrar as buscas (where + prefilter)
+COLUNAS_METADADOS = {"tipo_peca": TIPO_OUTRO}
+
+
+@dataclass(frozen=True)
+class IngestaoConfig:
+    """Parâmetros da ingestão em streaming"""
+    lote_embeddings: int = 64  # chunks por requisição de embeddings
+    concorrencia: int = 4  # requisições de embeddings simultâneas por documento
+    lote_escrita: int = 512  # linhas por append na tabela LanceDB
+
+    @classmethod
+    def from_env(cls) -> "IngestaoConfig":
+        return cls(
+            lote_embeddings=max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))),
+            concorrencia=max(1, int(os.getenv("EMBEDDING_CONCURRENCY", "4"))),
+            lote_escrita=max(1, int(os.getenv("VECTOR_WRITE_BATCH", "512"))),
+        )
+
+
+def criar_tabela(vector_db: LanceDb) -> None:
+    """
+    Recria a tabela do documento: esquema do agno (vetor, id, payload) mais o texto dos chunks
+    (para o índice FTS da busca híbrida) e as colunas de metadados
+    """
+    vector_db.drop()
+    schema = vector_db._base_schema().append(pa.field(COLUNA_TEXTO, pa.string()))
+    for coluna in COLUNAS_METADADOS:
+        schema = schema.append(pa.field(coluna, pa.string()))
+    vector_db.table = vector_db.connection.create_table(vector_db.table_name, schema=schema, mode="overwrite")
+
+
+# Linha pronta para gravar: vetor, id, payload, conteúdo e metadados do chunk
+_Linha = Tuple[List[float], str, str, str, dict]
+
+# Chunk pronto para gravar: documento, conteúdo limpo e id
+_Chunk = Tuple[Document, str, str]
+
+
+def _em_lotes(chunks: Iterable[_Chunk], tamanho: int) -> Iterator[List[_Chunk]]:
+    lote: List[_Chunk] = []
+    for chunk in chunks:
+        lote.append(chunk)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class IngestaoStreaming:
+    """
+    Grava os chunks de um documento na tabela LanceDB à medida que a extração os produz:
+    chunks -> lotes de embeddings (em paralelo, pelo cache) -> appends em bloco (Arrow).
+    Extração, embeddings e escrita se sobrepõem; os lotes em voo e o buffer de escrita são
+    limitados, então a memória não cresce com o tamanho do documento.
+    Equivale a knowledge_base.load(recreate=True) com a tabela já recriada: mesmo id (md5 do
+    conteúdo), mesmo payload e chunks de conteúdo repetido gravados uma única vez.
+    """
+
+    def __init__(self, vector_db: LanceDb, embedder: CachedEmbedder, config: Optional[IngestaoConfig] = None):
+        self.vector_db = vector_db
+        self.embedder = embedder
+        self.config = config or IngestaoConfig.from_env()
+        self.chunks = 0
+        self.repetidos = 0
+        self.sem_embedding = 0
+        self.escritas = 0
+        self.segundos_escrita = 0.0
+        self._linhas: List[_Linha] = []
+        self._escrita: Optional[Future] = None
+
+    def carregar(self, documentos: Iterable[Document]) -> int:
+        """Embeda e grava os chunks conforme chegam; devolve o total de linhas gravadas"""
+        vistos = set()
+        em_voo: deque = deque()  # (lote, futuro dos embeddings), na ordem de envio
+
+        def unicos() -> Iterator[_Chunk]:
+            for documento in documentos:
+                conteudo = documento.content.replace("\x00", "\ufffd")
+                doc_id = md5(conteudo.encode()).hexdigest()
+                if doc_id in vistos:
+                    self.repetidos += 1
+                    continue
+                vistos.add(doc_id)
+                yield documento, conteudo, doc_id
+
+        with ThreadPoolExecutor(max_workers=self.config.concorrencia, thread_name_prefix="embeddings") as embeddings, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="escrita_vetorial") as escritor:
+            for lote in _em_lotes(unicos(), self.config.lote_embeddings):
+                em_voo.append((lote, embeddings.submit(self.embedder.get_embeddings_batch,
+                                                       [conteudo for _, conteudo, _ in lote])))
+                # Com todos os workers ocupados, a extração espera o lote mais antigo
+                while em_voo and (em_voo[0][1].done() or len(em_voo) > self.config.concorrencia):
+                    self._receber(*em_voo.popleft(), escritor)
+            while em_voo:
+                self._receber(*em_voo.popleft(), escritor)
+            self._enviar_escrita(escritor)
+            self._aguardar_escrita()
+        return self.chunks
+
+    def _receber(self, lote: List[_Chunk], futuro: Future, escritor: ThreadPoolExecutor) -> None:
+        for (documento, conteudo, doc_id), vetor in zip(lote, futuro.result()):
+            if not vetor:
+                self.sem_embedding += 1
+                continue
+            payload = json.dumps({
+                "name": documento.name,
+                "meta_data": documento.meta_data,
+                "content": conteudo,
+                "usage": documento.usage,
+            })
+            self._linhas.append((vetor, doc_id, payload, conteudo, documento.meta_data))
+        if len(self._linhas) >= self.config.lote_escrita:
+            self._enviar_escrita(escritor)
+
+    def _enviar_escrita(self, escritor: ThreadPoolExecutor) -> None:
+        """Envia o buffer como um append; no máximo uma escrita em andamento"""
+        if not self._linhas:
+            return
+        tabela = self._tabela_arrow(self._linhas)
+        self._linhas = []
+        self._aguardar_escrita()
+        self._escrita = escritor.submit(self._gravar, tabela)
+
+    def _aguardar_escrita(self) -> None:
+        if self._escrita is not None:
+            self._escrita.result()
+            self._escrita = None
+
+    def _gravar(self, tabela: pa.Table) -> None:
+        inicio = time.perf_counter()
+        self.vector_db.table.add(tabela)
+        self.segundos_escrita += time.perf_counter() - inicio
+        self.escritas += 1
+        self.chunks += tabela.num_rows
+
+    def _tabela_arrow(self, linhas: List[_Linha]) -> pa.Table:
+        """Linhas no esquema da tabela: o do agno (LanceDb._base_schema) e, se houver, texto e metadados"""
+        schema = self.vector_db.table.schema
+        colunas = []
+        for campo in schema:
+            if campo.name == self.vector_db._vector_col:
+                vetores = np.asarray([linha[0] for linha in linhas], dtype=np.float32).reshape(-1)
+                colunas.append(pa.FixedSizeListArray.from_arrays(pa.array(vetores, type=pa.float32()),
+                                                                 campo.type.list_size))
+            elif campo.name == self.vector_db._id:
+                colunas.append(pa.array([linha[1] for linha in linhas], type=pa.string()))
+            elif campo.name == "payload":
+                colunas.append(pa.array([linha[2] for linha in linhas], type=pa.string()))
+            elif campo.name == COLUNA_TEXTO:
+                colunas.append(pa.array([linha[3] for linha in linhas], type=pa.string()))
+            else:
+                padrao = COLUNAS_METADADOS.get(campo.name)
+                colunas.append(pa.array([linha[4].get(campo.name, padrao) for linha in linhas], type=campo.type))
+        return pa.Table.from_arrays(colunas, schema=schema)
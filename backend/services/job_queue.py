@@ -0,0 +1,201 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+# Estados de um job na fila
+PENDENTE = "pendente"
+EM_EXECUCAO = "em_execucao"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+
+class LeasePerdidoError(Exception):
+    """O job passou a outro worker: o desfecho da tarefa não é mais deste"""
+
+
+@dataclass
+class Job:
+    job_id: str
+    payload: Dict[str, Any]
+    tentativas: int
+    max_tentativas: int
+
+    @property
+    def ultima_tentativa(self) -> bool:
+        return self.tentativas >= self.max_tentativas
+
+    @property
+    def esgotado(self) -> bool:
+        """Retomado após a última tentativa ter perdido o lease (ex.: worker morto)"""
+        return self.tentativas > self.max_tentativas
+
+
+class JobQueue:
+    """
+    Fila durável de jobs em SQLite (modo WAL), sem broker externo.
+    Um worker obtém um job com lease por tempo limitado e o renova com heartbeats;
+    se o worker morrer, o lease expira e outro worker retoma o job.
+    Falhas voltam para a fila com espera exponencial até max_tentativas.
+    """
+
+    def __init__(self, path: str, lease_seconds: int = 60, max_tentativas: int = 3, espera_base: float = 5.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                max_tentativas INTEGER NOT NULL,
+                worker TEXT,
+                lease_ate REAL,
+                disponivel_em REAL NOT NULL,
+                erro TEXT,
+                criado_em REAL NOT NULL,
+                atualizado_em REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_estado ON jobs (estado, disponivel_em)")
+
+    def enfileirar(self, job_id: str, payload: Dict[str, Any]) -> int:
+        """Adiciona um job; retorna sua posição entre os pendentes (1 = próximo)"""
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, payload, estado, max_tentativas, disponivel_em, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), PENDENTE, self.max_tentativas, agora, agora, agora)
+            )
+        return self.posicao(job_id) or 0
+
+    def obter(self, worker: str) -> Optional[Job]:
+        """Reserva o próximo job disponível (pendente ou com lease expirado) para o worker"""
+        agora = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE: dois workers nunca reservam o mesmo job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, payload, tentativas, max_tentativas FROM jobs "
+                    "WHERE (estado = ? AND disponivel_em <= ?) OR (estado = ? AND lease_ate < ?) "
+                    "ORDER BY criado_em LIMIT 1",
+                    (PENDENTE, agora, EM_EXECUCAO, agora)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, payload, tentativas, max_tentativas = row
+                self._conn.execute(
+                    "UPDATE jobs SET estado = ?, worker = ?, lease_ate = ?, tentativas = ?, atualizado_em = ? "
+                    "WHERE job_id = ?",
+                    (EM_EXECUCAO, worker, agora + self.lease_seconds, tentativas + 1, agora, job_id)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Job(job_id=job_id, payload=json.loads(payload), tentativas=tentativas + 1,
+                   max_tentativas=max_tentativas)
+
+    def renovar(self, job_id: str, worker: str) -> bool:
+        """Heartbeat: estende o lease; False se o job não pertence mais ao worker"""
+        agora = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_ate = ?, atualizado_em = ? WHERE job_id = ? AND worker = ? AND estado = ?",
+                (agora + self.lease_seconds, agora, job_id, worker, EM_EXECUCAO)
+            )
+            return cursor.rowcount > 0
+
+    def concluir(self, job_id: str, worker: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET estado = ?, lease_ate = NULL, erro = NULL, atualizado_em = ? "
+                "WHERE job_id = ? AND worker = ?",
+                (CONCLUIDO, time.time(), job_id, worker)
+            )
+
+    def falhar(self, job: Job, worker: str, erro: str) -> bool:
+        """Registra a falha; retorna True se o job voltou para a fila (ainda há tentativas)"""
+        agora = time.time()
+        repetir = not job.ultima_tentativa
+        espera = self.espera_base * 2 ** (job.tentativas - 1)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET estado = ?, lease_ate = NULL, disponivel_em = ?, erro = ?, atualizado_em = ? "
+                "WHERE job_id = ? AND worker = ?",
+                (PENDENTE if repetir else FALHOU, agora + espera, erro, agora, job.job_id, worker)
+            )
+        return repetir
+
+    def posicao(self, job_id: str) -> Optional[int]:
+        """Posição entre os pendentes (1 = próximo), 0 se em execução, None se finalizado/desconhecido"""
+        with self._lock:
+            row = self._conn.execute("SELECT estado, criado_em FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in (CONCLUIDO, FALHOU):
+                return None
+            if row[0] == EM_EXECUCAO:
+                return 0
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE estado = ? AND criado_em <= ?", (PENDENTE, row[1])
+            ).fetchone()[0]
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE estado = ?", (PENDENTE,)).fetchone()[0]
+
+    def purge(self, ttl_seconds: int) -> int:
+        """Remove jobs finalizados há mais de ttl_seconds"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE estado IN (?, ?) AND atualizado_em < ?",
+                (CONCLUIDO, FALHOU, time.time() - ttl_seconds)
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Jobs por estado e workers com lease ativo"""
+        with self._lock:
+            contagens = dict(self._conn.execute("SELECT estado, COUNT(*) FROM jobs GROUP BY estado").fetchall())
+            workers = self._conn.execute(
+                "SELECT COUNT(DISTINCT worker) FROM jobs WHERE estado = ? AND lease_ate >= ?",
+                (EM_EXECUCAO, time.time())
+            ).fetchone()[0]
+        stats = {estado: contagens.get(estado, 0) for estado in (PENDENTE, EM_EXECUCAO, CONCLUIDO, FALHOU)}
+        stats["workers_ativos"] = workers
+        return stats
+
+
+def fila_habilitada() -> bool:
+    """JOB_QUEUE=true: a API só enfileira e os workers (worker.py) processam"""
+    return os.getenv("JOB_QUEUE", "false").lower() in ("true", "1", "yes")
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Instância única da fila de jobs por processo"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                path=os.getenv("JOB_QUEUE_PATH", "tmp/jobs.db"),
+                lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", "60")),
+                max_tentativas=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            )
+        return _job_queue
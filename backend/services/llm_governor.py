@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from services.metrics import registrar_span
+
+# Prioridades de admissão (menor = primeiro): o relator fecha tarefas já iniciadas
+PRIORIDADE_RELATOR = 0
+PRIORIDADE_AGENTE = 1
+PRIORIDADE_INGESTAO = 2
+
+# Janela do orçamento de tokens por minuto
+JANELA_SEGUNDOS = 60.0
+
+# Códigos HTTP tratados como sobrecarga do provedor
+STATUS_SOBRECARGA = (429, 500, 502, 503, 504)
+
+
+def eh_sobrecarga(erro: BaseException) -> bool:
+    """Limite de taxa (429), erro transitório do provedor ou timeout/conexão (inclusive encadeados)"""
+    atual: Optional[BaseException] = erro
+    while atual is not None:
+        if getattr(atual, "status_code", None) in STATUS_SOBRECARGA:
+            return True
+        nome = type(atual).__name__
+        if "RateLimit" in nome or "Timeout" in nome or "APIConnection" in nome:
+            return True
+        atual = atual.__cause__
+    return False
+
+
+class LLMGovernor:
+    """
+    Escalonador do processo para chamadas a um provedor (chat ou embeddings).
+    Admite chamadas por prioridade respeitando o limite de chamadas simultâneas e o
+    orçamento de tokens por minuto; o limite se adapta (AIMD): cresce +1 a cada janela
+    de sucessos e cai pela metade em 429/timeout, com novas tentativas espaçadas com jitter.
+    """
+
+    def __init__(self, nome: str, max_em_voo: int, tokens_por_minuto: int = 0, min_em_voo: int = 1,
+                 tentativas: int = 4, espera_base: float = 1.0, espera_max: float = 30.0):
+        self.nome = nome
+        self.max_em_voo = max(1, max_em_voo)
+        self.min_em_voo = max(1, min(min_em_voo, self.max_em_voo))
+        self.tokens_por_minuto = tokens_por_minuto  # 0 = sem orçamento
+        self.tentativas = max(1, tentativas)
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.limite = float(self.max_em_voo)
+
+        self._cond = threading.Condition()
+        self._em_voo = 0
+        self._fila: list = []  # heap de (prioridade, ordem de chegada)
+        self._ordem = itertools.count()
+        self._janela: deque = deque()  # [instante, tokens] das chamadas admitidas no último minuto
+        self._tokens_janela = 0
+        self._stats = {"chamadas": 0, "sobrecargas": 0, "novas_tentativas": 0, "segundos_fila": 0.0}
+
+    def _expirar_janela(self, agora: float) -> None:
+        while self._janela and agora - self._janela[0][0] >= JANELA_SEGUNDOS:
+            self._tokens_janela -= self._janela.popleft()[1]
+
+    def _cabe_no_orcamento(self, tokens: int) -> bool:
+        if not self.tokens_por_minuto:
+            return True
+        # Uma chamada maior que o orçamento inteiro ainda passa quando a janela está vazia
+        return self._tokens_janela + tokens <= self.tokens_por_minuto or not self._janela
+
+    def _admitir(self, prioridade: int, tokens: int) -> list:
+        """Bloqueia até a vez desta chamada; retorna a reserva de tokens na janela"""
+        inicio = time.perf_counter()
+        pedido = (prioridade, next(self._ordem))
+        with self._cond:
+            heapq.heappush(self._fila, pedido)
+            while True:
+                agora = time.monotonic()
+                self._expirar_janela(agora)
+                if self._fila[0] == pedido and self._em_voo < int(self.limite) and self._cabe_no_orcamento(tokens):
+                    heapq.heappop(self._fila)
+                    self._em_voo += 1
+                    reserva = [agora, tokens]
+                    self._janela.append(reserva)
+                    self._tokens_janela += tokens
+                    self._stats["chamadas"] += 1
+                    self._stats["segundos_fila"] += time.perf_counter() - inicio
+                    self._cond.notify_all()
+                    break
+                # Bloqueado só pelo orçamento: acorda quando a reserva mais antiga sair da janela
+                espera = None
+                if self._janela and self._em_voo < int(self.limite):
+                    espera = max(0.01, JANELA_SEGUNDOS - (agora - self._janela[0][0]))
+                self._cond.wait(espera)
+        espera_total = time.perf_counter() - inicio
+        if espera_total >= 0.001:
+            registrar_span("fila_llm", espera_total, item=self.nome, histograma=False, prioridade=prioridade)
+        return reserva
+
+    def _concluir(self, reserva: list, tokens_reais: int, sobrecarga: bool) -> None:
+        with self._cond:
+            self._em_voo -= 1
+            # Ajusta a reserva ao consumo real (se ainda estiver na janela)
+            if reserva in self._janela:
+                self._tokens_janela += tokens_reais - reserva[1]
+                reserva[1] = tokens_reais
+            if sobrecarga:
+                self.limite = max(float(self.min_em_voo), self.limite / 2)
+                self._stats["sobrecargas"] += 1
+            else:
+                self.limite = min(float(self.max_em_voo), self.limite + 1 / self.limite)
+            self._cond.notify_all()
+
+    def executar(self, func: Callable, *args, prioridade: int = PRIORIDADE_AGENTE, tokens_estimados: int = 0,
+                 medir_tokens: Optional[Callable[[Any], int]] = None, **kwargs) -> Any:
+        """
+        Executa func quando admitida. Em sobrecarga do provedor, reduz o limite e tenta de novo
+        após um intervalo exponencial com jitter; outros erros são repassados sem nova tentativa.
+        medir_tokens(resultado) informa o consumo real para corrigir o orçamento.
+        """
+        for tentativa in range(1, self.tentativas + 1):
+            reserva = self._admitir(prioridade, tokens_estimados)
+            tokens_reais = tokens_estimados
+            sobrecarga = False
+            try:
+                resultado = func(*args, **kwargs)
+                if medir_tokens is not None:
+                    tokens_reais = medir_tokens(resultado) or tokens_estimados
+                return resultado
+            except Exception as erro:
+                sobrecarga = eh_sobrecarga(erro)
+                if not sobrecarga or tentativa == self.tentativas:
+                    raise
+            finally:
+                self._concluir(reserva, tokens_reais, sobrecarga)
+            with self._cond:
+                self._stats["novas_tentativas"] += 1
+            # Full jitter: espalha as novas tentativas de tarefas que falharam juntas
+            time.sleep(random.uniform(0, min(self.espera_max, self.espera_base * 2 ** (tentativa - 1))))
+
+    def stats(self) -> Dict[str, float]:
+        """Limite atual, ocupação, fila e orçamento"""
+        with self._cond:
+            self._expirar_janela(time.monotonic())
+            stats = dict(self._stats)
+            stats.update({
+                "limite": round(self.limite, 2),
+                "max_em_voo": self.max_em_voo,
+                "em_voo": self._em_voo,
+                "na_fila": len(self._fila),
+                "tokens_ultimo_minuto": self._tokens_janela,
+                "tokens_por_minuto": self.tokens_por_minuto,
+            })
+        stats["segundos_fila"] = round(stats["segundos_fila"], 4)
+        return stats
+
+
+# Tipo -> (variável de limite simultâneo, padrão, variável de tokens por minuto)
+GOVERNADORES = {
+    "chat": ("LLM_MAX_IN_FLIGHT", 16, "LLM_TPM"),
+    "embedding": ("EMBEDDING_MAX_IN_FLIGHT", 8, "EMBEDDING_TPM"),
+}
+
+_governors: Dict[str, LLMGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(tipo: str) -> LLMGovernor:
+    """Governador único por processo para cada tipo de chamada ('chat' ou 'embedding')"""
+    with _governors_lock:
+        if tipo not in _governors:
+            env_limite, padrao, env_tpm = GOVERNADORES[tipo]
+            _governors[tipo] = LLMGovernor(
+                nome=tipo,
+                max_em_voo=int(os.getenv(env_limite, str(padrao))),
+                tokens_por_minuto=int(os.getenv(env_tpm, "0")),
+                tentativas=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            )
+        return _governors[tipo]
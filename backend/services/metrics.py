@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Limites dos histogramas de duração (segundos): de extração de página a tarefas inteiras
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _formatar_labels(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histogram:
+    """Histograma no formato do Prometheus (buckets cumulativos, _sum e _count)"""
+
+    def __init__(self, nome: str, descricao: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = BUCKETS_SEGUNDOS):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List] = {}  # labels -> [contagens por bucket, soma, total]
+
+    def observe(self, valor: float, **labels) -> None:
+        chave = tuple(str(labels.get(nome, "")) for nome in self.labels)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.setdefault(chave, [[0] * len(self.buckets), 0.0, 0])
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def render(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = {chave: (list(contagens), soma, total) for chave, (contagens, soma, total) in self._series.items()}
+        for chave, (contagens, soma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                le = _formatar_labels(self.labels, chave, f'le="{_formatar_numero(float(limite))}"')
+                linhas.append(f"{self.nome}_bucket{le} {acumulado}")
+            le = _formatar_labels(self.labels, chave, 'le="+Inf"')
+            linhas.append(f"{self.nome}_bucket{le} {total}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {soma}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, chave)} {total}")
+        return linhas
+
+
+class Counter:
+    """Contador monotônico no formato do Prometheus"""
+
+    def __init__(self, nome: str, descricao: str, labels: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **labels) -> None:
+        chave = tuple(str(labels.get(nome, "")) for nome in self.labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def render(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            valores = dict(self._valores)
+        for chave, valor in sorted(valores.items()):
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Métricas do processo expostas em /metrics (formato texto do Prometheus)"""
+
+    def __init__(self):
+        self.estagio_segundos = Histogram(
+            "sumarizador_stage_seconds", "Duração de cada estágio do processamento", labels=("stage", "item")
+        )
+        self.tarefa_segundos = Histogram(
+            "sumarizador_task_seconds", "Duração total das tarefas de análise", labels=("status",)
+        )
+        self.tokens = Counter(
+            "sumarizador_tokens_total", "Tokens consumidos pelos agentes", labels=("agent", "direction")
+        )
+        self._metricas = [self.estagio_segundos, self.tarefa_segundos, self.tokens]
+
+    def render(self) -> str:
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.render())
+        return "\n".join(linhas) + "\n"
+
+
+class SpanRecorder:
+    """Spans de uma tarefa: cada estágio com início relativo, duração e atributos"""
+
+    def __init__(self, inicio: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.inicio = inicio or time.time()  # Referência dos inícios relativos (início da tarefa)
+        self._spans: List[Dict] = []
+
+    def registrar(self, nome: str, segundos: float, inicio: Optional[float] = None, **atributos) -> None:
+        inicio = time.time() - segundos if inicio is None else inicio
+        span = {
+            "nome": nome,
+            "inicio": round(inicio - self.inicio, 4),
+            "segundos": round(segundos, 4),
+        }
+        span.update({chave: valor for chave, valor in atributos.items() if valor is not None})
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> List[Dict]:
+        with self._lock:
+            return sorted(self._spans, key=lambda span: span["inicio"])
+
+
+# Spans da tarefa em execução (propagado para as threads do pipeline via contexto)
+_spans_atuais: contextvars.ContextVar[Optional[SpanRecorder]] = contextvars.ContextVar("spans_atuais", default=None)
+
+
+def iniciar_spans() -> SpanRecorder:
+    """Cria o registro de spans da tarefa corrente"""
+    recorder = SpanRecorder()
+    _spans_atuais.set(recorder)
+    return recorder
+
+
+def registrar_span(nome: str, segundos: float, item: str = "", inicio: Optional[float] = None,
+                   histograma: bool = True, **atributos) -> None:
+    """Registra um estágio já medido: no histograma do processo e nos spans da tarefa corrente"""
+    if histograma:
+        get_metrics().estagio_segundos.observe(segundos, stage=nome, item=item)
+    recorder = _spans_atuais.get()
+    if recorder is not None:
+        recorder.registrar(nome, segundos, inicio=inicio, item=item or None, **atributos)
+
+
+@contextmanager
+def span(nome: str, item: str = "", **atributos) -> Iterator[Dict]:
+    """Mede um bloco como span; atributos adicionais podem ser preenchidos no dict retornado"""
+    inicio = time.time()
+    inicio_relogio = time.perf_counter()
+    extras: Dict = {}
+    try:
+        yield extras
+    finally:
+        atributos.update(extras)
+        registrar_span(nome, time.perf_counter() - inicio_relogio, item=item, inicio=inicio, **atributos)
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Instância única das métricas por processo"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+        return _metrics
@@ -0,0 +1,182 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import pymupdf  # fitz
+import pytesseract
+from PIL import Image
+
+
+@dataclass
+class PaginaExtraida:
+    """Texto extraído de uma página e como foi obtido"""
+    numero: int
+    texto: str
+    metodo: str  # "texto" (camada de texto do PDF) ou "ocr"
+    segundos: float
+
+
+@dataclass(frozen=True)
+class OCRConfig:
+    """Parâmetros de rasterização e OCR"""
+    dpi: int = 300
+    grayscale: bool = True
+    binarize: bool = False
+    threshold: int = 160
+    lang: str = 'por'
+    min_text_chars: int = 50  # Páginas com camada de texto acima disso não passam por OCR
+
+    @classmethod
+    def from_env(cls) -> "OCRConfig":
+        return cls(
+            dpi=int(os.getenv("OCR_DPI", "300")),
+            grayscale=os.getenv("OCR_GRAYSCALE", "true").lower() == "true",
+            binarize=os.getenv("OCR_BINARIZE", "false").lower() == "true",
+            threshold=int(os.getenv("OCR_THRESHOLD", "160")),
+            lang=os.getenv("OCR_LANG", "por"),
+            min_text_chars=int(os.getenv("OCR_MIN_TEXT_CHARS", "50")),
+        )
+
+
+# Documento aberto no processo worker (reaproveitado entre páginas do mesmo arquivo)
+_documento_worker: Tuple[Optional[str], Optional[pymupdf.Document]] = (None, None)
+
+
+def _abrir_documento(file_path: str) -> pymupdf.Document:
+    global _documento_worker
+    caminho, doc = _documento_worker
+    if caminho != file_path or doc is None:
+        if doc is not None:
+            doc.close()
+        doc = pymupdf.open(file_path)
+        _documento_worker = (file_path, doc)
+    return doc
+
+
+def rasterizar_pagina(page: pymupdf.Page, config: OCRConfig) -> Image.Image:
+    """Converte a página em imagem com o DPI e pré-processamento configurados"""
+    colorspace = pymupdf.csGRAY if config.grayscale or config.binarize else pymupdf.csRGB
+    pix = page.get_pixmap(dpi=config.dpi, colorspace=colorspace)
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    if config.binarize:
+        img = img.point(lambda p: 255 if p > config.threshold else 0)
+    return img
+
+
+def ocr_pagina(file_path: str, numero: int, config: OCRConfig, forcar_ocr: bool = False) -> PaginaExtraida:
+    """Extrai o texto de uma página, aplicando OCR apenas se necessário (executa no worker)"""
+    return extrair_pagina(_abrir_documento(file_path).load_page(numero), config, forcar_ocr)
+
+
+def extrair_pagina(page: pymupdf.Page, config: OCRConfig, forcar_ocr: bool = False) -> PaginaExtraida:
+    """Usa a camada de texto da página se for suficiente; caso contrário, aplica OCR"""
+    inicio = time.perf_counter()
+    numero = page.number
+
+    if not forcar_ocr:
+        texto = page.get_text()
+        if len(texto.strip()) >= config.min_text_chars:
+            return PaginaExtraida(numero, texto, "texto", time.perf_counter() - inicio)
+
+    img = rasterizar_pagina(page, config)
+    texto = pytesseract.image_to_string(img, lang=config.lang)
+    return PaginaExtraida(numero, texto, "ocr", time.perf_counter() - inicio)
+
+
+def _ocr_pagina_worker(args) -> PaginaExtraida:
+    try:
+        return ocr_pagina(*args)
+    except Exception as e:
+        # Algumas exceções (ex.: do pytesseract) não são serializáveis entre processos
+        raise RuntimeError(f"Erro na página {args[1] + 1}: {str(e)}") from None
+
+
+class OCREngine:
+    """OCR por página distribuído em um pool de processos"""
+
+    def __init__(self, max_workers: Optional[int] = None, config: Optional[OCRConfig] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.config = config or OCRConfig.from_env()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: o processo da API tem threads, fork não é seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def iter_pages(self, file_path: str, paginas: Optional[List[int]] = None,
+                   forcar_ocr: bool = False) -> Iterator[PaginaExtraida]:
+        """Processa as páginas em paralelo e as devolve em ordem, conforme ficam prontas"""
+        if paginas is None:
+            with pymupdf.open(file_path) as doc:
+                paginas = list(range(len(doc)))
+
+        if not paginas:
+            return
+        if len(paginas) == 1 or self.max_workers == 1:
+            with pymupdf.open(file_path) as doc:
+                for numero in paginas:
+                    yield extrair_pagina(doc.load_page(numero), self.config, forcar_ocr)
+            return
+
+        # Janela limitada de páginas em processamento: quem consome devagar não acumula resultados
+        pendentes: deque = deque()
+        for numero in paginas:
+            pendentes.append(self.submeter(file_path, numero, forcar_ocr))
+            if len(pendentes) >= self.janela:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+    @property
+    def janela(self) -> int:
+        """Páginas enviadas ao pool e ainda não consumidas"""
+        return self.max_workers * 2
+
+    def submeter(self, file_path: str, numero: int, forcar_ocr: bool = False) -> Future:
+        """Extração de uma página no pool (com um único worker, executa na hora)"""
+        if self.max_workers > 1:
+            return self.executor.submit(_ocr_pagina_worker, (file_path, numero, self.config, forcar_ocr))
+        futuro: Future = Future()
+        try:
+            futuro.set_result(ocr_pagina(file_path, numero, self.config, forcar_ocr))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def extract_text(self, file_path: str, forcar_ocr: bool = False) -> str:
+        """Texto completo do documento, página a página"""
+        return "".join(pagina.texto + "\n" for pagina in self.iter_pages(file_path, forcar_ocr=forcar_ocr))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_ocr_engine: Optional[OCREngine] = None
+_ocr_engine_lock = threading.Lock()
+
+
+def get_ocr_engine() -> OCREngine:
+    """Instância única do motor de OCR por processo"""
+    global _ocr_engine
+    with _ocr_engine_lock:
+        if _ocr_engine is None:
+            workers = os.getenv("OCR_WORKERS")
+            _ocr_engine = OCREngine(max_workers=int(workers) if workers else None)
+        return _ocr_engine
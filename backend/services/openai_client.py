@@ -0,0 +1,36 @@
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def limites_conexao() -> httpx.Limits:
+    """
+    Pool de conexões do cliente: cabe todas as chamadas que os governadores deixam em voo
+    (chat + embeddings), mantidas abertas entre tarefas (OPENAI_KEEPALIVE_SECONDS)
+    """
+    em_voo = int(os.getenv("LLM_MAX_IN_FLIGHT", "16")) + int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "8"))
+    # Vazio no .env (python-dotenv carrega ""): usa o total em voo
+    maximo = int(os.getenv("OPENAI_MAX_CONNECTIONS") or 0) or em_voo
+    return httpx.Limits(
+        max_connections=maximo,
+        max_keepalive_connections=maximo,
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "60")),
+    )
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Cliente OpenAI único por processo, compartilhado pelos modelos de todos os agentes e pelo
+    embedder: contexto TLS criado uma vez e conexões keep-alive reaproveitadas entre tarefas
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(http_client=DefaultHttpxClient(limits=limites_conexao()))
+        return _client
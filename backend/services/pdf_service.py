@@ -1,13 +1,23 @@
 import os
+import time
+import hashlib
 import tempfile
-from typing import Optional
+import threading
+import zipfile
+import aiofiles
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 import PyPDF2
 import pymupdf  # fitz
 import pytesseract
 from PIL import Image
 import io
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import Flowable, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.colors import black, blue, gray
@@ -16,6 +26,11 @@ from io import BytesIO
 import json
 from datetime import datetime
 from typing import Dict, Any
+from agno.document import Document
+from agno.document.reader.pdf_reader import PDFReader
+from services.chunking import ChunkingPecas, PecaProcessual
+from services.ocr_service import PaginaExtraida, get_ocr_engine
+from services.metrics import get_metrics, registrar_span, span
 
 class PDFProcessingService:
     """Serviço para processamento de PDFs de entrada"""
@@ -58,25 +73,9 @@ class PDFProcessingService:
 
     @staticmethod
     def extract_text_with_ocr(file_path: str) -> str:
-        """Extrai texto usando OCR para PDFs digitalizados"""
+        """Extrai texto usando OCR para PDFs digitalizados (páginas em paralelo)"""
         try:
-            doc = pymupdf.open(file_path)
-            text = ""
-
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-
-                # Converter página para imagem
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-
-                # Aplicar OCR
-                page_text = pytesseract.image_to_string(img, lang='por')
-                text += page_text + "\n"
-
-            doc.close()
-            return text
+            return get_ocr_engine().extract_text(file_path)
         except Exception as e:
             raise Exception(f"Erro ao extrair texto com OCR: {str(e)}")
 
@@ -95,28 +94,97 @@ class PDFProcessingService:
         except Exception as e:
             return {"error": str(e)}
 
+    @staticmethod
+    def page_needs_ocr(page: pymupdf.Page, min_text_chars: int, texto: Optional[str] = None) -> bool:
+        """
+        Classifica a página (texto = camada de texto já extraída, se houver):
+        - sem camada de texto (ou quase) -> OCR
+        - digitalizada (imagem cobrindo a maior parte) com pouco texto -> OCR
+        - caso contrário mantém o texto do PyMuPDF
+        """
+        text_len = len((page.get_text() if texto is None else texto).strip())
+        if text_len < min_text_chars:
+            return True
+        if text_len >= min_text_chars * 4:
+            return False  # Texto suficiente, qualquer que seja a área de imagem
+
+        page_area = abs(page.rect) or 1
+        image_area = 0.0
+        for img in page.get_image_info():
+            image_area += abs(pymupdf.Rect(img["bbox"]) & page.rect)
+
+        # Página escaneada com carimbo/cabeçalho digital: baixa densidade de texto
+        return image_area / page_area > 0.6 and text_len < min_text_chars * 4
+
+    @staticmethod
+    def iter_pages_smart(file_path: str, use_ocr: bool = True) -> Iterator[Tuple[PaginaExtraida, int]]:
+        """
+        Extração híbrida por página, em streaming: gera (página, total de páginas) à medida que
+        cada página fica pronta.
+        1. Páginas com boa camada de texto (PyMuPDF) saem na hora
+        2. As só-imagem ou de baixa densidade vão para o OCR em paralelo (janela limitada de
+           páginas em OCR); as páginas de texto posteriores esperam atrás delas, para que a
+           saída fique na ordem do documento
+        """
+        engine = get_ocr_engine()
+        pendentes: deque = deque()  # (página com a camada de texto, futuro do OCR ou None), em ordem
+        em_ocr = 0
+
+        def concluir(pagina: PaginaExtraida, futuro: Optional[Future]) -> PaginaExtraida:
+            if futuro is None:
+                return pagina
+            try:
+                resultado = futuro.result()
+            except Exception:
+                return pagina  # Continua com a camada de texto
+            # Mantém o texto original se o OCR não trouxer nada melhor
+            return resultado if len(resultado.texto.strip()) >= len(pagina.texto.strip()) else pagina
+
+        with pymupdf.open(file_path) as doc:
+            total = len(doc)
+            for page in doc:
+                inicio = time.perf_counter()
+                texto = page.get_text()
+                precisa_ocr = use_ocr and PDFProcessingService.page_needs_ocr(page, engine.config.min_text_chars, texto)
+                pagina = PaginaExtraida(page.number, texto, "texto", time.perf_counter() - inicio)
+                if precisa_ocr:
+                    pendentes.append((pagina, engine.submeter(file_path, page.number, forcar_ocr=True)))
+                    em_ocr += 1
+                else:
+                    pendentes.append((pagina, None))
+                # Entrega a frente da fila que já está pronta; com a janela cheia, espera o OCR mais antigo
+                while pendentes and (pendentes[0][1] is None or pendentes[0][1].done() or em_ocr > engine.janela):
+                    pagina, futuro = pendentes.popleft()
+                    em_ocr -= futuro is not None
+                    yield concluir(pagina, futuro), total
+
+        while pendentes:
+            yield concluir(*pendentes.popleft()), total
+
+    @staticmethod
+    def extract_pages_smart(file_path: str, use_ocr: bool = True,
+                            on_pagina: Optional[Callable[[PaginaExtraida, int], None]] = None) -> List[PaginaExtraida]:
+        """
+        Extração híbrida por página (ver iter_pages_smart), com todas as páginas em ordem.
+        on_pagina(pagina, total) é chamado à medida que cada página fica pronta.
+        """
+        paginas: List[PaginaExtraida] = []
+        for pagina, total in PDFProcessingService.iter_pages_smart(file_path, use_ocr):
+            paginas.append(pagina)
+            if on_pagina:
+                on_pagina(pagina, total)
+        return paginas
+
     @staticmethod
     def extract_text_smart(file_path: str, use_ocr: bool = True) -> str:
         """
         Extração inteligente de texto:
-        1. Tenta PyMuPDF primeiro (mais rápido)
-        2. Se texto é muito pequeno e use_ocr=True, aplica OCR
-        3. Fallback para PyPDF2
+        1. Extração híbrida por página (PyMuPDF + OCR só onde necessário)
+        2. Fallback para PyPDF2
         """
         try:
-            # Primeira tentativa: PyMuPDF
-            text = PDFProcessingService.extract_text_pymupdf(file_path)
-
-            # Se texto é muito pequeno e OCR está habilitado
-            if len(text.strip()) < 100 and use_ocr:
-                try:
-                    ocr_text = PDFProcessingService.extract_text_with_ocr(file_path)
-                    if len(ocr_text.strip()) > len(text.strip()):
-                        return ocr_text
-                except Exception:
-                    pass  # Continua com o texto original
-
-            return text
+            paginas = PDFProcessingService.extract_pages_smart(file_path, use_ocr)
+            return "".join(pagina.texto + "\n" for pagina in paginas)
 
         except Exception:
             # Fallback para PyPDF2
@@ -125,19 +193,153 @@ class PDFProcessingService:
             except Exception as e:
                 raise Exception(f"Falha em todos os métodos de extração: {str(e)}")
 
+    @staticmethod
+    def summarize_extraction(paginas: List[PaginaExtraida]) -> dict:
+        """Resumo da extração para os metadados da tarefa"""
+        return {
+            "paginas_texto": sum(1 for p in paginas if p.metodo == "texto"),
+            "paginas_ocr": sum(1 for p in paginas if p.metodo == "ocr"),
+            "segundos": round(sum(p.segundos for p in paginas), 3),
+            "paginas": [
+                {"pagina": p.numero + 1, "metodo": p.metodo, "segundos": round(p.segundos, 3)}
+                for p in paginas
+            ]
+        }
+
+@dataclass
+class ProcessoPDFReader(PDFReader):
+    """Reader do knowledge base que usa a extração híbrida por página"""
+
+    use_ocr: bool = True
+    on_pagina: Optional[Callable[[PaginaExtraida, int], None]] = None
+    paginas: List[PaginaExtraida] = field(default_factory=list)
+    pecas: List[PecaProcessual] = field(default_factory=list)
+
+    segundos_leitura: float = 0.0
+
+    def read(self, pdf: Union[str, Path]) -> List[Document]:
+        return list(self.iter_documents(pdf))
+
+    def iter_documents(self, pdf: Union[str, Path]) -> Iterator[Document]:
+        """
+        Chunks do documento em streaming: as páginas são divididas assim que saem da extração,
+        sem materializar o texto do documento inteiro. Das páginas fica só o resumo
+        (método e tempo) em self.paginas; com o ChunkingPecas, o índice de peças em self.pecas.
+        """
+        doc_name = Path(pdf).stem.replace(" ", "_")
+        self.paginas = []
+        self.pecas = []
+        self.segundos_leitura = 0.0
+        segundos = 0.0
+        chunks = 0
+
+        def paginas_documento() -> Iterator[Document]:
+            paginas = PDFProcessingService.iter_pages_smart(str(pdf), self.use_ocr)
+            while True:
+                inicio = time.perf_counter()
+                try:
+                    pagina, total = next(paginas)
+                except StopIteration:
+                    return
+                self.segundos_leitura += time.perf_counter() - inicio
+                self.paginas.append(PaginaExtraida(pagina.numero, "", pagina.metodo, pagina.segundos))
+                if self.on_pagina:
+                    self.on_pagina(pagina, total)
+                yield Document(
+                    name=doc_name,
+                    id=f"{doc_name}_{pagina.numero + 1}",
+                    meta_data={"page": pagina.numero + 1, "metodo": pagina.metodo},
+                    content=pagina.texto,
+                )
+
+        estrategia = self.chunking_strategy
+        if not self.chunk:
+            documentos = paginas_documento()
+        elif isinstance(estrategia, ChunkingPecas):
+            # Os chunks não atravessam peças, então a divisão recebe as páginas em sequência
+            documentos = estrategia.fragmentar(paginas_documento(), self.pecas)
+        else:
+            documentos = (chunk for document in paginas_documento() for chunk in self.chunk_document(document))
+
+        while True:
+            inicio = time.perf_counter()
+            try:
+                document = next(documentos)
+            except StopIteration:
+                break
+            finally:
+                segundos += time.perf_counter() - inicio
+            chunks += 1
+            yield document
+
+        self._registrar_extracao()
+        if self.chunk:
+            # O tempo da extração corre dentro da divisão; o span fica só com a parte do chunking
+            registrar_span("chunking", max(segundos - self.segundos_leitura, 0.0), chunks=chunks)
+
+    def _registrar_extracao(self) -> None:
+        """Histograma por página e um span por método de extração"""
+        histograma = get_metrics().estagio_segundos
+        por_metodo: Dict[str, List[float]] = {}
+        for pagina in self.paginas:
+            histograma.observe(pagina.segundos, stage="extracao_pagina", item=pagina.metodo)
+            por_metodo.setdefault(pagina.metodo, []).append(pagina.segundos)
+        for metodo, segundos in por_metodo.items():
+            registrar_span("extracao", sum(segundos), item=metodo, paginas=len(segundos))
+
+class DocumentoEmJanela(SimpleDocTemplate):
+    """
+    SimpleDocTemplate alimentado por um iterador de flowables: a lista consumida pelo build é
+    reabastecida a cada flowable tratado, então só uma janela deles existe em memória e a
+    paginação é a de um documento único (sem quebras de página entre janelas)
+    """
+
+    def __init__(self, destino, flowables: Iterable[Flowable], janela: int, **kwargs):
+        super().__init__(destino, **kwargs)
+        self._fonte = iter(flowables)
+        self._janela = max(1, janela)
+        self._pendentes: List[Flowable] = []
+
+    def _reabastecer(self) -> None:
+        if len(self._pendentes) < self._janela:
+            self._pendentes.extend(islice(self._fonte, self._janela - len(self._pendentes)))
+
+    def handle_flowable(self, flowables):
+        super().handle_flowable(flowables)
+        # Também é chamado com a lista interna de flowables pendentes de página (_hanging)
+        if flowables is self._pendentes:
+            self._reabastecer()
+
+    def construir(self) -> None:
+        self._reabastecer()
+        self.build(self._pendentes)
+
+
 class PDFGenerationService:
     """Serviço para geração de PDFs dos resultados da análise"""
 
+    # Flowables em memória durante a renderização (limita o pico em relatórios longos)
+    FLOWABLES_EM_MEMORIA = int(os.getenv("PDF_FLOWABLES_PER_PART", "400"))
+
+    # Folha de estilos montada uma vez por processo (somente leitura durante a renderização)
+    _estilos = None
+    _estilos_lock = threading.Lock()
+
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        with PDFGenerationService._estilos_lock:
+            if PDFGenerationService._estilos is None:
+                PDFGenerationService._estilos = self._criar_estilos()
+        self.styles = PDFGenerationService._estilos
 
-    def _setup_custom_styles(self):
+    @staticmethod
+    def _criar_estilos():
         """Configurar estilos personalizados para o PDF"""
+        styles = getSampleStyleSheet()
+
         # Título principal
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='MainTitle',
-            parent=self.styles['Title'],
+            parent=styles['Title'],
             fontSize=20,
             spaceAfter=30,
             alignment=TA_CENTER,
@@ -145,9 +347,9 @@ class PDFGenerationService:
         ))
 
         # Título de seção
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SectionTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=16,
             spaceAfter=12,
             spaceBefore=24,
@@ -155,9 +357,9 @@ class PDFGenerationService:
         ))
 
         # Subtítulo
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SubTitle',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=14,
             spaceAfter=6,
             spaceBefore=12,
@@ -165,35 +367,21 @@ class PDFGenerationService:
         ))
 
         # Texto normal justificado
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='JustifiedBody',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             alignment=TA_JUSTIFY,
             spaceAfter=6
         ))
 
-    def generate_agent_pdf(self, agent_name: str, agent_data: Dict[str, Any], task_id: str) -> BytesIO:
-        """Gerar PDF para um agente específico"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4,
-                              rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-
-        # Conteúdo do PDF
-        story = []
+        return styles
 
-        # Cabeçalho
-        story.append(Paragraph("⚖️ Sistema de Análise Jurídica", self.styles['MainTitle']))
-        story.append(Spacer(1, 20))
-
-        # Informações do relatório
-        info_data = [
-            ['Agente:', self._get_agent_display_name(agent_name)],
-            ['ID da Tarefa:', task_id],
-            ['Data/Hora:', datetime.now().strftime("%d/%m/%Y às %H:%M:%S")],
-            ['Tipo de Relatório:', 'Análise Individual por Agente']
-        ]
+    def _novo_documento(self, destino, flowables: Iterable[Flowable]) -> DocumentoEmJanela:
+        return DocumentoEmJanela(destino, flowables, self.FLOWABLES_EM_MEMORIA, pagesize=A4,
+                                 rightMargin=72, leftMargin=72,
+                                 topMargin=72, bottomMargin=18)
 
+    def _tabela_info(self, info_data: List[List[str]]) -> Table:
         info_table = Table(info_data, colWidths=[2*inch, 4*inch])
         info_table.setStyle(TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
@@ -201,84 +389,77 @@ class PDFGenerationService:
             ('FONTSIZE', (0, 0), (-1, -1), 10),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
         ]))
+        return info_table
 
-        story.append(info_table)
-        story.append(Spacer(1, 30))
-
-        # Conteúdo da análise
-        story.append(Paragraph(f"Resultado da Análise - {self._get_agent_display_name(agent_name)}",
-                              self.styles['SectionTitle']))
-
+    def _campos(self, agent_data: Any, espaco: int) -> Iterator[Flowable]:
+        """Flowables dos campos de um resultado, criados sob demanda"""
         if isinstance(agent_data, dict):
             for key, value in agent_data.items():
                 if value and value != '' and not (isinstance(value, list) and len(value) == 0):
                     # Título do campo
                     field_title = self._format_field_name(key)
-                    story.append(Paragraph(field_title, self.styles['SubTitle']))
+                    yield Paragraph(field_title, self.styles['SubTitle'])
 
                     # Conteúdo do campo
                     if isinstance(value, list):
                         for item in value:
-                            story.append(Paragraph(f"• {str(item)}", self.styles['JustifiedBody']))
+                            yield Paragraph(f"• {str(item)}", self.styles['JustifiedBody'])
                     else:
-                        story.append(Paragraph(str(value), self.styles['JustifiedBody']))
+                        yield Paragraph(str(value), self.styles['JustifiedBody'])
 
-                    story.append(Spacer(1, 12))
+                    yield Spacer(1, espaco)
         else:
-            story.append(Paragraph(str(agent_data), self.styles['JustifiedBody']))
+            yield Paragraph(str(agent_data), self.styles['JustifiedBody'])
 
-        # Rodapé
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Sistema de Análise Jurídica - Relatório gerado automaticamente",
-                              self.styles['Normal']))
+    def _flowables_agente(self, agent_name: str, agent_data: Any, task_id: str) -> Iterator[Flowable]:
+        """Conteúdo do PDF de um agente"""
+        # Cabeçalho
+        yield Paragraph("⚖️ Sistema de Análise Jurídica", self.styles['MainTitle'])
+        yield Spacer(1, 20)
 
-        # Gerar PDF
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
+        # Informações do relatório
+        yield self._tabela_info([
+            ['Agente:', self._get_agent_display_name(agent_name)],
+            ['ID da Tarefa:', task_id],
+            ['Data/Hora:', datetime.now().strftime("%d/%m/%Y às %H:%M:%S")],
+            ['Tipo de Relatório:', 'Análise Individual por Agente']
+        ])
+        yield Spacer(1, 30)
 
-    def generate_combined_pdf(self, all_results: Dict[str, Any], task_id: str) -> BytesIO:
-        """Gerar PDF consolidado com todos os resultados"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4,
-                              rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
+        # Conteúdo da análise
+        yield Paragraph(f"Resultado da Análise - {self._get_agent_display_name(agent_name)}",
+                        self.styles['SectionTitle'])
+        yield from self._campos(agent_data, 12)
 
-        story = []
+        # Rodapé
+        yield Spacer(1, 30)
+        yield Paragraph("Sistema de Análise Jurídica - Relatório gerado automaticamente", self.styles['Normal'])
 
+    def _flowables_consolidado(self, all_results: Dict[str, Any], task_id: str) -> Iterator[Flowable]:
+        """Conteúdo do PDF consolidado"""
         # Cabeçalho
-        story.append(Paragraph("⚖️ Sistema de Análise Jurídica", self.styles['MainTitle']))
-        story.append(Paragraph("Relatório Consolidado de Análise", self.styles['Title']))
-        story.append(Spacer(1, 20))
+        yield Paragraph("⚖️ Sistema de Análise Jurídica", self.styles['MainTitle'])
+        yield Paragraph("Relatório Consolidado de Análise", self.styles['Title'])
+        yield Spacer(1, 20)
 
         # Informações do relatório
-        info_data = [
+        yield self._tabela_info([
             ['ID da Tarefa:', task_id],
             ['Data/Hora:', datetime.now().strftime("%d/%m/%Y às %H:%M:%S")],
             ['Tipo de Relatório:', 'Análise Completa Multi-Agente'],
             ['Agentes Executados:', ', '.join([self._get_agent_display_name(agent) for agent in all_results.keys()])]
-        ]
-
-        info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-        info_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-
-        story.append(info_table)
-        story.append(Spacer(1, 30))
+        ])
+        yield Spacer(1, 30)
 
         # Sumário executivo
-        story.append(Paragraph("Sumário Executivo", self.styles['SectionTitle']))
-        story.append(Paragraph(
+        yield Paragraph("Sumário Executivo", self.styles['SectionTitle'])
+        yield Paragraph(
             f"Este relatório apresenta a análise automatizada de um processo jurídico realizada por "
             f"{len(all_results)} agentes especializados. Cada agente analisou o documento sob sua "
             f"perspectiva específica, extraindo informações relevantes para uma compreensão abrangente do caso.",
             self.styles['JustifiedBody']
-        ))
-        story.append(Spacer(1, 20))
+        )
+        yield Spacer(1, 20)
 
         # Ordem de exibição dos agentes
         agent_order = ['defesa', 'acusacao', 'pesquisa', 'decisoes', 'web', 'relator']
@@ -286,42 +467,38 @@ class PDFGenerationService:
         # Processar cada agente
         for agent_key in agent_order:
             if agent_key in all_results:
-                agent_data = all_results[agent_key]
-
                 # Título do agente
-                story.append(Paragraph(self._get_agent_display_name(agent_key),
-                                     self.styles['SectionTitle']))
-
-                if isinstance(agent_data, dict):
-                    for key, value in agent_data.items():
-                        if value and value != '' and not (isinstance(value, list) and len(value) == 0):
-                            # Título do campo
-                            field_title = self._format_field_name(key)
-                            story.append(Paragraph(field_title, self.styles['SubTitle']))
-
-                            # Conteúdo do campo
-                            if isinstance(value, list):
-                                for item in value:
-                                    story.append(Paragraph(f"• {str(item)}", self.styles['JustifiedBody']))
-                            else:
-                                story.append(Paragraph(str(value), self.styles['JustifiedBody']))
-
-                            story.append(Spacer(1, 8))
-                else:
-                    story.append(Paragraph(str(agent_data), self.styles['JustifiedBody']))
-
-                story.append(Spacer(1, 20))
+                yield Paragraph(self._get_agent_display_name(agent_key), self.styles['SectionTitle'])
+                yield from self._campos(all_results[agent_key], 8)
+                yield Spacer(1, 20)
 
         # Rodapé
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Sistema de Análise Jurídica - Relatório consolidado gerado automaticamente",
-                              self.styles['Normal']))
+        yield Spacer(1, 30)
+        yield Paragraph("Sistema de Análise Jurídica - Relatório consolidado gerado automaticamente",
+                        self.styles['Normal'])
 
-        # Gerar PDF
-        doc.build(story)
+    def _construir_buffer(self, flowables: Iterable[Flowable]) -> BytesIO:
+        buffer = BytesIO()
+        self._novo_documento(buffer, flowables).construir()
         buffer.seek(0)
         return buffer
 
+    def generate_agent_pdf(self, agent_name: str, agent_data: Dict[str, Any], task_id: str) -> BytesIO:
+        """Gerar PDF para um agente específico"""
+        return self._construir_buffer(self._flowables_agente(agent_name, agent_data, task_id))
+
+    def generate_combined_pdf(self, all_results: Dict[str, Any], task_id: str) -> BytesIO:
+        """Gerar PDF consolidado com todos os resultados"""
+        return self._construir_buffer(self._flowables_consolidado(all_results, task_id))
+
+    def render_agent_pdf(self, agent_name: str, agent_data: Dict[str, Any], task_id: str, destino: str) -> None:
+        """Gerar o PDF de um agente direto em arquivo, com memória limitada"""
+        self._novo_documento(destino, self._flowables_agente(agent_name, agent_data, task_id)).construir()
+
+    def render_combined_pdf(self, all_results: Dict[str, Any], task_id: str, destino: str) -> None:
+        """Gerar o PDF consolidado direto em arquivo, com memória limitada"""
+        self._novo_documento(destino, self._flowables_consolidado(all_results, task_id)).construir()
+
     def _get_agent_display_name(self, agent_key: str) -> str:
         """Obter nome de exibição do agente"""
         agent_names = {
@@ -358,9 +535,94 @@ class PDFGenerationService:
 # Manter as classes originais para compatibilidade
 PDFService = PDFProcessingService
 
+class FileTooLargeError(Exception):
+    """Arquivo excede o tamanho máximo permitido"""
+    pass
+
 class FileService:
     """Serviço para gerenciamento de arquivos"""
 
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+    @staticmethod
+    async def save_upload_stream(upload, max_size: int, suffix: str = '.pdf',
+                                 chunk_size: int = UPLOAD_CHUNK_SIZE,
+                                 directory: Optional[str] = None) -> Tuple[str, str, int]:
+        """
+        Grava o upload em disco em blocos, sem carregá-lo inteiro em memória.
+        O limite de tamanho é verificado a cada bloco e o SHA-256 é calculado no mesmo passo.
+        directory: destino do arquivo (padrão: diretório temporário do sistema).
+        Retorna (caminho, sha256, tamanho).
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, file_path = tempfile.mkstemp(suffix=suffix, dir=directory)
+        os.close(fd)
+
+        try:
+            async with aiofiles.open(file_path, 'wb') as out:
+                while True:
+                    chunk = await upload.read(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(
+                            f"Arquivo excede o tamanho máximo de {max_size // (1024 * 1024)}MB"
+                        )
+                    sha256.update(chunk)
+                    await out.write(chunk)
+        except BaseException:
+            FileService.cleanup_file(file_path)
+            raise
+
+        return file_path, sha256.hexdigest(), size
+
+    @staticmethod
+    def extract_pdfs_from_zip(zip_path: str, max_size: int, max_files: int,
+                              directory: Optional[str] = None,
+                              chunk_size: int = UPLOAD_CHUNK_SIZE) -> List[Tuple[str, str, str, int]]:
+        """
+        Extrai os PDFs de um arquivo .zip em blocos, com o mesmo limite de tamanho por arquivo
+        do upload (verificado sobre os bytes descompactados) e o SHA-256 calculado no mesmo passo.
+        Outros tipos de arquivo são ignorados.
+        Retorna [(nome, caminho, sha256, tamanho)] na ordem do arquivo compactado.
+        """
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        extraidos: List[Tuple[str, str, str, int]] = []
+        try:
+            with zipfile.ZipFile(zip_path) as arquivo_zip:
+                membros = [m for m in arquivo_zip.infolist()
+                           if not m.is_dir() and m.filename.lower().endswith('.pdf')
+                           and not os.path.basename(m.filename).startswith('.')]
+                if len(membros) > max_files:
+                    raise ValueError(f"O arquivo compactado tem {len(membros)} PDFs (máximo de {max_files})")
+
+                for membro in membros:
+                    fd, file_path = tempfile.mkstemp(suffix='.pdf', dir=directory)
+                    os.close(fd)
+                    extraidos.append((os.path.basename(membro.filename), file_path, "", 0))
+                    sha256 = hashlib.sha256()
+                    size = 0
+                    with arquivo_zip.open(membro) as origem, open(file_path, 'wb') as out:
+                        for chunk in iter(lambda: origem.read(chunk_size), b""):
+                            size += len(chunk)
+                            if size > max_size:
+                                raise FileTooLargeError(
+                                    f"'{membro.filename}' excede o tamanho máximo de {max_size // (1024 * 1024)}MB"
+                                )
+                            sha256.update(chunk)
+                            out.write(chunk)
+                    extraidos[-1] = (os.path.basename(membro.filename), file_path, sha256.hexdigest(), size)
+        except BaseException:
+            for _, file_path, _, _ in extraidos:
+                FileService.cleanup_file(file_path)
+            raise
+        return extraidos
+
     @staticmethod
     def save_uploaded_file(file_content: bytes, suffix: str = '.pdf') -> str:
         """Salva arquivo uploadado temporariamente"""
@@ -395,10 +657,15 @@ class ValidationService:
 
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
+    @staticmethod
+    def max_file_size() -> int:
+        """Tamanho máximo de upload (MAX_FILE_SIZE no .env ou padrão de 50MB)"""
+        return int(os.getenv("MAX_FILE_SIZE", ValidationService.MAX_FILE_SIZE))
+
     @staticmethod
     def validate_file_size(file_size: int) -> bool:
         """Valida tamanho do arquivo"""
-        return file_size <= ValidationService.MAX_FILE_SIZE
+        return file_size <= ValidationService.max_file_size()
 
     @staticmethod
     def validate_file_type(filename: str) -> bool:
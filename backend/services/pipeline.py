@@ -0,0 +1,106 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class StagePipeline:
+    """Pools limitados por estágio para tirar trabalho bloqueante do event loop"""
+
+    # Estágio -> (variável de ambiente, concorrência padrão)
+    ESTAGIOS = {
+        "ingestao": ("INGESTION_WORKERS", 2),
+        "agentes": ("AGENT_WORKERS", 8),
+        "consolidacao": ("RELATOR_WORKERS", 2),
+        "renderizacao": ("PDF_WORKERS", 2),
+        "indexacao": ("INDEX_WORKERS", 1),
+    }
+
+    def __init__(self, concorrencia: Optional[Dict[str, int]] = None):
+        concorrencia = concorrencia or {}
+        self._lock = threading.Lock()
+        self._executores: Dict[str, ThreadPoolExecutor] = {}
+        self._limites: Dict[str, int] = {}
+        self._em_execucao: Dict[str, int] = {}
+        self._na_fila: Dict[str, int] = {}
+
+        for estagio, (env_var, padrao) in self.ESTAGIOS.items():
+            limite = concorrencia.get(estagio) or int(os.getenv(env_var, str(padrao)))
+            self._limites[estagio] = limite
+            self._em_execucao[estagio] = 0
+            self._na_fila[estagio] = 0
+            self._executores[estagio] = ThreadPoolExecutor(
+                max_workers=limite, thread_name_prefix=f"pipeline-{estagio}"
+            )
+
+    def executor(self, estagio: str) -> Executor:
+        """Executor do estágio (para uso com loop.run_in_executor)"""
+        return self._executores[estagio]
+
+    async def executar(self, estagio: str, func: Callable, *args, **kwargs) -> Any:
+        """Executa uma função bloqueante no pool do estágio sem bloquear o event loop"""
+        # Copia o contexto (ex.: spans da tarefa) para a thread do pool
+        contexto = contextvars.copy_context()
+        # Cancelar a espera cancela o futuro do pool se a função ainda não começou
+        futuro = self._submeter(estagio, functools.partial(contexto.run, func), *args, **kwargs)
+        return await asyncio.wrap_future(futuro)
+
+    def agendar(self, estagio: str, func: Callable, *args, **kwargs) -> Future:
+        """Envia uma função ao pool do estágio sem esperar o resultado (trabalho de fundo)"""
+        return self._submeter(estagio, func, *args, **kwargs)
+
+    def _submeter(self, estagio: str, func: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            self._na_fila[estagio] += 1
+        futuro = self._executores[estagio].submit(self._executar_contabilizado, estagio, func, *args, **kwargs)
+        futuro.add_done_callback(functools.partial(self._descontar_cancelado, estagio))
+        return futuro
+
+    def _descontar_cancelado(self, estagio: str, futuro: Future) -> None:
+        # Um futuro só é cancelado antes de começar: sai da fila sem passar pela execução
+        if futuro.cancelled():
+            with self._lock:
+                self._na_fila[estagio] -= 1
+
+    def _executar_contabilizado(self, estagio: str, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._na_fila[estagio] -= 1
+            self._em_execucao[estagio] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._em_execucao[estagio] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Ocupação de cada estágio"""
+        with self._lock:
+            return {
+                estagio: {
+                    "concorrencia": self._limites[estagio],
+                    "em_execucao": self._em_execucao[estagio],
+                    "na_fila": self._na_fila[estagio],
+                }
+                for estagio in self._executores
+            }
+
+    def shutdown(self) -> None:
+        """Encerra os pools (sem esperar tarefas pendentes)"""
+        for executor in self._executores.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pipeline: Optional[StagePipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> StagePipeline:
+    """Instância única do pipeline por processo"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = StagePipeline()
+        return _pipeline
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Agentes na ordem em que entram na consulta do relator, com o título de cada seção
+SECOES_RELATOR = (
+    ("defesa", "ANÁLISE DA DEFESA"),
+    ("acusacao", "ANÁLISE DA ACUSAÇÃO"),
+    ("pesquisa", "PESQUISA JURÍDICA"),
+    ("decisoes", "ANÁLISE DAS DECISÕES"),
+    ("web", "PESQUISA WEB COMPLEMENTAR"),
+)
+
+# Menor corte aplicado a um campo ou item: abaixo disso, itens de listas passam a ser omitidos
+TOKENS_MINIMOS_POR_UNIDADE = 128
+
+MARCA_CORTE = "…"
+
+
+class Tokenizador:
+    """
+    Contagem e corte de textos em tokens do modelo (tiktoken).
+    Sem o arquivo do encoding (ex.: ambiente sem acesso à rede), aproxima por caracteres.
+    """
+
+    CARACTERES_POR_TOKEN = 4
+
+    def __init__(self, modelo: str):
+        self.modelo = modelo
+        try:
+            try:
+                self._encoding = tiktoken.encoding_for_model(modelo)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning("Encoding do tiktoken indisponível para %s (%s): contagem aproximada", modelo, e)
+            self._encoding = None
+
+    @property
+    def exato(self) -> bool:
+        return self._encoding is not None
+
+    def contar(self, texto: str) -> int:
+        if self._encoding is None:
+            return -(-len(texto) // self.CARACTERES_POR_TOKEN)
+        return len(self._encoding.encode(texto, disallowed_special=()))
+
+    def cortar(self, texto: str, tokens: int) -> str:
+        """Primeiros `tokens` tokens do texto (com marca de corte, se cortado)"""
+        if self._encoding is None:
+            limite = tokens * self.CARACTERES_POR_TOKEN
+            return texto if len(texto) <= limite else texto[:limite].rstrip() + MARCA_CORTE
+        codificado = self._encoding.encode(texto, disallowed_special=())
+        if len(codificado) <= tokens:
+            return texto
+        return self._encoding.decode(codificado[:tokens]).rstrip() + MARCA_CORTE
+
+
+_tokenizadores: Dict[str, Tokenizador] = {}
+_tokenizadores_lock = threading.Lock()
+
+
+def get_tokenizador(modelo: str) -> Tokenizador:
+    """Tokenizador único por processo para cada modelo"""
+    with _tokenizadores_lock:
+        if modelo not in _tokenizadores:
+            _tokenizadores[modelo] = Tokenizador(modelo)
+        return _tokenizadores[modelo]
+
+
+@dataclass
+class _Unidade:
+    """Valor de um campo ou item de uma lista, a menor parte cortável da entrada"""
+    secao: str
+    campo: str
+    texto: str
+    tokens: int
+    item: bool
+
+
+def _vazio(valor: Any) -> bool:
+    return valor is None or valor == "" or valor == [] or valor == {}
+
+
+def _como_texto(valor: Any) -> str:
+    if isinstance(valor, str):
+        return " ".join(valor.split())
+    if isinstance(valor, bool):
+        return "sim" if valor else "não"
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, separators=(",", ":"))
+    return str(valor)
+
+
+def _normalizar(texto: str) -> str:
+    """Chave de comparação de itens: sem acentos, caixa, pontuação e espaços repetidos"""
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w§º°/.-]+", " ", texto).split()).strip(" .;-")
+
+
+def _campos(resultado: Any) -> Optional[Dict[str, Any]]:
+    """Campos de um resultado (instância do response_model, dict já serializado ou texto livre)"""
+    if hasattr(resultado, "model_dump"):
+        return resultado.model_dump()
+    if isinstance(resultado, dict):
+        return resultado
+    return None
+
+
+def compactar_resultados(resultados: Dict[str, Any], orcamento_tokens: int,
+                         tokenizador: Tokenizador) -> Tuple[str, Dict[str, int]]:
+    """
+    Entrada do relator a partir dos resultados dos agentes, em texto compacto e dentro do orçamento:
+    - só campos preenchidos, um por linha (listas como itens "- ...");
+    - itens repetidos entre agentes (ex.: a mesma súmula citada por pesquisa e decisoes) aparecem
+      uma vez, na primeira seção, indicando os demais agentes que os citaram;
+    - acima do orçamento, os textos mais longos são cortados primeiro (mesmo limite para todos)
+      e, se ainda não couber, itens do fim das listas mais longas são omitidos.
+    Retorna (texto, estatísticas).
+    """
+    unidades: Dict[str, List[_Unidade]] = {}
+    textos_livres: Dict[str, str] = {}
+    primeira_ocorrencia: Dict[str, _Unidade] = {}
+    citado_tambem: Dict[int, List[str]] = {}
+    repetidos = 0
+
+    for secao, _ in SECOES_RELATOR:
+        resultado = resultados.get(secao)
+        if resultado is None:
+            continue
+        campos = _campos(resultado)
+        if campos is None:
+            texto = _como_texto(resultado)
+            # Execução que falhou: a seção fica como não disponível
+            if texto and not texto.startswith("Erro:"):
+                textos_livres[secao] = texto
+            continue
+
+        lista: List[_Unidade] = []
+        for campo, valor in campos.items():
+            if _vazio(valor):
+                continue
+            itens = valor if isinstance(valor, list) else [valor]
+            for item in itens:
+                if _vazio(item):
+                    continue
+                texto = _como_texto(item)
+                if isinstance(valor, list):
+                    chave = _normalizar(texto)
+                    anterior = primeira_ocorrencia.get(chave)
+                    if anterior is not None:
+                        repetidos += 1
+                        if anterior.secao != secao and secao not in citado_tambem.setdefault(id(anterior), []):
+                            citado_tambem[id(anterior)].append(secao)
+                        continue
+                unidade = _Unidade(secao, campo, texto, 0, isinstance(valor, list))
+                if unidade.item:
+                    primeira_ocorrencia[chave] = unidade
+                lista.append(unidade)
+        unidades[secao] = lista
+
+    for lista in unidades.values():
+        for unidade in lista:
+            if id(unidade) in citado_tambem:
+                unidade.texto += f" [também: {', '.join(citado_tambem[id(unidade)])}]"
+            unidade.tokens = tokenizador.contar(unidade.texto)
+    livres = {secao: tokenizador.contar(texto) for secao, texto in textos_livres.items()}
+
+    def renderizar(limite: Optional[int] = None) -> str:
+        partes = []
+        for secao, titulo in SECOES_RELATOR:
+            partes.append(f"{titulo}:")
+            if secao in textos_livres:
+                texto = textos_livres[secao]
+                partes.append(tokenizador.cortar(texto, limite) if limite else texto)
+            elif unidades.get(secao):
+                campo_atual = None
+                for unidade in unidades[secao]:
+                    texto = tokenizador.cortar(unidade.texto, limite) if limite else unidade.texto
+                    if not unidade.item:
+                        partes.append(f"{unidade.campo}: {texto}")
+                        campo_atual = None
+                        continue
+                    if unidade.campo != campo_atual:
+                        partes.append(f"{unidade.campo}:")
+                        campo_atual = unidade.campo
+                    partes.append(f"- {texto}")
+                omitidos = omitidos_por_secao.get(secao)
+                if omitidos:
+                    partes.append(f"(+{omitidos} itens omitidos por limite de tamanho)")
+            else:
+                partes.append("Não disponível")
+            partes.append("")
+        return "\n".join(partes).strip()
+
+    omitidos_por_secao: Dict[str, int] = {}
+    texto = renderizar()
+    tokens_compactos = tokenizador.contar(texto)
+    stats = {"tokens": tokens_compactos, "tokens_sem_orcamento": tokens_compactos,
+             "itens_repetidos": repetidos, "itens_omitidos": 0, "limite_por_campo": 0}
+    if tokens_compactos <= orcamento_tokens:
+        return texto, stats
+
+    # Custo fixo (títulos, nomes de campos, marcadores) fora dos valores
+    todas = [u for lista in unidades.values() for u in lista]
+    custo_fixo = max(0, tokens_compactos - sum(u.tokens for u in todas) - sum(livres.values()))
+    disponivel = max(0, orcamento_tokens - custo_fixo)
+
+    def total_com_limite(limite: int) -> int:
+        return sum(min(u.tokens, limite) for u in todas) + sum(min(t, limite) for t in livres.values())
+
+    # Maior limite por campo/item que cabe no orçamento (busca binária), sem descer do piso
+    baixo, alto = TOKENS_MINIMOS_POR_UNIDADE, max([u.tokens for u in todas] + list(livres.values()) + [1])
+    if total_com_limite(baixo) > disponivel:
+        limite = baixo
+    else:
+        while baixo < alto:
+            meio = (baixo + alto + 1) // 2
+            if total_com_limite(meio) <= disponivel:
+                baixo = meio
+            else:
+                alto = meio - 1
+        limite = baixo
+
+    # Ainda acima do orçamento: omite itens do fim da lista mais longa (listas longas perdem primeiro)
+    excesso = total_com_limite(limite) - disponivel
+    listas: Dict[Tuple[str, str], List[_Unidade]] = {}
+    for unidade in todas:
+        if unidade.item:
+            listas.setdefault((unidade.secao, unidade.campo), []).append(unidade)
+    tamanhos = {chave: sum(min(u.tokens, limite) for u in itens) for chave, itens in listas.items()}
+    while excesso > 0 and tamanhos:
+        chave = max(tamanhos, key=tamanhos.get)
+        ultimo = listas[chave].pop()
+        custo = min(ultimo.tokens, limite)
+        tamanhos[chave] -= custo
+        if not listas[chave]:
+            del listas[chave], tamanhos[chave]
+        unidades[ultimo.secao].remove(ultimo)
+        omitidos_por_secao[ultimo.secao] = omitidos_por_secao.get(ultimo.secao, 0) + 1
+        excesso -= custo
+
+    texto = renderizar(limite)
+    if tokenizador.contar(texto) > orcamento_tokens:
+        # Só campos simples além do orçamento (nada mais a omitir): corta o final
+        texto = tokenizador.cortar(texto, orcamento_tokens - 1)
+    stats.update(tokens=tokenizador.contar(texto), itens_omitidos=sum(omitidos_por_secao.values()),
+                 limite_por_campo=limite)
+    return texto, stats
+
+
+def orcamento_relator() -> int:
+    """Orçamento de tokens dos resultados dos agentes na consulta do relator (RELATOR_INPUT_TOKENS)"""
+    return int(os.getenv("RELATOR_INPUT_TOKENS", "12000"))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class ReportCache:
+    """
+    PDFs de relatório já renderizados, em disco, por (tarefa, item, versão do resultado).
+    A versão é o hash do conteúdo renderizado: um resultado novo gera um arquivo novo e
+    downloads repetidos viram leitura de arquivo estático.
+    """
+
+    # Remove tarefas expiradas a cada N renderizações
+    PURGA_A_CADA = 50
+
+    def __init__(self, diretorio: str, ttl_seconds: int):
+        self.diretorio = diretorio
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._renderizando: Dict[str, threading.Lock] = {}
+        self._renderizacoes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    @staticmethod
+    def versao(dados: Any) -> str:
+        """Versão do resultado: hash do conteúdo serializado"""
+        conteudo = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(conteudo.encode("utf-8", errors="replace")).hexdigest()[:16]
+
+    def _diretorio_tarefa(self, task_id: str) -> str:
+        return os.path.join(self.diretorio, os.path.basename(task_id))
+
+    def caminho(self, task_id: str, item: str, versao: str) -> str:
+        return os.path.join(self._diretorio_tarefa(task_id), f"{os.path.basename(item)}-{versao}.pdf")
+
+    def obter(self, task_id: str, item: str, dados: Any,
+              renderizar: Callable[[str], None]) -> Tuple[str, Optional[float]]:
+        """
+        Caminho do PDF de (tarefa, item) para estes dados, renderizando se ainda não existir.
+        renderizar(destino) grava o PDF no caminho temporário recebido.
+        Retorna (caminho, segundos de renderização ou None se veio do disco).
+        Pedidos simultâneos da mesma versão esperam uma única renderização.
+        """
+        caminho = self.caminho(task_id, item, self.versao(dados))
+        if os.path.exists(caminho):
+            with self._lock:
+                self.hits += 1
+            return caminho, None
+
+        with self._lock:
+            trava = self._renderizando.setdefault(caminho, threading.Lock())
+        try:
+            with trava:
+                if os.path.exists(caminho):
+                    with self._lock:
+                        self.hits += 1
+                    return caminho, None
+
+                inicio = time.perf_counter()
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                # Escrita atômica: quem lê nunca encontra um PDF pela metade
+                temporario = f"{caminho}.{threading.get_ident()}.tmp"
+                try:
+                    renderizar(temporario)
+                    os.replace(temporario, caminho)
+                except BaseException:
+                    if os.path.exists(temporario):
+                        os.unlink(temporario)
+                    raise
+                self._remover_versoes_antigas(caminho, item)
+                segundos = time.perf_counter() - inicio
+        finally:
+            # Também em falha: a trava de uma versão que não renderizou não fica para sempre
+            with self._lock:
+                self._renderizando.pop(caminho, None)
+
+        with self._lock:
+            self.misses += 1
+            self._renderizacoes += 1
+            purgar = self._renderizacoes % self.PURGA_A_CADA == 0
+        if purgar:
+            self.purge_expired()
+        return caminho, segundos
+
+    def _remover_versoes_antigas(self, caminho: str, item: str) -> None:
+        diretorio = os.path.dirname(caminho)
+        prefixo = f"{os.path.basename(item)}-"
+        for nome in os.listdir(diretorio):
+            atual = os.path.join(diretorio, nome)
+            if nome.startswith(prefixo) and nome.endswith(".pdf") and atual != caminho:
+                try:
+                    os.unlink(atual)
+                except OSError:
+                    pass
+
+    def remover_tarefa(self, task_id: str) -> None:
+        shutil.rmtree(self._diretorio_tarefa(task_id), ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """Remove os PDFs de tarefas sem renderização há mais de ttl_seconds"""
+        limite = time.time() - self.ttl_seconds
+        removidas = 0
+        for nome in os.listdir(self.diretorio):
+            diretorio = os.path.join(self.diretorio, nome)
+            try:
+                if os.path.isdir(diretorio) and os.path.getmtime(diretorio) < limite:
+                    shutil.rmtree(diretorio, ignore_errors=True)
+                    removidas += 1
+            except OSError:
+                pass
+        return removidas
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de uso do cache"""
+        arquivos = 0
+        tamanho = 0
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.endswith(".pdf"):
+                    arquivos += 1
+                    tamanho += os.path.getsize(os.path.join(raiz, nome))
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "arquivos": arquivos,
+                "bytes": tamanho,
+            }
+
+
+_report_cache: Optional[ReportCache] = None
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Instância única do cache de PDFs por processo"""
+    global _report_cache
+    with _report_cache_lock:
+        if _report_cache is None:
+            _report_cache = ReportCache(
+                diretorio=os.getenv("REPORT_CACHE_DIR", "tmp/reports"),
+                ttl_seconds=int(os.getenv("TASK_TTL_SECONDS", "86400")),
+            )
+        return _report_cache
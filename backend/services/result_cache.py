@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class ResultCache:
+    """
+    Cache persistente (SQLite) dos resultados dos agentes.
+    A chave combina documento, agente, modelo, instruções, consulta e a configuração da
+    recuperação: editar o prompt de um agente invalida apenas os resultados daquele agente.
+    ttl_por_agente: validade própria de agentes cujo resultado envelhece antes (o web
+    segue a validade da busca web, não a dos resultados extraídos do documento).
+    """
+
+    # Remove expirados a cada N gravações
+    PURGA_A_CADA = 50
+
+    def __init__(self, path: str, ttl_seconds: int, max_bytes: int,
+                 ttl_por_agente: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.ttl_por_agente = dict(ttl_por_agente or {})
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._gravacoes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                chave TEXT PRIMARY KEY,
+                agente TEXT NOT NULL,
+                documento TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resultados_acesso ON resultados (acessado_em)")
+
+    @staticmethod
+    def gerar_chave(documento: str, agente: str, modelo: str, instructions: Any, query: str,
+                    response_model: Any = None, configuracao: str = "") -> str:
+        """
+        Chave do resultado: documento + agente + modelo + versão do prompt + consulta +
+        configuração (chunking, embeddings e busca que determinam o contexto recuperado)
+        """
+        if response_model is not None and hasattr(response_model, "model_json_schema"):
+            schema = json.dumps(response_model.model_json_schema(), sort_keys=True)
+        else:
+            schema = ""
+        prompt = hashlib.sha256(f"{instructions}|{schema}".encode("utf-8", errors="replace")).hexdigest()
+        consulta = hashlib.sha256(str(query).encode("utf-8", errors="replace")).hexdigest()
+        base = f"{documento}|{agente}|{modelo}|{prompt}|{consulta}|{configuracao}"
+        return hashlib.sha256(base.encode()).hexdigest()
+
+    def get(self, chave: str) -> Optional[Any]:
+        """Resultado armazenado (dict ou texto), ou None se ausente/expirado"""
+        agora = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dados, criado_em, agente FROM resultados WHERE chave = ?", (chave,)
+            ).fetchone()
+            if row is None or agora - row[1] > self.ttl_por_agente.get(row[2], self.ttl_seconds):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE resultados SET acessado_em = ? WHERE chave = ?", (agora, chave))
+        return json.loads(row[0])
+
+    def set(self, chave: str, agente: str, documento: str, dados: Any) -> None:
+        """Armazena um resultado e aplica os limites de TTL e tamanho"""
+        conteudo = json.dumps(dados, ensure_ascii=False, default=str)
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resultados (chave, agente, documento, dados, tamanho, criado_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chave, agente, documento, conteudo, len(conteudo.encode()), agora, agora)
+            )
+            self._gravacoes += 1
+            if self._gravacoes % self.PURGA_A_CADA == 0:
+                self._purgar_expirados(agora)
+            self._aplicar_limite()
+
+    def _purgar_expirados(self, agora: float) -> None:
+        for agente, ttl in self.ttl_por_agente.items():
+            self._conn.execute("DELETE FROM resultados WHERE agente = ? AND criado_em < ?", (agente, agora - ttl))
+        outros = list(self.ttl_por_agente)
+        marcadores = ",".join("?" * len(outros))
+        filtro = f" AND agente NOT IN ({marcadores})" if outros else ""
+        self._conn.execute(f"DELETE FROM resultados WHERE criado_em < ?{filtro}", (agora - self.ttl_seconds, *outros))
+
+    def _aplicar_limite(self) -> None:
+        """Remove os resultados acessados há mais tempo até caber em max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resultados").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excesso = total - int(self.max_bytes * 0.9)  # Folga para não coletar a cada gravação
+        removidos = 0
+        for chave, tamanho in self._conn.execute(
+            "SELECT chave, tamanho FROM resultados ORDER BY acessado_em"
+        ).fetchall():
+            if removidos >= excesso:
+                break
+            self._conn.execute("DELETE FROM resultados WHERE chave = ?", (chave,))
+            removidos += tamanho
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de uso do cache"""
+        with self._lock:
+            entradas, tamanho = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM resultados"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entradas": entradas,
+                "bytes": tamanho,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Instância única do cache de resultados por processo (None se RESULT_CACHE=false)"""
+    global _result_cache
+    if os.getenv("RESULT_CACHE", "true").lower() in ("false", "0", "no"):
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                path=os.getenv("RESULT_CACHE_PATH", "tmp/result_cache.db"),
+                ttl_seconds=int(os.getenv("RESULT_CACHE_TTL", str(30 * 86400))),
+                max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+                # O resultado do web vem da busca web: não vale mais que as buscas em cache
+                ttl_por_agente={"web": int(os.getenv("WEB_SEARCH_CACHE_TTL", str(7 * 86400)))},
+            )
+        return _result_cache
@@ -0,0 +1,212 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from agno.vectordb.lancedb import LanceDb
+
+from services.embedding_cache import embed_batch
+from services.metrics import registrar_span
+
+# Peças a que a busca se restringe (None: todas)
+TiposPeca = Optional[Tuple[str, ...]]
+# Pedido de busca: consulta normalizada, chunks e peças
+_Pedido = Tuple[str, int, TiposPeca]
+
+
+class RetrievalCoordinator:
+    """
+    Recuperação compartilhada pelos agentes de uma tarefa.
+    As consultas são embedadas numa única chamada e buscadas juntas na tabela do documento;
+    os chunks retornados ficam num cache da tarefa, sem duplicatas, servido a todos os agentes.
+    """
+
+    def __init__(self, vector_db: LanceDb, num_documents: int = 5,
+                 escopos: Optional[Dict[str, Tuple[TiposPeca, int]]] = None,
+                 hibrida: bool = False, refine_factor: int = 0):
+        self.vector_db = vector_db
+        self.num_documents = num_documents
+        # Busca híbrida: BM25 no índice FTS da coluna de texto + vetor (citações exatas, números de processo)
+        self.hibrida = hibrida
+        # Com índice IVF-PQ: candidatos reordenados pela distância exata
+        self.refine_factor = refine_factor
+        # Agente -> (peças que consulta, chunks por consulta); agentes sem escopo buscam no documento inteiro
+        self.escopos = escopos or {}
+        self._lock = threading.Lock()
+        self._consultas: Dict[_Pedido, List[str]] = {}  # (consulta, limite, peças) -> chaves dos chunks
+        self._chunks: Dict[str, Dict] = {}
+        self._stats = {
+            "consultas": 0,
+            "cache_hits": 0,
+            "chamadas_embedder": 0,
+            "textos_embedados": 0,
+            "buscas": 0,
+            "buscas_filtradas": 0,
+            "sem_filtro": 0,
+            "chunks_entregues": 0,
+            "segundos_busca": 0.0,
+        }
+
+    @staticmethod
+    def _normalizar(consulta: str) -> str:
+        return " ".join(consulta.split())
+
+    @staticmethod
+    def _chave_chunk(documento) -> str:
+        base = f"{documento.name}|{documento.meta_data}|{documento.content}"
+        return hashlib.sha256(base.encode("utf-8", errors="replace")).hexdigest()
+
+    def _escopo(self, agente: Optional[str], num_documents: Optional[int]) -> Tuple[TiposPeca, int]:
+        tipos, limite = self.escopos.get(agente or "", (None, self.num_documents))
+        return (tuple(sorted(tipos)) if tipos else None), (num_documents or limite)
+
+    def prefetch(self, consultas: List[str], num_documents: Optional[int] = None) -> None:
+        """Busca de uma só vez as consultas conhecidas antes de os agentes começarem"""
+        limite = num_documents or self.num_documents
+        self._prefetch((self._normalizar(consulta), limite, None) for consulta in consultas)
+
+    def prefetch_agentes(self, consultas: Dict[str, str]) -> None:
+        """Como prefetch, com a consulta de cada agente restrita ao seu escopo de peças"""
+        pedidos = []
+        for agente, consulta in consultas.items():
+            tipos, limite = self._escopo(agente, None)
+            pedidos.append((self._normalizar(consulta), limite, tipos))
+        self._prefetch(pedidos)
+
+    def _prefetch(self, pedidos: Iterable[_Pedido]) -> None:
+        pendentes: List[_Pedido] = []
+        with self._lock:
+            for pedido in pedidos:
+                if pedido not in self._consultas and pedido not in pendentes:
+                    pendentes.append(pedido)
+        if pendentes:
+            self._buscar(pendentes)
+
+    def _buscar(self, pedidos: List[_Pedido]) -> None:
+        inicio = time.perf_counter()
+        embedder = self.vector_db.embedder
+        consultas = list(dict.fromkeys(consulta for consulta, _, _ in pedidos))
+
+        # Uma chamada ao embedder para todas as consultas (o cache persistente é consultado antes)
+        if hasattr(embedder, "get_embeddings_batch"):
+            misses_antes = embedder.misses
+            vetores = embedder.get_embeddings_batch(consultas)
+            chamadas = int(embedder.misses > misses_antes)
+        else:
+            vetores = embed_batch(embedder, consultas)
+            chamadas = 1
+        vetor_da_consulta = dict(zip(consultas, vetores))
+
+        tabela = self.vector_db.table
+        filtravel = tabela is not None and "tipo_peca" in tabela.schema.names
+        # Pedidos com o mesmo limite e as mesmas peças vão numa só busca multi-vetor
+        # (tabelas gravadas antes da coluna tipo_peca não filtram)
+        grupos: Dict[Tuple[int, TiposPeca], List[_Pedido]] = {}
+        for pedido in pedidos:
+            grupos.setdefault((pedido[1], pedido[2] if filtravel else None), []).append(pedido)
+
+        resultado: Dict[_Pedido, List[str]] = {pedido: [] for pedido in pedidos}
+        buscas = filtradas = sem_filtro = 0
+        for (limite, tipos), pedidos_grupo in grupos.items():
+            consultas_grupo = dict.fromkeys(pedido[0] for pedido in pedidos_grupo)
+            validas = [(consulta, vetor_da_consulta[consulta]) for consulta in consultas_grupo
+                       if vetor_da_consulta[consulta]]
+            if not validas or tabela is None:
+                continue
+            encontrados = self._buscar_vetores(validas, limite, tipos)
+            buscas += len(validas) if self.hibrida else 1
+            filtradas += tipos is not None
+            vazias = [(consulta, vetor) for consulta, vetor in validas if not encontrados.get(consulta)]
+            if tipos is not None and vazias:
+                # Documento sem as peças do agente (ou sem peças reconhecidas): busca no documento inteiro
+                encontrados.update(self._buscar_vetores(vazias, limite, None))
+                buscas += len(vazias) if self.hibrida else 1
+                sem_filtro += len(vazias)
+            for pedido in pedidos_grupo:
+                resultado[pedido] = encontrados.get(pedido[0], [])
+
+        segundos = time.perf_counter() - inicio
+        with self._lock:
+            self._consultas.update(resultado)
+            self._stats["chamadas_embedder"] += chamadas
+            self._stats["textos_embedados"] += len(consultas)
+            self._stats["buscas"] += buscas
+            self._stats["buscas_filtradas"] += filtradas
+            self._stats["sem_filtro"] += sem_filtro
+            self._stats["segundos_busca"] += segundos
+        registrar_span("recuperacao", segundos, consultas=len(consultas), buscas=buscas)
+
+    def _buscar_vetores(self, validas: List[Tuple[str, List[float]]], limite: int,
+                        tipos: TiposPeca) -> Dict[str, List[str]]:
+        """
+        Busca multi-vetor (uma varredura da tabela para todas as consultas), restrita às peças.
+        A híbrida não aceita várias consultas numa busca: uma por consulta, com os vetores já calculados.
+        """
+        if self.hibrida:
+            encontrados = {}
+            for consulta, vetor in validas:
+                busca = self.vector_db.table.search(
+                    query_type="hybrid",
+                    vector_column_name=self.vector_db._vector_col,
+                ).vector(vetor).text(consulta)
+                encontrados[consulta] = self._guardar(self._executar(busca, limite, tipos))
+            return encontrados
+
+        query = [vetor for _, vetor in validas] if len(validas) > 1 else validas[0][1]
+        busca = self.vector_db.table.search(
+            query=query,
+            vector_column_name=self.vector_db._vector_col,
+        )
+        tabela = self._executar(busca, limite, tipos)
+        grupos = tabela.groupby("query_index") if "query_index" in tabela.columns else [(0, tabela)]
+        return {validas[int(indice)][0]: self._guardar(grupo) for indice, grupo in grupos}
+
+    def _executar(self, busca, limite: int, tipos: TiposPeca):
+        if tipos is not None:
+            filtro = ", ".join(f"'{tipo}'" for tipo in tipos)
+            busca = busca.where(f"tipo_peca IN ({filtro})", prefilter=True)
+        busca = busca.limit(limite)
+        if self.vector_db.nprobes:
+            busca.nprobes(self.vector_db.nprobes)
+        if self.refine_factor:
+            busca.refine_factor(self.refine_factor)
+        return busca.to_pandas()
+
+    def _guardar(self, resultados) -> List[str]:
+        """Guarda os chunks no cache da tarefa e devolve suas chaves, na ordem da busca"""
+        chaves = []
+        for documento in self.vector_db._build_search_results(resultados):
+            chave = self._chave_chunk(documento)
+            with self._lock:
+                self._chunks.setdefault(chave, documento.to_dict())
+            chaves.append(chave)
+        return chaves
+
+    def retriever(self, agent=None, query: str = "", num_documents: Optional[int] = None,
+                  **kwargs) -> Optional[List[Dict]]:
+        """Função 'retriever' do Agent: responde do cache da tarefa, buscando só o que faltar"""
+        tipos, limite = self._escopo(getattr(agent, "name", None), num_documents)
+        pedido = (self._normalizar(query), limite, tipos)
+        with self._lock:
+            self._stats["consultas"] += 1
+            chaves = self._consultas.get(pedido)
+            if chaves is not None:
+                self._stats["cache_hits"] += 1
+
+        if chaves is None:
+            self._buscar([pedido])
+            with self._lock:
+                chaves = self._consultas[pedido]
+
+        with self._lock:
+            documentos = [self._chunks[chave] for chave in chaves]
+            self._stats["chunks_entregues"] += len(documentos)
+        return documentos or None
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores da recuperação compartilhada da tarefa"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["chunks_unicos"] = len(self._chunks)
+            stats["segundos_busca"] = round(stats["segundos_busca"], 4)
+            return stats
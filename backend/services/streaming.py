@@ -0,0 +1,186 @@
+import json
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from services.metrics import registrar_span
+
+# Evento do parser: ("texto", campo, trecho) ou ("campo", campo, valor)
+EventoParcial = Tuple[str, Optional[str], Any]
+
+# Maior sequência de escape JSON (\uXXXX): um trecho cortado no meio dela ainda não decodifica
+_MAX_ESCAPE = 6
+
+
+def _decodificar_parcial(bruto: str) -> str:
+    """Conteúdo (sem aspas) de uma string JSON ainda aberta, até o último caractere decodificável"""
+    for corte in range(min(_MAX_ESCAPE, len(bruto)) + 1):
+        try:
+            return json.loads(f'"{bruto[:len(bruto) - corte]}"', strict=False)
+        except ValueError:
+            continue
+    return ""
+
+
+class CamposJSONParciais:
+    """
+    Leitura incremental da resposta JSON de um response_model enquanto o modelo a gera.
+    alimentar(delta) devolve, em ordem, o texto novo dos campos string de primeiro nível
+    (já sem escapes, para a narrativa aparecer enquanto é escrita) e cada campo de primeiro
+    nível assim que seu valor termina. Texto antes do primeiro '{' (cerca ```json) é ignorado.
+    """
+
+    def __init__(self):
+        self._texto = ""
+        self._pos = 0
+        self._nivel = 0
+        self._fechado = False
+        self._em_string = False
+        self._escape = False
+        self._estado = "chave"  # chave -> dois_pontos -> valor -> em_valor
+        self._inicio = 0  # início da chave ou do valor corrente
+        self._chave: Optional[str] = None
+        self._emitido = 0  # caracteres já emitidos do valor string corrente
+
+    def _string_aberta(self) -> bool:
+        """Dentro do valor string de um campo de primeiro nível"""
+        return (self._em_string and self._nivel == 1 and self._estado == "em_valor"
+                and self._texto[self._inicio] == '"')
+
+    def _texto_novo(self, fim: int, completo: bool) -> Optional[str]:
+        bruto = self._texto[self._inicio + 1:fim]
+        decodificado = json.loads(f'"{bruto}"', strict=False) if completo else _decodificar_parcial(bruto)
+        novo = decodificado[self._emitido:]
+        self._emitido = len(decodificado)
+        return novo or None
+
+    def _concluir(self, fim: int, eventos: List[EventoParcial]) -> None:
+        if self._estado == "em_valor" and self._chave is not None:
+            try:
+                eventos.append(("campo", self._chave, json.loads(self._texto[self._inicio:fim], strict=False)))
+            except ValueError:
+                pass  # Valor malformado: fica para a validação do response_model no fim
+        self._estado, self._chave, self._emitido = "chave", None, 0
+
+    def alimentar(self, delta: str) -> List[EventoParcial]:
+        eventos: List[EventoParcial] = []
+        self._texto += delta
+        texto = self._texto
+        for i in range(self._pos, len(texto)):
+            c = texto[i]
+            if self._nivel == 0:
+                if c == "{" and not self._fechado:
+                    self._nivel = 1
+                continue
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    if self._string_aberta():
+                        novo = self._texto_novo(i, completo=True)
+                        if novo:
+                            eventos.append(("texto", self._chave, novo))
+                    self._em_string = False
+                    if self._nivel == 1 and self._estado == "chave":
+                        self._chave = json.loads(texto[self._inicio:i + 1], strict=False)
+                        self._estado = "dois_pontos"
+                continue
+            if self._nivel == 1:
+                if self._estado == "dois_pontos" and c == ":":
+                    self._estado = "valor"
+                    continue
+                if self._estado == "valor" and not c.isspace():
+                    self._estado, self._inicio = "em_valor", i
+                elif self._estado == "chave" and c == '"':
+                    self._inicio = i
+                if c == ",":
+                    self._concluir(i, eventos)
+                    continue
+            if c == '"':
+                self._em_string = True
+            elif c in "[{":
+                self._nivel += 1
+            elif c in "]}":
+                self._nivel -= 1
+                if self._nivel == 0:
+                    self._concluir(i, eventos)
+                    self._fechado = True
+        self._pos = len(texto)
+
+        if self._string_aberta():
+            novo = self._texto_novo(len(texto), completo=False)
+            if novo:
+                eventos.append(("texto", self._chave, novo))
+        return eventos
+
+
+class TransmissaoAgente:
+    """
+    Repassa ao canal de eventos da tarefa a saída de um agente enquanto o modelo a gera:
+      - agente_tokens (agente, campo, texto): texto novo, agrupado por intervalo, porque cada
+        evento é uma escrita no TaskStore e o modelo gera dezenas de trechos por segundo
+      - agente_campo (agente, campo, valor): campo do response_model assim que o valor termina
+    Sem response_model, o texto vai como está (campo None). Pode ser chamada de qualquer thread.
+    """
+
+    def __init__(self, agente: str, emitir: Callable, estruturada: bool = True, intervalo: float = 0.3):
+        self.agente = agente
+        self.emitir = emitir
+        self.estruturada = estruturada
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._inicio = time.perf_counter()
+        self._primeiro_token: Optional[float] = None
+        self._tentativas = 0
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        self._parser = CamposJSONParciais() if self.estruturada else None
+        self._campo: Optional[str] = None
+        self._pendente: List[str] = []
+        self._ultimo_envio = time.perf_counter()
+
+    def iniciar(self) -> None:
+        """Início de uma execução do modelo; numa nova tentativa, o cliente descarta o parcial"""
+        with self._lock:
+            self._tentativas += 1
+            if self._tentativas > 1:
+                self._reiniciar()
+                self.emitir("agente_reiniciado", agente=self.agente, tentativa=self._tentativas)
+
+    def _enviar_texto(self) -> None:
+        if self._pendente:
+            self.emitir("agente_tokens", agente=self.agente, campo=self._campo, texto="".join(self._pendente))
+            self._pendente = []
+        self._ultimo_envio = time.perf_counter()
+
+    def __call__(self, delta: str) -> None:
+        """Trecho novo gerado pelo modelo"""
+        with self._lock:
+            if self._primeiro_token is None:
+                self._primeiro_token = time.perf_counter() - self._inicio
+                registrar_span("primeiro_token", self._primeiro_token, item=self.agente)
+            eventos = self._parser.alimentar(delta) if self._parser else [("texto", None, delta)]
+            for tipo, campo, valor in eventos:
+                if tipo == "texto":
+                    if campo != self._campo:
+                        self._enviar_texto()
+                        self._campo = campo
+                    self._pendente.append(valor)
+                else:
+                    # O texto do campo sai antes do campo concluído
+                    self._enviar_texto()
+                    self.emitir("agente_campo", agente=self.agente, campo=campo, valor=valor)
+            if time.perf_counter() - self._ultimo_envio >= self.intervalo:
+                self._enviar_texto()
+
+    def concluir(self) -> None:
+        """Envia o texto que ficou no buffer (fim da execução)"""
+        with self._lock:
+            self._enviar_texto()
+
+    @property
+    def segundos_primeiro_token(self) -> Optional[float]:
+        return self._primeiro_token
@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from models import AnalysisResult
+
+# Estados finais: a tarefa não muda mais (exceto remoção) e pode ficar no cache
+ESTADOS_FINAIS = ("completed", "error")
+
+
+class TaskStore(ABC):
+    """Interface de armazenamento das tarefas de análise"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[AnalysisResult]:
+        """Obtém a tarefa (None se não existir ou tiver expirado)"""
+
+    @abstractmethod
+    def save(self, task: AnalysisResult) -> None:
+        """Cria ou substitui a tarefa"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        """Atualiza campos da tarefa de forma atômica"""
+
+    @abstractmethod
+    def update_se_ativa(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        """
+        Como update, mas só se a tarefa ainda não estiver num estado final (compare-and-set):
+        None se ela não existe ou já foi finalizada por outro
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """Remove a tarefa"""
+
+    @abstractmethod
+    def list(self) -> List[Dict]:
+        """Resumo (task_id, status, progress) de todas as tarefas"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Remove tarefas finalizadas há mais de ttl_seconds"""
+
+    @abstractmethod
+    def append_event(self, task_id: str, tipo: str, dados: Dict) -> int:
+        """Registra um evento da tarefa e retorna seu número de sequência"""
+
+    def append_events(self, eventos: List[Tuple[str, str, Dict]]) -> None:
+        """Registra, em ordem, um lote de eventos (task_id, tipo, dados)"""
+        for task_id, tipo, dados in eventos:
+            self.append_event(task_id, tipo, dados)
+
+    @abstractmethod
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        """Eventos da tarefa com sequência maior que after_seq, em ordem"""
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """Armazenamento em memória (um único processo)"""
+
+    def __init__(self, ttl_seconds: int):
+        super().__init__(ttl_seconds)
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, AnalysisResult] = {}
+        self._concluido_em: Dict[str, float] = {}
+        self._eventos: Dict[str, List[Dict]] = {}
+
+    def get(self, task_id: str) -> Optional[AnalysisResult]:
+        self.purge_expired()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return task.model_copy(deep=True) if task else None
+
+    def save(self, task: AnalysisResult) -> None:
+        with self._lock:
+            self._tasks[task.task_id] = task.model_copy(deep=True)
+            self._marcar_conclusao(task)
+
+    def update(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            task = task.model_copy(update=fields, deep=True)
+            self._tasks[task_id] = task
+            self._marcar_conclusao(task)
+            return task.model_copy(deep=True)
+
+    def update_se_ativa(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.status in ESTADOS_FINAIS:
+                return None
+            task = task.model_copy(update=fields, deep=True)
+            self._tasks[task_id] = task
+            self._marcar_conclusao(task)
+            return task.model_copy(deep=True)
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            self._concluido_em.pop(task_id, None)
+            self._eventos.pop(task_id, None)
+            return self._tasks.pop(task_id, None) is not None
+
+    def list(self) -> List[Dict]:
+        self.purge_expired()
+        with self._lock:
+            return [
+                {"task_id": task.task_id, "status": task.status, "progress": task.progress}
+                for task in self._tasks.values()
+            ]
+
+    def purge_expired(self) -> int:
+        limite = time.time() - self.ttl_seconds
+        with self._lock:
+            expiradas = [task_id for task_id, t in self._concluido_em.items() if t < limite]
+            for task_id in expiradas:
+                self._tasks.pop(task_id, None)
+                self._concluido_em.pop(task_id, None)
+                self._eventos.pop(task_id, None)
+            return len(expiradas)
+
+    def append_event(self, task_id: str, tipo: str, dados: Dict) -> int:
+        with self._lock:
+            eventos = self._eventos.setdefault(task_id, [])
+            seq = len(eventos) + 1
+            eventos.append({"seq": seq, "tipo": tipo, "dados": dados, "criado_em": time.time()})
+            return seq
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        with self._lock:
+            return list(self._eventos.get(task_id, [])[after_seq:])
+
+    def _marcar_conclusao(self, task: AnalysisResult) -> None:
+        if task.status in ESTADOS_FINAIS:
+            self._concluido_em.setdefault(task.task_id, time.time())
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Armazenamento durável em SQLite (modo WAL), compartilhável entre workers do uvicorn.
+    Tarefas finalizadas ficam num cache LRU em memória, validado pela versão gravada no banco.
+    """
+
+    PURGE_INTERVAL = 60  # segundos
+
+    def __init__(self, path: str, ttl_seconds: int, cache_size: int = 256):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[int, AnalysisResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ultima_limpeza = 0.0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL,
+                versao INTEGER NOT NULL DEFAULT 0,
+                dados TEXT NOT NULL,
+                atualizado_em REAL NOT NULL,
+                concluido_em REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_concluido ON tasks (concluido_em)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_events (
+                task_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                dados TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                PRIMARY KEY (task_id, seq)
+            )
+        """)
+
+    def get(self, task_id: str) -> Optional[AnalysisResult]:
+        self._limpeza_periodica()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT versao, concluido_em FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None or self._expirada(row[1]):
+                self._cache.pop(task_id, None)
+                return None
+
+            versao = row[0]
+            cached = self._cache.get(task_id)
+            if cached is not None and cached[0] == versao:
+                self._cache.move_to_end(task_id)
+                return cached[1].model_copy(deep=True)
+
+            dados = self._conn.execute(
+                "SELECT dados FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if dados is None:
+                return None
+            task = AnalysisResult.model_validate_json(dados[0])
+            self._guardar_cache(task, versao)
+            return task.model_copy(deep=True)
+
+    def save(self, task: AnalysisResult) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT versao FROM tasks WHERE task_id = ?", (task.task_id,)
+                ).fetchone()
+                self._gravar(task, (row[0] if row else 0) + 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def update(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        return self._atualizar(task_id, fields, apenas_ativa=False)
+
+    def update_se_ativa(self, task_id: str, **fields) -> Optional[AnalysisResult]:
+        return self._atualizar(task_id, fields, apenas_ativa=True)
+
+    def _atualizar(self, task_id: str, fields: Dict, apenas_ativa: bool) -> Optional[AnalysisResult]:
+        with self._lock:
+            # BEGIN IMMEDIATE: leitura e escrita atômicas mesmo com vários processos
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT versao, dados FROM tasks WHERE task_id = ?", (task_id,)
+                ).fetchone()
+                dados = json.loads(row[1]) if row is not None else None
+                if dados is None or (apenas_ativa and dados.get("status") in ESTADOS_FINAIS):
+                    self._conn.execute("ROLLBACK")
+                    return None
+                dados.update(fields)
+                task = AnalysisResult.model_validate(dados)
+                self._gravar(task, row[0] + 1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return task
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            self._cache.pop(task_id, None)
+            self._conn.execute("DELETE FROM task_events WHERE task_id = ?", (task_id,))
+            cursor = self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            return cursor.rowcount > 0
+
+    def list(self) -> List[Dict]:
+        self._limpeza_periodica()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, status, progress, concluido_em FROM tasks ORDER BY atualizado_em"
+            ).fetchall()
+        return [
+            {"task_id": task_id, "status": status, "progress": progress}
+            for task_id, status, progress, concluido_em in rows
+            if not self._expirada(concluido_em)
+        ]
+
+    def purge_expired(self) -> int:
+        limite = time.time() - self.ttl_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM tasks WHERE concluido_em IS NOT NULL AND concluido_em < ?", (limite,)
+            )
+            self._conn.execute(
+                "DELETE FROM task_events WHERE task_id NOT IN (SELECT task_id FROM tasks)"
+            )
+            existentes = self._ids_existentes(list(self._cache))
+            for task_id in [t for t in self._cache if t not in existentes]:
+                self._cache.pop(task_id, None)
+            self._ultima_limpeza = time.time()
+            return cursor.rowcount
+
+    def append_event(self, task_id: str, tipo: str, dados: Dict) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM task_events WHERE task_id = ?", (task_id,)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "INSERT INTO task_events (task_id, seq, tipo, dados, criado_em) VALUES (?, ?, ?, ?, ?)",
+                    (task_id, seq, tipo, json.dumps(dados, default=str), time.time())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return seq
+
+    def append_events(self, eventos: List[Tuple[str, str, Dict]]) -> None:
+        # Uma transação por lote: o canal de eventos agrupa os trechos publicados em sequência
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                proximo: Dict[str, int] = {}
+                agora = time.time()
+                for task_id, tipo, dados in eventos:
+                    if task_id not in proximo:
+                        proximo[task_id] = self._conn.execute(
+                            "SELECT COALESCE(MAX(seq), 0) + 1 FROM task_events WHERE task_id = ?", (task_id,)
+                        ).fetchone()[0]
+                    self._conn.execute(
+                        "INSERT INTO task_events (task_id, seq, tipo, dados, criado_em) VALUES (?, ?, ?, ?, ?)",
+                        (task_id, proximo[task_id], tipo, json.dumps(dados, default=str), agora)
+                    )
+                    proximo[task_id] += 1
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, tipo, dados, criado_em FROM task_events WHERE task_id = ? AND seq > ? ORDER BY seq",
+                (task_id, after_seq)
+            ).fetchall()
+        return [
+            {"seq": seq, "tipo": tipo, "dados": json.loads(dados), "criado_em": criado_em}
+            for seq, tipo, dados, criado_em in rows
+        ]
+
+    def _gravar(self, task: AnalysisResult, versao: int) -> None:
+        agora = time.time()
+        concluido_em = agora if task.status in ESTADOS_FINAIS else None
+        self._conn.execute(
+            """
+            INSERT INTO tasks (task_id, status, progress, versao, dados, atualizado_em, concluido_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(task_id) DO UPDATE SET
+                status = excluded.status,
+                progress = excluded.progress,
+                versao = excluded.versao,
+                dados = excluded.dados,
+                atualizado_em = excluded.atualizado_em,
+                concluido_em = COALESCE(tasks.concluido_em, excluded.concluido_em)
+            """,
+            (task.task_id, task.status, task.progress, versao, task.model_dump_json(), agora, concluido_em)
+        )
+        self._cache.pop(task.task_id, None)
+        self._guardar_cache(task, versao)
+
+    def _guardar_cache(self, task: AnalysisResult, versao: int) -> None:
+        # Só tarefas finalizadas: as em andamento mudam a cada etapa
+        if task.status not in ESTADOS_FINAIS or self.cache_size <= 0:
+            return
+        self._cache[task.task_id] = (versao, task.model_copy(deep=True))
+        self._cache.move_to_end(task.task_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _ids_existentes(self, task_ids: List[str]) -> set:
+        if not task_ids:
+            return set()
+        marcadores = ",".join("?" * len(task_ids))
+        rows = self._conn.execute(
+            f"SELECT task_id FROM tasks WHERE task_id IN ({marcadores})", task_ids
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def _expirada(self, concluido_em: Optional[float]) -> bool:
+        return concluido_em is not None and concluido_em < time.time() - self.ttl_seconds
+
+    def _limpeza_periodica(self) -> None:
+        if time.time() - self._ultima_limpeza > self.PURGE_INTERVAL:
+            self.purge_expired()
+
+
+_task_store: Optional[TaskStore] = None
+_task_store_lock = threading.Lock()
+
+
+def get_task_store() -> TaskStore:
+    """Instância única do armazenamento de tarefas por processo (TASK_STORE=sqlite|memory)"""
+    global _task_store
+    with _task_store_lock:
+        if _task_store is None:
+            ttl = int(os.getenv("TASK_TTL_SECONDS", "86400"))
+            if os.getenv("TASK_STORE", "sqlite").lower() == "memory":
+                _task_store = MemoryTaskStore(ttl_seconds=ttl)
+            else:
+                _task_store = SQLiteTaskStore(
+                    path=os.getenv("TASK_STORE_PATH", "tmp/tasks.db"),
+                    ttl_seconds=ttl,
+                    cache_size=int(os.getenv("TASK_CACHE_SIZE", "256")),
+                )
+        return _task_store
@@ -0,0 +1,111 @@
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import lancedb
+from agno.vectordb.lancedb import LanceDb
+from lancedb.index import FTS, IvfPq
+
+logger = logging.getLogger(__name__)
+
+# Coluna com o conteúdo dos chunks em texto puro (o payload do agno é JSON com unicode escapado)
+COLUNA_TEXTO = "texto"
+# O PQ de 8 bits treina 256 centróides por subvetor: abaixo disso não há o que indexar
+MIN_LINHAS_PQ = 256
+
+
+@dataclass(frozen=True)
+class IndiceConfig:
+    """Índices da tabela de um documento e parâmetros das buscas que os usam"""
+    min_linhas_ann: int = 20000  # a partir daqui, IVF-PQ em vez de varredura completa (0 desativa)
+    nprobes: int = 20  # partições IVF visitadas por consulta
+    refine_factor: int = 50  # candidatos (x limite) reordenados com os vetores completos
+    hibrida: bool = False  # BM25 (índice FTS) + vetor, fundidos por RRF
+
+    @classmethod
+    def from_env(cls) -> "IndiceConfig":
+        return cls(
+            min_linhas_ann=max(0, int(os.getenv("VECTOR_INDEX_MIN_ROWS", "20000"))),
+            nprobes=max(1, int(os.getenv("VECTOR_INDEX_NPROBES", "20"))),
+            refine_factor=max(0, int(os.getenv("VECTOR_INDEX_REFINE", "50"))),
+            hibrida=os.getenv("SEARCH_MODE", "vector").lower() == "hybrid",
+        )
+
+
+def parametros_ivf_pq(linhas: int, dimensoes: int) -> Dict[str, int]:
+    """
+    Partições ~ raiz do número de linhas; subvetores de 16 dimensões (o PQ comprime cada
+    um em 1 byte), ou de 8 se a dimensão não for múltipla de 16
+    """
+    sub = 16 if dimensoes % 16 == 0 else 8 if dimensoes % 8 == 0 else dimensoes
+    return {"num_partitions": max(1, int(math.sqrt(linhas))), "num_sub_vectors": dimensoes // sub}
+
+
+def indices_existentes(vector_db: LanceDb) -> Dict[str, str]:
+    """Coluna -> tipo do índice (IvfPq, FTS...) na tabela do documento"""
+    if vector_db.table is None:
+        return {}
+    return {coluna: indice.index_type for indice in vector_db.table.list_indices() for coluna in indice.columns}
+
+
+def indexar(vector_db: LanceDb, config: Optional[IndiceConfig] = None) -> Dict:
+    """
+    Índices da tabela do documento (depois da ingestão, ou ao reutilizar uma tabela antiga).
+    O FTS da busca híbrida é criado na hora (segundos); o IVF-PQ, cujo treino leva minutos em
+    tabelas grandes, só é indicado em info["ann_pendente"], para criar_indice_ann em segundo
+    plano. Ajusta nprobes do vector_db quando a tabela já tem índice vetorial.
+    """
+    config = config or IndiceConfig.from_env()
+    tabela = vector_db.table
+    existentes = indices_existentes(vector_db)
+    linhas = tabela.count_rows()
+    info = {"linhas": linhas, "ann": vector_db._vector_col in existentes, "fts": COLUNA_TEXTO in existentes}
+    inicio = time.perf_counter()
+
+    if not info["fts"] and config.hibrida and COLUNA_TEXTO in tabela.schema.names:
+        tabela.create_index(COLUNA_TEXTO, config=FTS(language="Portuguese"))
+        info["fts"] = True
+    info["ann_pendente"] = (not info["ann"] and config.min_linhas_ann > 0
+                            and linhas >= max(config.min_linhas_ann, MIN_LINHAS_PQ))
+
+    if info["ann"]:
+        vector_db.nprobes = config.nprobes
+    info["segundos"] = time.perf_counter() - inicio
+    return info
+
+
+_em_construcao = set()
+_em_construcao_lock = threading.Lock()
+
+
+def criar_indice_ann(uri: str, nome_tabela: str, vector_col: str = "vector") -> bool:
+    """
+    Treina o IVF-PQ de uma tabela, com conexão própria (roda fora da tarefa que a ingeriu).
+    As buscas seguem exatas até o índice ficar pronto; as tarefas seguintes já o usam.
+    """
+    with _em_construcao_lock:
+        if nome_tabela in _em_construcao:
+            return False
+        _em_construcao.add(nome_tabela)
+    try:
+        tabela = lancedb.connect(uri).open_table(nome_tabela)
+        if any(vector_col in indice.columns for indice in tabela.list_indices()):
+            return False
+        inicio = time.perf_counter()
+        dimensoes = tabela.schema.field(vector_col).type.list_size
+        # Mesma métrica das buscas (agno e RetrievalCoordinator usam a padrão, L2)
+        tabela.create_index(vector_col, config=IvfPq(distance_type="l2",
+                                                     **parametros_ivf_pq(tabela.count_rows(), dimensoes)))
+        logger.info("Índice IVF-PQ de %s criado em %.1fs", nome_tabela, time.perf_counter() - inicio)
+        return True
+    except Exception as e:
+        # Tabela despejada durante o treino, por exemplo: a busca continua exata
+        logger.warning("Falha ao criar o índice IVF-PQ de %s: %s", nome_tabela, e)
+        return False
+    finally:
+        with _em_construcao_lock:
+            _em_construcao.discard(nome_tabela)
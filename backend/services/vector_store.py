@@ -0,0 +1,256 @@
+import fcntl
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import lancedb
+
+
+class VectorStoreManager:
+    """
+    Gerencia uma tabela LanceDB por documento (hash do PDF) com despejo LRU.
+    Processos do mesmo host podem compartilhar o uri: as retenções ficam no registro SQLite
+    com lease renovado por heartbeat (a de um processo morto expira), e a coleta só remove a
+    tabela de um documento sem retenção ativa e sem ingestão em andamento.
+    """
+
+    def __init__(self, uri: str, max_bytes: int, min_idle_seconds: int = 600, lease_seconds: int = 60):
+        self.uri = uri
+        self.max_bytes = max_bytes
+        self.min_idle_seconds = min_idle_seconds
+        self.lease_seconds = lease_seconds
+        self.processo = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._locks_documento: Dict[str, threading.Lock] = {}
+        self._em_uso: Dict[str, int] = {}
+        self._heartbeat: Optional[threading.Thread] = None
+
+        os.makedirs(os.path.join(uri, "_locks"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(uri, "_registro.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tabelas (
+                doc_hash TEXT PRIMARY KEY,
+                tabela TEXT NOT NULL,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                ultimo_uso REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS retencoes (
+                doc_hash TEXT NOT NULL,
+                processo TEXT NOT NULL,
+                expira_em REAL NOT NULL,
+                PRIMARY KEY (doc_hash, processo)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def nome_tabela(doc_hash: str) -> str:
+        """Nome da tabela LanceDB de um documento"""
+        return f"doc_{doc_hash[:32]}"
+
+    @contextmanager
+    def lock_documento(self, doc_hash: str):
+        """
+        Serializa a ingestão de um mesmo documento sem bloquear os demais, também entre
+        processos (workers que compartilham o VECTOR_STORE_URI): flock num arquivo por
+        documento, liberado pelo sistema se o processo morrer no meio da ingestão
+        """
+        with self._travar_documento(doc_hash, bloquear=True):
+            yield
+
+    @contextmanager
+    def _travar_documento(self, doc_hash: str, bloquear: bool) -> Iterator[bool]:
+        """Trava do documento (thread + flock); sem bloquear, produz False se estiver ocupada"""
+        with self._lock:
+            lock = self._locks_documento.setdefault(doc_hash, threading.Lock())
+        if not lock.acquire(blocking=bloquear):
+            yield False
+            return
+        try:
+            with open(os.path.join(self.uri, "_locks", f"{self.nome_tabela(doc_hash)}.lock"), "a") as arquivo:
+                try:
+                    fcntl.flock(arquivo, fcntl.LOCK_EX if bloquear else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(arquivo, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+
+    def pronta(self, doc_hash: str) -> bool:
+        """Indica se a tabela do documento já foi carregada e pode ser reutilizada"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tabela FROM tabelas WHERE doc_hash = ?", (doc_hash,)
+            ).fetchone()
+        return row is not None and os.path.isdir(self._caminho_tabela(row[0]))
+
+    def reter(self, doc_hash: str) -> None:
+        """
+        Marca a tabela como em uso pela tarefa atual (não pode ser despejada por nenhum processo
+        enquanto este renovar a retenção no registro)
+        """
+        agora = time.time()
+        with self._lock:
+            self._em_uso[doc_hash] = self._em_uso.get(doc_hash, 0) + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO retencoes (doc_hash, processo, expira_em) VALUES (?, ?, ?)",
+                (doc_hash, self.processo, agora + self.lease_seconds)
+            )
+            self._conn.execute(
+                "UPDATE tabelas SET ultimo_uso = ? WHERE doc_hash = ?", (agora, doc_hash)
+            )
+            self._conn.commit()
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renovar_retencoes, name="vector-store", daemon=True)
+                self._heartbeat.start()
+
+    def liberar(self, doc_hash: str) -> None:
+        """Libera a tabela ao final da tarefa e executa a coleta"""
+        with self._lock:
+            restante = self._em_uso.get(doc_hash, 0) - 1
+            if restante > 0:
+                self._em_uso[doc_hash] = restante
+            else:
+                self._em_uso.pop(doc_hash, None)
+                self._conn.execute(
+                    "DELETE FROM retencoes WHERE doc_hash = ? AND processo = ?", (doc_hash, self.processo)
+                )
+            self._conn.execute(
+                "UPDATE tabelas SET ultimo_uso = ? WHERE doc_hash = ?", (time.time(), doc_hash)
+            )
+            self._conn.commit()
+        self.coletar()
+
+    def _renovar_retencoes(self) -> None:
+        """Heartbeat: estende o lease das retenções deste processo (as tabelas retidas seguem em uso)"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            agora = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE retencoes SET expira_em = ? WHERE processo = ?",
+                    (agora + self.lease_seconds, self.processo)
+                )
+                self._conn.execute(
+                    "DELETE FROM retencoes WHERE expira_em < ?", (agora,)
+                )
+                self._conn.commit()
+
+    def registrar(self, doc_hash: str) -> None:
+        """Registra a tabela recém-carregada e aplica o orçamento de disco"""
+        tabela = self.nome_tabela(doc_hash)
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tabelas (doc_hash, tabela, bytes, criado_em, ultimo_uso) VALUES (?, ?, ?, ?, ?)",
+                (doc_hash, tabela, self._tamanho_tabela(tabela), agora, agora)
+            )
+            self._conn.commit()
+        self.coletar()
+
+    def coletar(self) -> List[str]:
+        """Remove tabelas menos usadas recentemente até caber no orçamento de disco"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_hash, tabela, bytes, ultimo_uso FROM tabelas ORDER BY ultimo_uso ASC"
+            ).fetchall()
+        total = sum(row[2] for row in rows)
+        if total <= self.max_bytes:
+            return []
+
+        removidas = []
+        limite_uso = time.time() - self.min_idle_seconds
+        for doc_hash, tabela, tamanho, ultimo_uso in rows:
+            if total <= self.max_bytes:
+                break
+            # Tabelas em uso neste processo ou usadas recentemente são mantidas
+            if doc_hash in self._em_uso or ultimo_uso > limite_uso:
+                continue
+            # Documento em ingestão ou retido (por qualquer processo) fica para a próxima coleta
+            with self._travar_documento(doc_hash, bloquear=False) as travado:
+                if not travado or not self._remover_do_registro(doc_hash):
+                    continue
+                try:
+                    lancedb.connect(self.uri).drop_table(tabela)
+                except Exception:
+                    pass
+            total -= tamanho
+            removidas.append(tabela)
+        return removidas
+
+    def _remover_do_registro(self, doc_hash: str) -> bool:
+        """
+        Tira a tabela do registro se nenhum processo a retém (retenção com lease vigente),
+        numa transação: quem retiver depois não a encontra pronta e ingere de novo
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                retida = self._conn.execute(
+                    "SELECT 1 FROM retencoes WHERE doc_hash = ? AND expira_em > ?", (doc_hash, time.time())
+                ).fetchone()
+                livre = retida is None and doc_hash not in self._em_uso
+                if livre:
+                    self._conn.execute("DELETE FROM tabelas WHERE doc_hash = ?", (doc_hash,))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return livre
+
+    def stats(self) -> dict:
+        """Resumo do uso de disco das tabelas por documento"""
+        with self._lock:
+            tabelas, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM tabelas"
+            ).fetchone()
+            return {
+                "tabelas": tabelas,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "em_uso": len(self._em_uso)
+            }
+
+    def _caminho_tabela(self, tabela: str) -> str:
+        return os.path.join(self.uri, f"{tabela}.lance")
+
+    def _tamanho_tabela(self, tabela: str) -> int:
+        total = 0
+        for raiz, _, arquivos in os.walk(self._caminho_tabela(tabela)):
+            for arquivo in arquivos:
+                try:
+                    total += os.path.getsize(os.path.join(raiz, arquivo))
+                except OSError:
+                    pass
+        return total
+
+
+_vector_store: Optional[VectorStoreManager] = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStoreManager:
+    """Instância única do gerenciador de tabelas por processo"""
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is None:
+            _vector_store = VectorStoreManager(
+                uri=os.getenv("VECTOR_STORE_URI", "tmp/lancedb_stf_ocr_otimizado"),
+                max_bytes=int(os.getenv("VECTOR_STORE_MAX_BYTES", str(2 * 1024 ** 3))),
+                min_idle_seconds=int(os.getenv("VECTOR_STORE_MIN_IDLE", "600")),
+                lease_seconds=int(os.getenv("VECTOR_STORE_PIN_LEASE", "60")),
+            )
+        return _vector_store
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from services.metrics import registrar_span
+
+
+class SearchCache:
+    """
+    Cache persistente (SQLite) das respostas da busca web, compartilhado entre tarefas.
+    A chave é a consulta normalizada com os parâmetros da busca; entradas expiram após o TTL.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buscas (
+                chave TEXT PRIMARY KEY,
+                consulta TEXT NOT NULL,
+                resposta TEXT NOT NULL,
+                criado_em REAL NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def normalizar(consulta: str) -> str:
+        """Consultas que diferem só em caixa ou espaços são a mesma busca"""
+        return " ".join(str(consulta).lower().split())
+
+    @classmethod
+    def gerar_chave(cls, consulta: str, **parametros) -> str:
+        """Chave da busca: consulta normalizada + parâmetros (profundidade, nº de resultados...)"""
+        base = json.dumps([cls.normalizar(consulta), parametros], sort_keys=True, default=str)
+        return hashlib.sha256(base.encode("utf-8", errors="replace")).hexdigest()
+
+    def get(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Resposta armazenada, ou None se ausente/expirada"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT resposta, criado_em FROM buscas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, chave: str, consulta: str, resposta: Dict[str, Any]) -> None:
+        """Armazena uma resposta e descarta as expiradas"""
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO buscas (chave, consulta, resposta, criado_em) VALUES (?, ?, ?, ?)",
+                (chave, self.normalizar(consulta), json.dumps(resposta, ensure_ascii=False, default=str), agora)
+            )
+            self._conn.execute("DELETE FROM buscas WHERE criado_em < ?", (agora - self.ttl_seconds,))
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de uso do cache"""
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM buscas").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entradas": entradas,
+            }
+
+
+class TokenBucket:
+    """Limitador de taxa: até `capacidade` chamadas em rajada, repostas a `taxa` por segundo"""
+
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """Bloqueia até haver um token disponível; retorna o tempo esperado (s)"""
+        espera_total = 0.0
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado_em) * self.taxa)
+                self._atualizado_em = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return espera_total
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+            espera_total += espera
+
+
+class _BuscaEmAndamento:
+    """Chamada externa em curso, aguardada pelas demais tarefas com a mesma consulta"""
+
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resposta: Optional[Dict[str, Any]] = None
+        self.erro: Optional[BaseException] = None
+
+
+class CachedSearchClient:
+    """
+    Envolve o cliente de busca (ex.: TavilyClient) com cache, limite de taxa e coalescência:
+    tarefas simultâneas com a mesma consulta compartilham uma única chamada externa.
+    Substitui o `client` do TavilyTools, que continua formatando as respostas.
+    """
+
+    def __init__(self, client, cache: SearchCache, limitador: TokenBucket):
+        self.client = client
+        self.cache = cache
+        self.limitador = limitador
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[str, _BuscaEmAndamento] = {}
+        self._stats = {"chamadas_externas": 0, "coalescidas": 0, "erros": 0, "segundos_espera_limite": 0.0}
+
+    def search(self, query: str, **parametros) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        chave = SearchCache.gerar_chave(query, **parametros)
+        resposta = self.cache.get(chave)
+        if resposta is not None:
+            registrar_span("busca_web", time.perf_counter() - inicio, origem="cache")
+            return resposta
+
+        with self._lock:
+            busca = self._em_andamento.get(chave)
+            lider = busca is None
+            if lider:
+                busca = self._em_andamento[chave] = _BuscaEmAndamento()
+            else:
+                self._stats["coalescidas"] += 1
+
+        if not lider:
+            busca.concluida.wait()
+            registrar_span("busca_web", time.perf_counter() - inicio, origem="coalescida")
+            if busca.erro is not None:
+                raise busca.erro
+            return busca.resposta
+
+        try:
+            espera = self.limitador.adquirir()
+            busca.resposta = self.client.search(query=query, **parametros)
+            self.cache.set(chave, query, busca.resposta)
+            with self._lock:
+                self._stats["chamadas_externas"] += 1
+                self._stats["segundos_espera_limite"] += espera
+            return busca.resposta
+        except BaseException as erro:
+            busca.erro = erro
+            with self._lock:
+                self._stats["erros"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            busca.concluida.set()
+            registrar_span("busca_web", time.perf_counter() - inicio, origem="externa")
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores da busca web do processo"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["segundos_espera_limite"] = round(stats["segundos_espera_limite"], 4)
+        stats["cache"] = self.cache.stats()
+        return stats
+
+
+_search_client: Optional[CachedSearchClient] = None
+_search_client_lock = threading.Lock()
+
+
+def get_search_client() -> CachedSearchClient:
+    """Cliente de busca web único por processo (cache e limite de taxa compartilhados entre tarefas)"""
+    global _search_client
+    with _search_client_lock:
+        if _search_client is None:
+            from tavily import TavilyClient
+
+            _search_client = CachedSearchClient(
+                client=TavilyClient(api_key=os.getenv("TAVILY_API_KEY")),
+                cache=SearchCache(
+                    path=os.getenv("WEB_SEARCH_CACHE_PATH", "tmp/web_search_cache.db"),
+                    ttl_seconds=int(os.getenv("WEB_SEARCH_CACHE_TTL", str(7 * 86400))),
+                ),
+                limitador=TokenBucket(
+                    taxa=float(os.getenv("WEB_SEARCH_RATE", "1")),
+                    capacidade=int(os.getenv("WEB_SEARCH_BURST", "5")),
+                ),
+            )
+        return _search_client
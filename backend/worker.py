@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Worker de análise: consome a fila durável de jobs (JOB_QUEUE=true) e executa process_document.
+
+Vários workers (processos no mesmo host que compartilham, em disco local, o
+TASK_STORE_PATH, o JOB_QUEUE_PATH, o JOB_SPOOL_DIR e o VECTOR_STORE_URI) dividem a fila. Cada job é reservado com lease
+renovado por heartbeat; se o worker cair, outro retoma o job após o lease expirar,
+reaproveitando os estágios já concluídos (tabela vetorial do documento e resultados
+de agentes gravados na tarefa).
+
+Uso (a partir do diretório backend):
+    python worker.py --concorrencia 2
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from routers.analysis import process_document, task_store
+from services.batch import notificar_lote
+from services.events import get_event_bus
+from services.job_queue import Job, LeasePerdidoError, get_job_queue
+from services.pipeline import get_pipeline
+
+logger = logging.getLogger("worker")
+
+
+class AnalysisWorker:
+    """Laço do worker: reserva jobs, mantém os leases e registra o desfecho de cada um"""
+
+    def __init__(self, concorrencia: int, intervalo_poll: float, intervalo_heartbeat: float):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concorrencia = concorrencia
+        self.intervalo_poll = intervalo_poll
+        self.intervalo_heartbeat = intervalo_heartbeat
+        self.fila = get_job_queue()
+        self._parar = asyncio.Event()
+        self._em_execucao: set = set()
+
+    def parar(self) -> None:
+        """Não reserva novos jobs; os em execução terminam normalmente"""
+        self._parar.set()
+
+    async def executar(self) -> None:
+        logger.info("Worker %s iniciado (concorrência %d)", self.worker_id, self.concorrencia)
+        while not self._parar.is_set():
+            job = None
+            if len(self._em_execucao) < self.concorrencia:
+                job = await asyncio.to_thread(self.fila.obter, self.worker_id)
+            if job is not None:
+                tarefa = asyncio.ensure_future(self._processar(job))
+                self._em_execucao.add(tarefa)
+                tarefa.add_done_callback(self._em_execucao.discard)
+                continue
+            try:
+                await asyncio.wait_for(self._parar.wait(), timeout=self.intervalo_poll)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._em_execucao:
+            await asyncio.wait(self._em_execucao)
+        logger.info("Worker %s encerrado", self.worker_id)
+
+    async def _heartbeat(self, job: Job, processamento: asyncio.Future) -> None:
+        """Renova o lease; perdido o lease, interrompe o processamento (o job é de outro worker)"""
+        while True:
+            await asyncio.sleep(self.intervalo_heartbeat)
+            if not await asyncio.to_thread(self.fila.renovar, job.job_id, self.worker_id):
+                logger.warning("Lease do job %s perdido pelo worker %s", job.job_id, self.worker_id)
+                processamento.cancel()
+                return
+
+    async def _processar(self, job: Job) -> None:
+        task_id = job.job_id
+        if job.esgotado:
+            # A última tentativa perdeu o lease (worker morto no meio): encerra a tarefa
+            erro = f"Processamento interrompido após {job.max_tentativas} tentativas"
+            await asyncio.to_thread(task_store.update, task_id, status="error", error=erro)
+            get_event_bus().publish(task_id, "erro", error=erro)
+            await asyncio.to_thread(self.fila.falhar, job, self.worker_id, erro)
+            self._remover_pdf(job)
+            if job.payload.get("lote_id"):
+                await asyncio.to_thread(notificar_lote, job.payload["lote_id"], task_id)
+            return
+
+        logger.info("Job %s: tentativa %d/%d", task_id, job.tentativas, job.max_tentativas)
+        processamento = asyncio.ensure_future(process_document(
+            task_id,
+            job.payload["pdf_path"],
+            job.payload["agent_list"],
+            job.payload.get("doc_hash"),
+            ultima_tentativa=job.ultima_tentativa,
+            lote_id=job.payload.get("lote_id"),
+            confirmar_lease=functools.partial(self.fila.renovar, job.job_id, self.worker_id),
+        ))
+        heartbeat = asyncio.ensure_future(self._heartbeat(job, processamento))
+        try:
+            await processamento
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                processamento.cancel()
+                raise  # Cancelamento do próprio worker
+            logger.warning("Job %s interrompido: lease perdido", task_id)
+        except LeasePerdidoError:
+            logger.warning("Job %s concluído por este worker após perder o lease: desfecho descartado", task_id)
+        except Exception as e:
+            repetir = await asyncio.to_thread(self.fila.falhar, job, self.worker_id, str(e))
+            logger.warning("Job %s falhou (%s)%s", task_id, e, ", voltou para a fila" if repetir else "")
+        else:
+            task = await asyncio.to_thread(task_store.get, task_id)
+            if task is not None and task.status == "error":
+                await asyncio.to_thread(self.fila.falhar, job, self.worker_id, task.error or "erro")
+            else:
+                await asyncio.to_thread(self.fila.concluir, job.job_id, self.worker_id)
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    def _remover_pdf(job: Job) -> None:
+        try:
+            os.unlink(job.payload["pdf_path"])
+        except OSError:
+            pass
+
+
+async def main_async(args) -> None:
+    worker = AnalysisWorker(args.concorrencia, args.intervalo, args.heartbeat)
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, worker.parar)
+    try:
+        await worker.executar()
+    finally:
+        get_pipeline().shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "2")),
+                        help="Jobs processados ao mesmo tempo por este worker")
+    parser.add_argument("--intervalo", type=float, default=1.0, help="Intervalo de consulta à fila sem jobs (s)")
+    parser.add_argument("--heartbeat", type=float, default=int(os.getenv("JOB_LEASE_SECONDS", "60")) / 4,
+                        help="Intervalo de renovação do lease (s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(name)s %(message)s")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
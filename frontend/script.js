@@ -2,6 +2,8 @@
 const API_BASE_URL = 'http://localhost:8000/api/v1';
 let currentTaskId = null;
 let progressInterval = null;
+let eventSource = null;
+let partialResults = {};
 
 // ===== NAVEGAÇÃO =====
 function showSection(sectionId) {
@@ -220,6 +222,9 @@ async function startAnalysis() {
         // Atualizar UI
         document.getElementById('taskId').textContent = currentTaskId;
         showNotification(`Upload realizado com sucesso! ID: ${currentTaskId}`, 'success');
+        if (result.posicao_fila) {
+            setProgressText(`Aguardando na fila: posição ${result.posicao_fila}`);
+        }
 
         // Iniciar monitoramento do progresso
         startProgressMonitoring();
@@ -231,13 +236,137 @@ async function startAnalysis() {
     }
 }
 
+// Nomes curtos dos agentes para as mensagens de progresso
+const AGENT_LABELS = {
+    'defesa': 'Defesa',
+    'acusacao': 'Acusação',
+    'pesquisa': 'Pesquisa Jurídica',
+    'decisoes': 'Decisões Judiciais',
+    'web': 'Pesquisa Web',
+    'relator': 'Relator'
+};
+
 function startProgressMonitoring() {
+    partialResults = {};
+
+    // Sem suporte a EventSource: volta ao polling de /status
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    eventSource = new EventSource(`${API_BASE_URL}/events/${currentTaskId}`);
+
+    eventSource.addEventListener('progresso', (event) => {
+        const data = JSON.parse(event.data);
+        updateProgressUI({ progress: data.progress, status: data.status });
+    });
+
+    eventSource.addEventListener('fila', (event) => {
+        const data = JSON.parse(event.data);
+        setProgressText(`Aguardando na fila: posição ${data.posicao}`);
+    });
+
+    eventSource.addEventListener('pagina_extraida', (event) => {
+        const data = JSON.parse(event.data);
+        const metodo = data.metodo === 'ocr' ? ' (OCR)' : '';
+        setProgressText(`Extraindo páginas: ${data.extraidas}/${data.total}${metodo}`);
+    });
+
+    eventSource.addEventListener('chunks_embedados', (event) => {
+        const data = JSON.parse(event.data);
+        setProgressText(`Indexando documento: ${data.chunks} trechos processados`);
+    });
+
+    eventSource.addEventListener('agente_iniciado', (event) => {
+        const data = JSON.parse(event.data);
+        setProgressText(`Executando agente ${AGENT_LABELS[data.agente] || data.agente}...`);
+    });
+
+    eventSource.addEventListener('agente_concluido', (event) => {
+        const data = JSON.parse(event.data);
+        partialResults[data.agente] = data.resultado;
+        setProgressText(`Agente ${AGENT_LABELS[data.agente] || data.agente} concluído`);
+        // Resultados parciais ficam disponíveis antes do fim da análise
+        displayResults(partialResults);
+    });
+
+    // Saída transmitida enquanto o modelo gera (STREAM_AGENTS): texto dos campos e campos concluídos
+    eventSource.addEventListener('agente_tokens', (event) => {
+        const data = JSON.parse(event.data);
+        if (data.campo === null) {
+            partialResults[data.agente] = (typeof partialResults[data.agente] === 'string' ? partialResults[data.agente] : '') + data.texto;
+        } else {
+            const parcial = partialResults[data.agente] = partialResults[data.agente] || {};
+            parcial[data.campo] = (parcial[data.campo] || '') + data.texto;
+        }
+        displayResults(partialResults);
+    });
+
+    eventSource.addEventListener('agente_campo', (event) => {
+        const data = JSON.parse(event.data);
+        const parcial = partialResults[data.agente] = partialResults[data.agente] || {};
+        parcial[data.campo] = data.valor;
+        displayResults(partialResults);
+    });
+
+    eventSource.addEventListener('agente_reiniciado', (event) => {
+        const data = JSON.parse(event.data);
+        delete partialResults[data.agente];
+        displayResults(partialResults);
+    });
+
+    eventSource.addEventListener('relator_iniciado', () => {
+        setProgressText('Gerando relatório consolidado...');
+    });
+
+    eventSource.addEventListener('concluido', async () => {
+        stopProgressMonitoring();
+        updateProgressUI({ progress: 100, status: 'completed' });
+        await loadResults();
+        showNotification('Análise concluída com sucesso!', 'success');
+        resetUploadSection();
+    });
+
+    eventSource.addEventListener('erro', (event) => {
+        const data = JSON.parse(event.data);
+        stopProgressMonitoring();
+        showNotification(`Erro na análise: ${data.error}`, 'error');
+        resetUploadSection();
+    });
+
+    eventSource.onerror = () => {
+        // O navegador reconecta sozinho (com Last-Event-ID); se a conexão foi encerrada, usa polling
+        if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            startPolling();
+        }
+    };
+}
+
+function stopProgressMonitoring() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+    if (progressInterval) {
+        clearInterval(progressInterval);
+        progressInterval = null;
+    }
+}
+
+function setProgressText(text) {
+    document.getElementById('progressText').textContent = text;
+}
+
+function startPolling() {
+    if (progressInterval || !currentTaskId) return;
     progressInterval = setInterval(async () => {
         try {
             await updateProgress();
         } catch (error) {
             console.error('Erro ao verificar progresso:', error);
-            clearInterval(progressInterval);
+            stopProgressMonitoring();
             showNotification('Erro ao acompanhar progresso', 'error');
         }
     }, 2000); // Verificar a cada 2 segundos
@@ -260,19 +389,19 @@ async function updateProgress() {
 
         // Verificar se completou
         if (status.status === 'completed') {
-            clearInterval(progressInterval);
+            stopProgressMonitoring();
             await loadResults();
             showNotification('Análise concluída com sucesso!', 'success');
             resetUploadSection();
         } else if (status.status === 'error') {
-            clearInterval(progressInterval);
+            stopProgressMonitoring();
             showNotification(`Erro na análise: ${status.error}`, 'error');
             resetUploadSection();
         }
 
     } catch (error) {
         console.error('Erro ao verificar progresso:', error);
-        clearInterval(progressInterval);
+        stopProgressMonitoring();
     }
 }
 
@@ -304,9 +433,7 @@ function updateProgressUI(status) {
 }
 
 function cancelAnalysis() {
-    if (progressInterval) {
-        clearInterval(progressInterval);
-    }
+    stopProgressMonitoring();
     currentTaskId = null;
     resetUploadSection();
     showNotification('Análise cancelada', 'warning');
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+import os
+import subprocess
+import sys
+
+def main():
+    print("⚙️ Iniciando worker de análise (fila de jobs)...")
+    print("-" * 50)
+
+    # Mudar para diretório backend
+    os.chdir("backend")
+
+    # Executar o worker (argumentos repassados, ex.: --concorrencia 2)
+    subprocess.run([sys.executable, "worker.py", *sys.argv[1:]])
+
+if __name__ == "__main__":
+    main()